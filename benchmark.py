@@ -0,0 +1,302 @@
+"""
+Micro-benchmarks do processamento dos resultados (sem rede nem PySide6)
+
+Mede as rotinas em Python puro executadas para cada loja depois das
+requisições: filtragem das SLAs pelas políticas ativas, ranking,
+verificação de entrega, conversão de prazo, soma do estoque e o JSON
+exibido na aba de resultados. As respostas são geradas pelo mock_vtex.py,
+no mesmo formato da VTEX e sempre iguais para o mesmo número de lojas:
+
+    python benchmark.py
+    python benchmark.py --tamanhos 10 100 --casos coletar_dados_ranking json_resultados
+    python benchmark.py --saida depois.json --comparar antes.json
+
+Os tempos vão para um arquivo JSON (--saida); com --comparar, cada caso é
+comparado com o arquivo de uma versão anterior e o código de saída é 1 se
+algum ficou mais lento que o limiar (--limiar, em %).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from mock_vtex import CenarioMock, gerar_politicas, gerar_estoque, gerar_simulacao
+from simulacao import (
+    extrair_politicas_ativas, filtrar_slas_ativas, montar_payload_simulacao, montar_resultados_skus
+)
+from utils import (
+    parse_prazo_para_dias, calcular_estoque_total, coletar_dados_ranking,
+    loja_tem_qualquer_entrega, loja_tem_entrega_normal, determinar_tipo_loja
+)
+
+
+VERSAO_BENCHMARK = 1
+ARQUIVO_PADRAO = "benchmark_resultados.json"
+TAMANHOS_PADRAO = (10, 100, 1000, 10000)
+
+CEP_BENCHMARK = "05372-110"
+SKU_BENCHMARK = "149718"
+LOJAS_NACIONAIS = {"000001": "Nacional", "000002": "Nacional"}
+
+# Duração mínima de cada rodada; casos rápidos são repetidos até atingi-la
+TEMPO_MINIMO_RODADA = 0.05
+
+
+class Fixture:
+    """Respostas sintéticas de N lojas para um SKU"""
+    
+    def __init__(self, lojas, cenario=None):
+        cenario = cenario or CenarioMock()
+        self.lojas = [f"benchmark{i:06d}" for i in range(lojas)]
+        # Simulações como chegam da VTEX, antes da filtragem das SLAs
+        self.simulacoes = {}
+        self.politicas = {}
+        self.resultados = {}
+        for loja in self.lojas:
+            corpo = montar_payload_simulacao([SKU_BENCHMARK], "1", CEP_BENCHMARK)
+            politicas = extrair_politicas_ativas(gerar_politicas(cenario, loja))
+            inventario = gerar_estoque(cenario, loja, SKU_BENCHMARK)
+            self.simulacoes[loja] = gerar_simulacao(cenario, loja, corpo)
+            self.politicas[loja] = politicas
+            self.resultados[loja] = montar_resultados_skus(
+                [SKU_BENCHMARK], politicas, {SKU_BENCHMARK: inventario},
+                gerar_simulacao(cenario, loja, corpo)
+            )[SKU_BENCHMARK]
+        self.prazos = [
+            sla.get('shippingEstimate', '')
+            for simulacao in self.simulacoes.values()
+            for logistics in simulacao['logisticsInfo']
+            for sla in logistics['slas']
+        ]
+    
+    def copiar_simulacoes(self):
+        """Cópia das simulações na medida em que filtrar_slas_ativas as altera"""
+        return {
+            loja: dict(simulacao, logisticsInfo=[dict(logistics) for logistics in simulacao['logisticsInfo']])
+            for loja, simulacao in self.simulacoes.items()
+        }
+
+
+def _filtrar_slas(fixture, simulacoes):
+    for loja, simulacao in simulacoes.items():
+        filtrar_slas_ativas(simulacao, fixture.politicas[loja])
+
+
+def _coletar_ranking(fixture, _):
+    # utils.coletar_dados_ranking é chamada direto pela aba de ranking, cli.py e servico.py
+    coletar_dados_ranking(fixture.resultados, lambda loja: determinar_tipo_loja(loja, LOJAS_NACIONAIS))
+
+
+def _qualquer_entrega(fixture, _):
+    for resultado in fixture.resultados.values():
+        loja_tem_qualquer_entrega(resultado['simulation'])
+
+
+def _entrega_normal(fixture, _):
+    for resultado in fixture.resultados.values():
+        loja_tem_entrega_normal(resultado['simulation'])
+
+
+def _parse_prazos(fixture, _):
+    for prazo in fixture.prazos:
+        parse_prazo_para_dias(prazo)
+
+
+def _estoque_total(fixture, _):
+    for resultado in fixture.resultados.values():
+        calcular_estoque_total(resultado['inventory'])
+
+
+def _json_resultados(fixture, _):
+    # Mesma serialização de mostrar_resultados na aba JSON
+    json.dumps(fixture.resultados, indent=2, ensure_ascii=False)
+
+
+# nome: (função, preparação não medida de cada execução)
+CASOS = {
+    "filtrar_slas_ativas": (_filtrar_slas, Fixture.copiar_simulacoes),
+    "coletar_dados_ranking": (_coletar_ranking, None),
+    "loja_tem_qualquer_entrega": (_qualquer_entrega, None),
+    "loja_tem_entrega_normal": (_entrega_normal, None),
+    "parse_prazo_para_dias": (_parse_prazos, None),
+    "calcular_estoque_total": (_estoque_total, None),
+    "json_resultados": (_json_resultados, None),
+}
+
+
+def _rodada(funcao, preparar, fixture, execucoes):
+    """Duração de execucoes chamadas da função, sem a preparação e sem o coletor de lixo"""
+    argumentos = [preparar(fixture) if preparar else None for _ in range(execucoes)]
+    gc.collect()
+    gc.disable()
+    try:
+        inicio = time.perf_counter()
+        for argumento in argumentos:
+            funcao(fixture, argumento)
+        return time.perf_counter() - inicio
+    finally:
+        gc.enable()
+
+
+def medir(funcao, preparar, fixture, repeticoes=5, tempo_minimo=TEMPO_MINIMO_RODADA):
+    """Tempos por execução (s) de cada rodada, com execuções suficientes para tempo_minimo"""
+    execucoes = 1
+    while True:
+        duracao = _rodada(funcao, preparar, fixture, execucoes)
+        if duracao >= tempo_minimo:
+            break
+        execucoes *= 2 if duracao * 4 >= tempo_minimo else 10
+    
+    tempos = [duracao / execucoes]
+    for _ in range(repeticoes - 1):
+        tempos.append(_rodada(funcao, preparar, fixture, execucoes) / execucoes)
+    return execucoes, tempos
+
+
+def executar_benchmarks(tamanhos, casos, repeticoes, ao_medir=None):
+    """Mede cada caso para cada número de lojas; retorna a lista de medições"""
+    medicoes = []
+    for tamanho in tamanhos:
+        fixture = Fixture(tamanho)
+        for nome in casos:
+            funcao, preparar = CASOS[nome]
+            execucoes, tempos = medir(funcao, preparar, fixture, repeticoes)
+            mediana = statistics.median(tempos)
+            medicao = {
+                "caso": nome,
+                "lojas": tamanho,
+                "execucoes": execucoes,
+                "repeticoes": repeticoes,
+                "min_s": min(tempos),
+                "mediana_s": mediana,
+                "media_s": statistics.fmean(tempos),
+                "por_loja_us": round(mediana / tamanho * 1e6, 3),
+            }
+            medicoes.append(medicao)
+            if ao_medir:
+                ao_medir(medicao)
+    return medicoes
+
+
+def _commit_atual():
+    try:
+        saida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return saida.stdout.strip() or None
+
+
+def ambiente():
+    """Versão do código e do Python em que os tempos foram medidos"""
+    return {
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "implementacao": platform.python_implementation(),
+        "plataforma": platform.platform(),
+        "processador": platform.machine(),
+    }
+
+
+def comparar(medicoes, anteriores, limiar):
+    """Variação da mediana de cada caso em relação a um arquivo anterior
+    
+    Retorna [(medicao, mediana_anterior, variacao_pct, regressao)] para os
+    casos presentes nos dois arquivos.
+    """
+    por_chave = {(m["caso"], m["lojas"]): m for m in anteriores.get("medicoes", [])}
+    comparacoes = []
+    for medicao in medicoes:
+        anterior = por_chave.get((medicao["caso"], medicao["lojas"]))
+        if not anterior or not anterior.get("mediana_s"):
+            continue
+        variacao = (medicao["mediana_s"] / anterior["mediana_s"] - 1) * 100
+        comparacoes.append((medicao, anterior["mediana_s"], variacao, variacao > limiar))
+    return comparacoes
+
+
+def _formatar_tempo(segundos):
+    if segundos >= 1:
+        return f"{segundos:.2f} s"
+    if segundos >= 1e-3:
+        return f"{segundos * 1e3:.2f} ms"
+    return f"{segundos * 1e6:.1f} µs"
+
+
+def imprimir_medicao(medicao):
+    print(f"  {medicao['caso']:<28} {medicao['lojas']:>6} lojas  "
+          f"{_formatar_tempo(medicao['mediana_s']):>10}  "
+          f"(mín {_formatar_tempo(medicao['min_s'])}, {medicao['por_loja_us']:.3f} µs/loja)")
+
+
+def imprimir_comparacao(comparacoes, limiar, arquivo):
+    print(f"\nComparação com {arquivo} (limiar {limiar:.0f}%):")
+    for medicao, anterior, variacao, regressao in comparacoes:
+        marca = "  REGRESSÃO" if regressao else ""
+        print(f"  {medicao['caso']:<28} {medicao['lojas']:>6} lojas  "
+              f"{_formatar_tempo(anterior):>10} -> {_formatar_tempo(medicao['mediana_s']):>10}  "
+              f"{variacao:+6.1f}%{marca}")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Mede o processamento dos resultados com respostas sintéticas da VTEX"
+    )
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO),
+                        help="Números de lojas (padrão: 10 100 1000 10000)")
+    parser.add_argument("--casos", nargs="+", choices=list(CASOS), default=list(CASOS),
+                        help="Casos a medir (padrão: todos)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Rodadas de cada caso (vale a mediana)")
+    parser.add_argument("--saida", default=ARQUIVO_PADRAO, help="Arquivo JSON com os tempos medidos")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="Resultados de uma versão anterior")
+    parser.add_argument("--limiar", type=float, default=10.0,
+                        help="Aumento da mediana (%%) considerado regressão (padrão: 10)")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.repeticoes < 1 or any(tamanho < 1 for tamanho in args.tamanhos):
+        parser.error("--repeticoes e --tamanhos devem ser positivos")
+    
+    anteriores = None
+    if args.comparar:
+        try:
+            with open(args.comparar, 'r', encoding='utf-8') as f:
+                anteriores = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"não foi possível ler {args.comparar}: {str(e)}")
+    
+    print(f"Benchmark: {len(args.casos)} caso(s), lojas {', '.join(map(str, args.tamanhos))}")
+    medicoes = executar_benchmarks(args.tamanhos, args.casos, args.repeticoes, imprimir_medicao)
+    
+    resultado = {
+        "benchmark": VERSAO_BENCHMARK,
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": ambiente(),
+        "medicoes": medicoes,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em {args.saida}")
+    
+    if anteriores is not None:
+        comparacoes = comparar(medicoes, anteriores, args.limiar)
+        imprimir_comparacao(comparacoes, args.limiar, args.comparar)
+        if any(regressao for *_, regressao in comparacoes):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,18 @@ def create_encrypted_executable():
         'ui_components.py',          # Componentes de UI
         'utils.py',                  # Utilitários
         'threads.py',                # Threads de processamento
+        'transporte.py',             # Pool de conexões HTTP
+        'simulacao.py',              # Regras de simulação compartilhadas
+        'motor_async.py',            # Motor de simulação asyncio
+        'motor_threads.py',          # Motores de simulação e estoque com threads
+        'cache.py',                  # Caches em memória
+        'limitadores.py',            # Controle de concorrência
+        'retentativas.py',           # Política de retentativas
+        'cassete.py',                # Gravação e reprodução de requisições
+        'metricas.py',               # Métricas das requisições
+        'rastreamento.py',           # Rastreamento (spans) da simulação
+        'historico.py',              # Histórico das execuções (SQLite)
+        'comparacao.py',             # Comparação entre simulações
         'splash_screen.py',          # Tela de splash
         'entrega-rapida.ico',        # Ícone
         'VTEX_Logo.svg.png',         # Logo da splash screen
@@ -31,7 +43,10 @@ def create_encrypted_executable():
         'tabs/retirada_tab.py',      # Aba de retirada
         'tabs/estoque_tab.py',       # Aba de estoque
         'tabs/sem_entrega_tab.py',   # Aba sem entrega
-        'tabs/json_tab.py'           # Aba JSON
+        'tabs/json_tab.py',          # Aba JSON
+        'tabs/matriz_tab.py',        # Aba matriz CEP × loja
+        'tabs/historico_tab.py',     # Aba de histórico
+        'tabs/metricas_tab.py'       # Aba de métricas
     ]
     
     # Arquivos opcionais (podem não existir ainda)
@@ -94,7 +109,35 @@ def create_encrypted_executable():
                 "sku_padrao": "149718",
                 "max_skus_recentes": 5,
                 "max_workers": 20,
-                "timeout_requests": 10
+                "timeout_requests": 10,
+                "engine": "threads",
+                "limite_conexoes_async": 200,
+                "ttl_cache_politicas": 3600,
+                "ttl_cache_simulacoes": 300,
+                "max_cache_simulacoes": 5000,
+                "ttl_cache_estoque": 60,
+                "estoque_revalidar_em_segundo_plano": True,
+                "concorrencia_adaptativa": True,
+                "concorrencia_minima": 2,
+                "concorrencia_maxima": 100,
+                "taxa_maxima_por_host": 20,
+                "max_tentativas": 3,
+                "orcamento_retentativas": 200,
+                "requisicoes_hedge": False,
+                "hedge_carga_maxima": 10,
+                "circuito_falhas": 5,
+                "circuito_espera": 30,
+                "deduplicar_requisicoes": True,
+                "servico_porta": 8787,
+                "servico_limite_por_cliente": 2,
+                "cassete_modo": "desligado",
+                "cassete_arquivo": "cassete.jsonl.gz",
+                "cassete_velocidade": "gravada",
+                "metricas_arquivo_prometheus": "",
+                "rastreamento_arquivo": "",
+                "rastreamento_formato": "chrome",
+                "historico_arquivo": "historico_vtex.db",
+                "historico_max_execucoes": 500
             },
             "cores": {
                 "primaria": "#E91E63",
@@ -123,6 +166,18 @@ def create_encrypted_executable():
         '--add-data=ui_components.py;.',
         '--add-data=utils.py;.',
         '--add-data=threads.py;.',
+        '--add-data=transporte.py;.',
+        '--add-data=simulacao.py;.',
+        '--add-data=motor_async.py;.',
+        '--add-data=motor_threads.py;.',
+        '--add-data=cache.py;.',
+        '--add-data=limitadores.py;.',
+        '--add-data=retentativas.py;.',
+        '--add-data=cassete.py;.',
+        '--add-data=metricas.py;.',
+        '--add-data=rastreamento.py;.',
+        '--add-data=historico.py;.',
+        '--add-data=comparacao.py;.',
         '--add-data=splash_screen.py;.',
         
         # Incluir pasta tabs
@@ -148,6 +203,19 @@ def create_encrypted_executable():
         '--hidden-import=ui_components',
         '--hidden-import=utils',
         '--hidden-import=threads',
+        '--hidden-import=transporte',
+        '--hidden-import=simulacao',
+        '--hidden-import=motor_async',
+        '--hidden-import=motor_threads',
+        '--hidden-import=cache',
+        '--hidden-import=limitadores',
+        '--hidden-import=retentativas',
+        '--hidden-import=cassete',
+        '--hidden-import=metricas',
+        '--hidden-import=rastreamento',
+        '--hidden-import=historico',
+        '--hidden-import=comparacao',
+        '--hidden-import=sqlite3',
         '--hidden-import=splash_screen',
         '--hidden-import=tabs.ranking_tab',
         '--hidden-import=tabs.resumo_tab',
@@ -155,6 +223,9 @@ def create_encrypted_executable():
         '--hidden-import=tabs.estoque_tab',
         '--hidden-import=tabs.sem_entrega_tab',
         '--hidden-import=tabs.json_tab',
+        '--hidden-import=tabs.matriz_tab',
+        '--hidden-import=tabs.historico_tab',
+        '--hidden-import=tabs.metricas_tab',
         
         '--clean',                      # Limpar cache
         '--noconfirm',                  # Não confirmar sobrescrita
@@ -0,0 +1,100 @@
+"""
+Caches em memória compartilhados entre execuções
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class CacheTTL:
+    """Cache com expiração por tempo, limite de itens (LRU) e contadores de acertos/falhas"""
+    
+    def __init__(self, ttl, max_itens=None, janela_obsoleta=0):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        # Segundos após o TTL em que o item expirado ainda pode ser lido por obter_obsoleto
+        self.janela_obsoleta = janela_obsoleta
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()  # chave -> (instante_gravacao, valor), do menos ao mais usado
+        self._lock = threading.Lock()
+    
+    def obter(self, chave, padrao=None):
+        """Retorna o valor da chave se ainda estiver válido"""
+        item = self.obter_com_idade(chave)
+        return padrao if item is None else item[0]
+    
+    def obter_com_idade(self, chave):
+        """Retorna (valor, idade_em_segundos) da chave válida, ou None"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                idade = time.monotonic() - item[0]
+                if idade < self.ttl:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return item[1], idade
+                if idade >= self.ttl + self.janela_obsoleta:
+                    del self._itens[chave]
+            self.falhas += 1
+            return None
+    
+    def obter_obsoleto(self, chave):
+        """Como obter_com_idade, mas aceita itens expirados dentro da janela obsoleta"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            idade = time.monotonic() - item[0]
+            if idade >= self.ttl + self.janela_obsoleta:
+                return None
+            return item[1], idade
+    
+    def definir(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+            # Descartar os itens usados há mais tempo acima do limite
+            if self.max_itens is not None:
+                while len(self._itens) > self.max_itens:
+                    self._itens.popitem(last=False)
+    
+    def invalidar(self, chave=None):
+        """Remove uma chave ou, sem argumento, todo o conteúdo"""
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+    
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'itens': len(self._itens)
+            }
+
+
+TTL_POLITICAS_PADRAO = 3600
+TTL_SIMULACOES_PADRAO = 300
+MAX_SIMULACOES_PADRAO = 5000
+TTL_ESTOQUE_PADRAO = 60
+MAX_ESTOQUE_PADRAO = 20000
+JANELA_OBSOLETA_ESTOQUE = 3600
+
+# Políticas de envio ativas por conta (loja)
+cache_politicas = CacheTTL(TTL_POLITICAS_PADRAO)
+
+# Resultado de simular_frete por (loja, sku, CEP normalizado, quantidade)
+cache_simulacoes = CacheTTL(TTL_SIMULACOES_PADRAO, max_itens=MAX_SIMULACOES_PADRAO)
+
+# Inventário por (loja, seller, sku), compartilhado por simulação e consulta de estoque
+cache_estoque = CacheTTL(TTL_ESTOQUE_PADRAO, max_itens=MAX_ESTOQUE_PADRAO, janela_obsoleta=JANELA_OBSOLETA_ESTOQUE)
+
+
+def configurar_caches(configuracoes):
+    """Aplica os TTLs e limites configurados em empresa_config.json"""
+    cache_politicas.ttl = configuracoes.get("ttl_cache_politicas", TTL_POLITICAS_PADRAO)
+    cache_simulacoes.ttl = configuracoes.get("ttl_cache_simulacoes", TTL_SIMULACOES_PADRAO)
+    cache_simulacoes.max_itens = configuracoes.get("max_cache_simulacoes", MAX_SIMULACOES_PADRAO)
+    cache_estoque.ttl = configuracoes.get("ttl_cache_estoque", TTL_ESTOQUE_PADRAO)
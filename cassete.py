@@ -0,0 +1,265 @@
+"""
+Gravação e reprodução das requisições à VTEX (cassete)
+
+No modo "gravar", cada requisição enviada pelos motores é registrada com a
+resposta, o status e a duração em um arquivo JSON Lines comprimido com gzip.
+Os headers de autenticação (X-VTEX-API-AppKey, X-VTEX-API-AppToken) e os
+cookies são substituídos por "***" antes de ir para o arquivo.
+
+No modo "reproduzir", as respostas saem do cassete em vez da rede, na
+duração gravada ou o mais rápido possível, para medir a leitura das
+respostas, o ranking e as abas sem a variação da VTEX.
+"""
+import asyncio
+import atexit
+import gzip
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from requests.structures import CaseInsensitiveDict
+
+from retentativas import FalhaRequisicao, ERRO_CONEXAO
+
+
+MODO_DESLIGADO = "desligado"
+MODO_GRAVAR = "gravar"
+MODO_REPRODUZIR = "reproduzir"
+MODOS = (MODO_DESLIGADO, MODO_GRAVAR, MODO_REPRODUZIR)
+
+VELOCIDADE_GRAVADA = "gravada"
+VELOCIDADE_MAXIMA = "maxima"
+VELOCIDADES = (VELOCIDADE_GRAVADA, VELOCIDADE_MAXIMA)
+
+ARQUIVO_PADRAO = "cassete.jsonl.gz"
+VERSAO_CASSETE = 1
+
+# Entradas acumuladas em memória antes de cada gravação no arquivo
+LIMITE_BUFFER = 200
+
+REDIGIDO = "***"
+HEADERS_REDIGIDOS = {
+    "x-vtex-api-appkey", "x-vtex-api-apptoken", "authorization", "cookie", "set-cookie",
+    "vtexidclientautcookie",
+}
+
+
+def redigir_headers(headers):
+    """Cópia dos headers sem credenciais nem cookies"""
+    return {
+        nome: REDIGIDO if nome.lower() in HEADERS_REDIGIDOS else valor
+        for nome, valor in (headers or {}).items()
+    }
+
+
+def chave_cassete(metodo, url, params=None, corpo=None):
+    """Identifica a requisição no cassete (método, URL, parâmetros e corpo JSON)"""
+    return (
+        metodo.upper(),
+        url,
+        json.dumps(params or {}, sort_keys=True),
+        json.dumps(corpo, sort_keys=True) if corpo is not None else None,
+    )
+
+
+def headers_da_entrada(entrada):
+    return CaseInsensitiveDict(entrada.get("headers") or {})
+
+
+class GravadorCassete:
+    """Registra as requisições e respostas em um cassete
+    
+    As entradas são acrescentadas ao arquivo em blocos (cada bloco é um
+    membro gzip), de modo que o cassete continua legível se o programa
+    for interrompido; gravações seguintes no mesmo arquivo são somadas.
+    """
+    
+    modo = MODO_GRAVAR
+    velocidade = None
+    sem_espera = False
+    
+    def __init__(self, caminho=ARQUIVO_PADRAO, limite_buffer=LIMITE_BUFFER):
+        self.caminho = caminho
+        self.limite_buffer = limite_buffer
+        self.gravadas = 0
+        self._inicio = time.monotonic()
+        self._buffer = [{
+            "cassete": VERSAO_CASSETE,
+            "gravado_em": datetime.now().isoformat(timespec="seconds"),
+        }]
+        self._lock = threading.Lock()
+        atexit.register(self.salvar)
+    
+    def registrar(self, metodo, url, argumentos, inicio, status=None, headers=None, texto=None, erro=None):
+        """Acrescenta uma requisição iniciada em inicio (time.monotonic)
+        
+        argumentos são os da chamada HTTP (params, json, headers); erro é
+        ERRO_TIMEOUT ou ERRO_CONEXAO quando não houve resposta.
+        """
+        entrada = {
+            "metodo": metodo.upper(),
+            "url": url,
+            "params": argumentos.get("params"),
+            "corpo": argumentos.get("json"),
+            "headers_requisicao": redigir_headers(argumentos.get("headers")),
+            "instante": round(inicio - self._inicio, 4),
+            "duracao": round(time.monotonic() - inicio, 4),
+            "status": status,
+            "headers": redigir_headers(dict(headers or {})),
+            "resposta": texto,
+            "erro": erro,
+        }
+        with self._lock:
+            self._buffer.append(entrada)
+            self.gravadas += 1
+            cheio = len(self._buffer) >= self.limite_buffer
+        if cheio:
+            self.salvar()
+    
+    def salvar(self):
+        """Grava no arquivo as entradas acumuladas"""
+        with self._lock:
+            entradas, self._buffer = self._buffer, []
+            if not entradas:
+                return
+            with gzip.open(self.caminho, "at", encoding="utf-8") as arquivo:
+                for entrada in entradas:
+                    arquivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+    
+    def fechar(self):
+        self.salvar()
+        atexit.unregister(self.salvar)
+    
+    def estatisticas(self):
+        return {"modo": self.modo, "arquivo": self.caminho, "gravadas": self.gravadas}
+    
+    def descrever(self):
+        return f"Cassete: {self.gravadas} requisições gravadas em {self.caminho}"
+
+
+def ler_cassete(caminho):
+    """Entradas gravadas no cassete, na ordem em que foram registradas"""
+    entradas = []
+    try:
+        with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                linha = linha.strip()
+                if linha:
+                    entradas.append(json.loads(linha))
+    except EOFError:
+        # Último bloco incompleto (gravação interrompida): vale o que foi lido
+        pass
+    return [entrada for entrada in entradas if "cassete" not in entrada]
+
+
+class ReprodutorCassete:
+    """Responde as requisições com as respostas gravadas no cassete
+    
+    Requisições idênticas recebem as respostas na ordem gravada; esgotadas
+    as gravações, a última se repete. Requisições que não estão no cassete
+    são contadas em "ausentes".
+    """
+    
+    modo = MODO_REPRODUZIR
+    
+    def __init__(self, caminho=ARQUIVO_PADRAO, velocidade=VELOCIDADE_GRAVADA):
+        self.caminho = caminho
+        self.velocidade = velocidade
+        self.reproduzidas = 0
+        self.ausentes = 0
+        self._entradas = {}
+        self._lock = threading.Lock()
+        
+        entradas = ler_cassete(caminho)
+        for entrada in entradas:
+            chave = chave_cassete(entrada["metodo"], entrada["url"], entrada.get("params"), entrada.get("corpo"))
+            self._entradas.setdefault(chave, deque()).append(entrada)
+        self.total = len(entradas)
+    
+    @property
+    def sem_espera(self):
+        """Na velocidade máxima não há espera: nem a latência gravada, nem o ritmo por host, nem o backoff"""
+        return self.velocidade == VELOCIDADE_MAXIMA
+    
+    def _proxima(self, metodo, url, params, corpo):
+        with self._lock:
+            fila = self._entradas.get(chave_cassete(metodo, url, params, corpo))
+            if not fila:
+                self.ausentes += 1
+                return None
+            self.reproduzidas += 1
+            return fila.popleft() if len(fila) > 1 else fila[0]
+    
+    def responder(self, metodo, url, params=None, corpo=None):
+        """Entrada gravada para a requisição (None se ausente), após a duração gravada"""
+        entrada = self._proxima(metodo, url, params, corpo)
+        if entrada is not None and not self.sem_espera:
+            time.sleep(entrada.get("duracao") or 0)
+        return entrada
+    
+    async def responder_async(self, metodo, url, params=None, corpo=None):
+        entrada = self._proxima(metodo, url, params, corpo)
+        if entrada is not None and not self.sem_espera:
+            await asyncio.sleep(entrada.get("duracao") or 0)
+        return entrada
+    
+    def fechar(self):
+        pass
+    
+    def estatisticas(self):
+        return {
+            "modo": self.modo,
+            "arquivo": self.caminho,
+            "reproduzidas": self.reproduzidas,
+            "ausentes": self.ausentes,
+            "total": self.total,
+        }
+    
+    def descrever(self):
+        texto = f"Cassete: {self.reproduzidas} respostas reproduzidas de {self.caminho}"
+        if self.ausentes:
+            texto += f" ({self.ausentes} fora do cassete)"
+        return texto
+
+
+class ErroCassete(Exception):
+    """O cassete de reprodução configurado não pôde ser aberto"""
+
+
+class ForaDoCassete(FalhaRequisicao):
+    """Requisição sem resposta gravada no cassete em reprodução
+    
+    Não chegou a nenhum host: não conta como falha para o disjuntor nem
+    para o limite de concorrência adaptativo.
+    """
+    
+    def __init__(self, metodo, url):
+        super().__init__(ERRO_CONEXAO, f"Requisição fora do cassete: {metodo} {url}")
+
+
+def configurar_cassete(configuracoes, atual=None):
+    """Cassete das configurações (gravador, reprodutor ou None)
+    
+    Mantém o cassete atual se modo, arquivo e velocidade não mudaram. Levanta
+    ErroCassete se o cassete de reprodução não abre: a execução não pode
+    seguir pela rede no lugar da reprodução.
+    """
+    modo = configuracoes.get("cassete_modo", MODO_DESLIGADO)
+    arquivo = configuracoes.get("cassete_arquivo", ARQUIVO_PADRAO) or ARQUIVO_PADRAO
+    velocidade = configuracoes.get("cassete_velocidade", VELOCIDADE_GRAVADA)
+    
+    if atual is not None:
+        if (atual.modo, atual.caminho) == (modo, arquivo) and atual.velocidade in (None, velocidade):
+            return atual
+        atual.fechar()
+    
+    if modo == MODO_GRAVAR:
+        return GravadorCassete(arquivo)
+    if modo == MODO_REPRODUZIR:
+        try:
+            return ReprodutorCassete(arquivo, velocidade)
+        except (OSError, ValueError) as e:
+            raise ErroCassete(f"Erro ao abrir o cassete {arquivo}: {str(e)}") from e
+    return None
@@ -0,0 +1,239 @@
+"""
+Linha de comando do VTEX Freight Calculator (sem interface gráfica)
+
+Executa a mesma simulação da aplicação, sem PySide6, e escreve os
+resultados em NDJSON (um objeto JSON por linha) na saída padrão:
+
+    python cli.py --cep 05372-110 --sku 149718 --lojas trackfield trackfieldtfsp000066
+    python cli.py --cep 05372110 --skus-arquivo skus.txt --lojas-arquivo lojas.txt --ranking
+
+Cada loja gera uma linha {"evento": "resultado", ...} assim que termina;
+com --ranking, o ranking de cada SKU sai no final, e com --metricas, o
+resumo das requisições (p50/p95/p99 por endpoint, lojas mais lentas,
+erros e requisições/s). Com --rastreamento, os spans da execução (um por
+loja e um por chamada à VTEX) são gravados em um arquivo para o Perfetto
+ou o Jaeger. Mensagens de andamento e erros vão para a saída de erro.
+Ctrl+C encerra a execução mantendo os resultados parciais.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import signal
+import sys
+import threading
+import time
+
+from config_manager import ConfigManager
+from cache import configurar_caches
+from transporte import get_transporte, configurar_transporte, workers_para_configuracao
+from cassete import ErroCassete
+from motor_threads import MotorSimulacaoThreads
+from retentativas import ERRO_CANCELADO
+from metricas import exportar_metricas
+from rastreamento import criar_rastreador, rastrear
+from utils import extrair_ceps, resumir_resultado, coletar_dados_ranking
+
+
+def ler_lista(valores, arquivo):
+    """Junta os valores dos argumentos e de um arquivo (um por linha ou separados por vírgula)"""
+    itens = []
+    for valor in valores or []:
+        itens.extend(valor.split(','))
+    if arquivo:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            itens.extend(f.read().replace(',', '\n').splitlines())
+    
+    resultado = []
+    for item in itens:
+        item = item.strip()
+        if item and item not in resultado:
+            resultado.append(item)
+    return resultado
+
+
+def linha_resultado(loja, sku, resultado, config_manager, completo=False):
+    """Objeto NDJSON de uma loja para um SKU"""
+    linha = {
+        'evento': 'resultado',
+        'loja': loja,
+        'nome': config_manager.formatar_nome_loja(loja),
+        'tipo': config_manager.determinar_tipo_loja(loja),
+        'sku': sku,
+        **resumir_resultado(resultado),
+    }
+    if completo:
+        linha['resultado'] = resultado
+    return linha
+
+
+def escrever(objeto):
+    sys.stdout.write(json.dumps(objeto, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def criar_motor(engine, cep, skus, empresa, config, args, cancelamento, rastreador=None):
+    """Motor de threads ou asyncio com os mesmos controles da interface"""
+    argumentos = (
+        cep, skus, empresa.get('app_key', ''), empresa.get('app_token', ''),
+        empresa.get('conta_principal', 'trackfield')
+    )
+    transporte = get_transporte(args.workers or workers_para_configuracao(config))
+    if engine == "asyncio":
+        # Importado só aqui: sem aiohttp, o motor de threads continua disponível
+        from motor_async import MotorSimulacaoAsync, motor_async_disponivel
+        if not motor_async_disponivel():
+            sys.exit("aiohttp não instalado - use --engine threads")
+        return MotorSimulacaoAsync(
+            *argumentos, limite_conexoes=config.get('limite_conexoes_async', 200),
+            timeout=transporte.timeout, transporte=transporte, orcamento=transporte.novo_orcamento(),
+            forcar_atualizacao=args.forcar_atualizacao, cancelamento=cancelamento, rastreador=rastreador
+        )
+    return MotorSimulacaoThreads(
+        *argumentos, max_workers=args.workers or workers_para_configuracao(config),
+        transporte=transporte, forcar_atualizacao=args.forcar_atualizacao, cancelamento=cancelamento,
+        rastreador=rastreador
+    )
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Simula frete em lojas VTEX e escreve os resultados em NDJSON"
+    )
+    parser.add_argument("--cep", required=True, help="CEP de destino (com ou sem hífen)")
+    parser.add_argument("--sku", nargs="+", help="SKU(s) a simular")
+    parser.add_argument("--skus-arquivo", help="Arquivo com um SKU por linha")
+    parser.add_argument("--lojas", nargs="+", help="Lojas a simular (padrão: todas as lojas configuradas)")
+    parser.add_argument("--lojas-arquivo", help="Arquivo com uma loja por linha")
+    parser.add_argument("--config", default="empresa_config.json", help="Arquivo de configuração da empresa")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], help="Motor de execução (padrão: o da configuração)")
+    parser.add_argument("--workers", type=int, help="Número de workers (padrão: o da configuração)")
+    parser.add_argument("--forcar-atualizacao", action="store_true", help="Ignorar os caches")
+    parser.add_argument("--ranking", action="store_true", help="Emitir o ranking de cada SKU no final")
+    parser.add_argument("--completo", action="store_true", help="Incluir a resposta completa de cada loja")
+    parser.add_argument("--metricas", action="store_true", help="Emitir as métricas das requisições no final")
+    parser.add_argument("--prometheus", metavar="ARQUIVO",
+                        help="Exportar as métricas no formato do Prometheus para ARQUIVO (padrão: o da configuração, vazio por padrão)")
+    parser.add_argument("--rastreamento", metavar="ARQUIVO",
+                        help="Arquivo do rastreamento da execução (padrão: o da configuração)")
+    parser.add_argument("--formato-rastreamento", choices=["chrome", "otlp"],
+                        help="Trace Event do Chrome/Perfetto ou OTLP/JSON (padrão: o da configuração)")
+    parser.add_argument("--gravar-cassete", metavar="ARQUIVO", help="Gravar as requisições em um cassete")
+    parser.add_argument("--reproduzir-cassete", metavar="ARQUIVO", help="Responder as requisições com um cassete gravado")
+    parser.add_argument("--velocidade-cassete", choices=["gravada", "maxima"],
+                        help="Reprodução na duração gravada ou o mais rápido possível (padrão: gravada)")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    
+    ceps = extrair_ceps(args.cep)
+    if len(ceps) != 1:
+        parser.error("informe um único CEP válido (00000-000)")
+    cep = ceps[0]
+    
+    skus = ler_lista(args.sku, args.skus_arquivo)
+    if not skus:
+        parser.error("informe ao menos um SKU (--sku ou --skus-arquivo)")
+    
+    # Avisos do ConfigManager não podem se misturar ao NDJSON
+    with contextlib.redirect_stdout(sys.stderr):
+        config_manager = ConfigManager(args.config)
+    empresa = config_manager.get_empresa_info()
+    config = config_manager.get_configuracoes()
+    
+    lojas = ler_lista(args.lojas, args.lojas_arquivo) or config_manager.get_lojas_ids()
+    if not lojas:
+        parser.error("nenhuma loja informada nem configurada")
+    
+    # Opções de cassete da linha de comando valem só para esta execução
+    config = dict(config)
+    if args.gravar_cassete and args.reproduzir_cassete:
+        parser.error("use --gravar-cassete ou --reproduzir-cassete, não os dois")
+    if args.gravar_cassete:
+        config.update(cassete_modo="gravar", cassete_arquivo=args.gravar_cassete)
+    elif args.reproduzir_cassete:
+        config.update(cassete_modo="reproduzir", cassete_arquivo=args.reproduzir_cassete)
+    if args.velocidade_cassete:
+        config["cassete_velocidade"] = args.velocidade_cassete
+    if args.prometheus is not None:
+        config["metricas_arquivo_prometheus"] = args.prometheus
+    if args.rastreamento is not None:
+        config["rastreamento_arquivo"] = args.rastreamento
+    if args.formato_rastreamento:
+        config["rastreamento_formato"] = args.formato_rastreamento
+    
+    try:
+        configurar_transporte(config)
+    except ErroCassete as e:
+        # Sem o cassete pedido, a execução iria para a rede
+        parser.error(str(e))
+    configurar_caches(config)
+    
+    cancelamento = threading.Event()
+    engine = args.engine or config.get('engine', 'threads')
+    rastreador = criar_rastreador(config)
+    motor = criar_motor(engine, cep, skus, empresa, config, args, cancelamento, rastreador)
+    
+    def interromper(signum, frame):
+        # Primeiro Ctrl+C encerra com os resultados parciais; o segundo aborta
+        if cancelamento.is_set():
+            raise KeyboardInterrupt
+        cancelamento.set()
+        print("Cancelando... (Ctrl+C de novo para abortar)", file=sys.stderr)
+    
+    signal.signal(signal.SIGINT, interromper)
+    
+    resultados_por_sku = {sku: {} for sku in skus}
+    
+    def ao_resultado(loja, data):
+        for sku, resultado in data.items():
+            # Chamadas interrompidas pelo Ctrl+C não são resultado da loja
+            if not resultado or resultado.get('error_type') == ERRO_CANCELADO:
+                continue
+            resultados_por_sku[sku][loja] = resultado
+            escrever(linha_resultado(loja, sku, resultado, config_manager, args.completo))
+    
+    def ao_erro(loja, erro):
+        print(f"Erro na loja {loja}: {erro}", file=sys.stderr)
+    
+    print(f"Simulando {len(skus)} SKU(s) em {len(lojas)} lojas para o CEP {cep} ({engine})...", file=sys.stderr)
+    inicio = time.monotonic()
+    with rastrear(rastreador, "execucao", cep=cep, lojas=len(lojas), skus=",".join(skus), engine=engine):
+        if engine == "asyncio":
+            asyncio.run(motor.executar(lojas, ao_erro=ao_erro, ao_resultado=ao_resultado))
+        else:
+            motor.executar(lojas, ao_erro=ao_erro, ao_resultado=ao_resultado)
+    
+    if args.ranking:
+        for sku, resultados in resultados_por_sku.items():
+            escrever({
+                'evento': 'ranking',
+                'sku': sku,
+                'ranking': coletar_dados_ranking(resultados, config_manager.determinar_tipo_loja)
+            })
+    
+    if args.metricas:
+        escrever({'evento': 'metricas', **motor.metricas.resumo()})
+    with contextlib.redirect_stdout(sys.stderr):
+        exportar_metricas(motor.metricas, config)
+    if rastreador is not None:
+        try:
+            print(f"Rastreamento salvo em {rastreador.salvar()}", file=sys.stderr)
+        except OSError as e:
+            print(f"Erro ao salvar o rastreamento: {str(e)}", file=sys.stderr)
+    
+    respondidas = len(resultados_por_sku[skus[0]])
+    print(f"{respondidas}/{len(lojas)} lojas em {time.monotonic() - inicio:.1f}s", file=sys.stderr)
+    cassete = get_transporte().cassete
+    if cassete is not None:
+        cassete.fechar()
+        print(cassete.descrever(), file=sys.stderr)
+    return 130 if cancelamento.is_set() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Comparação entre duas simulações do mesmo SKU e CEP
+
+Compara, loja a loja, o resumo gravado no histórico (historico.py) com a
+melhor SLA do ranking: lojas que ganharam ou perderam cobertura, que
+passaram a falhar ou voltaram a responder, e as variações de preço, prazo
+e transportadora. Não usa os resultados completos, só as linhas por loja.
+"""
+from retentativas import descrever_erro
+
+
+MUDANCA_PERDEU = "perdeu_cobertura"
+MUDANCA_GANHOU = "ganhou_cobertura"
+MUDANCA_FALHA = "falha_consulta"
+MUDANCA_PRESENCA = "presenca"
+MUDANCA_PRECO_PRAZO = "preco_prazo"
+
+# Ordem de exibição dos tipos de mudança (cobertura primeiro)
+PRIORIDADES = {
+    MUDANCA_PERDEU: 0,
+    MUDANCA_GANHOU: 1,
+    MUDANCA_FALHA: 2,
+    MUDANCA_PRESENCA: 3,
+    MUDANCA_PRECO_PRAZO: 4,
+}
+
+# Peso de um dia de prazo na magnitude, em pontos percentuais de preço
+PESO_DIA_PRAZO = 10
+
+
+def _variacao_preco(antes, depois):
+    """(diferença em centavos, variação em %) entre os melhores preços"""
+    delta = depois - antes
+    if antes:
+        return delta, round(delta / antes * 100, 1)
+    # Frete grátis que passou a ser cobrado (ou vice-versa): sem base para a %
+    return delta, None if delta else 0.0
+
+
+def comparar_lojas(antes, depois, loja):
+    """Mudança de uma loja entre duas execuções, ou None se nada mudou
+    
+    antes e depois são as linhas de historico.lojas(); None indica que a
+    loja não estava na execução.
+    """
+    diferenca = {
+        'loja': loja, 'antes': antes, 'depois': depois, 'descricao': '',
+        'delta_preco': None, 'variacao_preco_pct': None, 'delta_prazo': None, 'magnitude': 0.0,
+    }
+    
+    if antes is None or depois is None:
+        diferenca['mudanca'] = MUDANCA_PRESENCA
+        diferenca['descricao'] = "Só na execução nova" if antes is None else "Só na execução anterior"
+        return diferenca
+    
+    # Falha na consulta não é perda de cobertura: a loja pode ter entrega
+    if antes.get('erro') or depois.get('erro'):
+        if bool(antes.get('erro')) == bool(depois.get('erro')):
+            return None
+        diferenca['mudanca'] = MUDANCA_FALHA
+        if depois.get('erro'):
+            diferenca['descricao'] = f"Passou a falhar ({descrever_erro(depois.get('tipo_erro'))})"
+        else:
+            diferenca['descricao'] = "Voltou a responder"
+        return diferenca
+    
+    if bool(antes.get('disponivel')) != bool(depois.get('disponivel')):
+        ganhou = bool(depois.get('disponivel'))
+        diferenca['mudanca'] = MUDANCA_GANHOU if ganhou else MUDANCA_PERDEU
+        diferenca['descricao'] = "Ganhou cobertura" if ganhou else "Perdeu cobertura"
+        diferenca['magnitude'] = float('inf')
+        return diferenca
+    
+    if not depois.get('disponivel'):
+        return None
+    
+    delta_preco, variacao = _variacao_preco(antes.get('preco') or 0, depois.get('preco') or 0)
+    delta_prazo = (depois.get('prazo_dias') or 0) - (antes.get('prazo_dias') or 0)
+    trocou_transportadora = antes.get('transportadora') != depois.get('transportadora')
+    if not delta_preco and not delta_prazo and not trocou_transportadora:
+        return None
+    
+    partes = []
+    if delta_preco:
+        partes.append("Preço subiu" if delta_preco > 0 else "Preço caiu")
+    if delta_prazo:
+        partes.append("prazo aumentou" if delta_prazo > 0 else "prazo diminuiu")
+    if trocou_transportadora:
+        partes.append("transportadora")
+    descricao = ", ".join(partes)
+    
+    diferenca.update(
+        mudanca=MUDANCA_PRECO_PRAZO,
+        descricao=descricao[:1].upper() + descricao[1:],
+        delta_preco=delta_preco,
+        variacao_preco_pct=variacao,
+        delta_prazo=delta_prazo,
+        # Sem base para a % (frete grátis), a mudança de preço conta como 100%
+        magnitude=abs(variacao if variacao is not None else 100.0) + abs(delta_prazo) * PESO_DIA_PRAZO,
+    )
+    return diferenca
+
+
+def comparar_execucoes(antes, depois):
+    """Lojas que mudaram entre duas execuções {loja: linha}, da maior mudança para a menor
+    
+    Cobertura perdida ou ganha vem primeiro; depois falhas de consulta,
+    lojas presentes em só uma das execuções e as variações de preço e
+    prazo pela magnitude (variação % do preço + PESO_DIA_PRAZO por dia).
+    """
+    diferencas = []
+    for loja in antes.keys() | depois.keys():
+        diferenca = comparar_lojas(antes.get(loja), depois.get(loja), loja)
+        if diferenca is not None:
+            diferencas.append(diferenca)
+    
+    diferencas.sort(key=lambda d: (PRIORIDADES[d['mudanca']], -d['magnitude'], d['loja']))
+    return diferencas
+
+
+def resumir_diferencas(diferencas):
+    """Quantidade de lojas por tipo de mudança, com subidas e quedas de preço e prazo"""
+    resumo = {mudanca: 0 for mudanca in PRIORIDADES}
+    resumo.update(preco_subiu=0, preco_caiu=0, prazo_aumentou=0, prazo_diminuiu=0)
+    for diferenca in diferencas:
+        resumo[diferenca['mudanca']] += 1
+        if diferenca['delta_preco']:
+            resumo['preco_subiu' if diferenca['delta_preco'] > 0 else 'preco_caiu'] += 1
+        if diferenca['delta_prazo']:
+            resumo['prazo_aumentou' if diferenca['delta_prazo'] > 0 else 'prazo_diminuiu'] += 1
+    return resumo
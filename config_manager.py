@@ -100,7 +100,35 @@ class ConfigManager:
                 "sku_padrao": "149718",
                 "max_skus_recentes": 5,
                 "max_workers": 20,
-                "timeout_requests": 10
+                "timeout_requests": 10,
+                "engine": "threads",
+                "limite_conexoes_async": 200,
+                "ttl_cache_politicas": 3600,
+                "ttl_cache_simulacoes": 300,
+                "max_cache_simulacoes": 5000,
+                "ttl_cache_estoque": 60,
+                "estoque_revalidar_em_segundo_plano": True,
+                "concorrencia_adaptativa": True,
+                "concorrencia_minima": 2,
+                "concorrencia_maxima": 100,
+                "taxa_maxima_por_host": 20,
+                "max_tentativas": 3,
+                "orcamento_retentativas": 200,
+                "requisicoes_hedge": False,
+                "hedge_carga_maxima": 10,
+                "circuito_falhas": 5,
+                "circuito_espera": 30,
+                "deduplicar_requisicoes": True,
+                "servico_porta": 8787,
+                "servico_limite_por_cliente": 2,
+                "cassete_modo": "desligado",
+                "cassete_arquivo": "cassete.jsonl.gz",
+                "cassete_velocidade": "gravada",
+                "metricas_arquivo_prometheus": "",
+                "rastreamento_arquivo": "",
+                "rastreamento_formato": "chrome",
+                "historico_arquivo": "historico_vtex.db",
+                "historico_max_execucoes": 500
             },
             "cores": {
                 "primaria": "#000000",
@@ -195,6 +195,7 @@ class ConfigDialog(QDialog):
         self.max_workers = QSpinBox()
         self.max_workers.setRange(1, 50)
         self.max_workers.setValue(20)
+        self.max_workers.setToolTip("Lojas consultadas em paralelo pelo motor de threads, também com a concorrência adaptativa")
         config_layout.addRow("Máx Workers:", self.max_workers)
         
         self.timeout = QSpinBox()
@@ -202,6 +203,152 @@ class ConfigDialog(QDialog):
         self.timeout.setValue(10)
         config_layout.addRow("Timeout (segundos):", self.timeout)
         
+        self.engine = QComboBox()
+        self.engine.addItems(["threads", "asyncio"])
+        self.engine.setToolTip("asyncio requer o pacote aiohttp")
+        config_layout.addRow("Motor de Simulação:", self.engine)
+        
+        self.limite_async = QSpinBox()
+        self.limite_async.setRange(10, 2000)
+        self.limite_async.setValue(200)
+        config_layout.addRow("Máx Conexões (asyncio):", self.limite_async)
+        
+        self.ttl_politicas = QSpinBox()
+        self.ttl_politicas.setRange(0, 86400)
+        self.ttl_politicas.setSingleStep(300)
+        self.ttl_politicas.setValue(3600)
+        config_layout.addRow("Cache de Políticas (segundos):", self.ttl_politicas)
+        
+        self.ttl_simulacoes = QSpinBox()
+        self.ttl_simulacoes.setRange(0, 86400)
+        self.ttl_simulacoes.setSingleStep(60)
+        self.ttl_simulacoes.setValue(300)
+        config_layout.addRow("Cache de Simulações (segundos):", self.ttl_simulacoes)
+        
+        self.max_cache_simulacoes = QSpinBox()
+        self.max_cache_simulacoes.setRange(0, 100000)
+        self.max_cache_simulacoes.setSingleStep(500)
+        self.max_cache_simulacoes.setValue(5000)
+        config_layout.addRow("Máx Simulações em Cache:", self.max_cache_simulacoes)
+        
+        self.ttl_estoque = QSpinBox()
+        self.ttl_estoque.setRange(0, 3600)
+        self.ttl_estoque.setSingleStep(30)
+        self.ttl_estoque.setValue(60)
+        config_layout.addRow("Cache de Estoque (segundos):", self.ttl_estoque)
+        
+        self.estoque_revalidar = QCheckBox("Exibir estoque em cache e atualizar em segundo plano")
+        self.estoque_revalidar.setChecked(True)
+        config_layout.addRow("Estoque Instantâneo:", self.estoque_revalidar)
+        
+        self.concorrencia_adaptativa = QCheckBox("Ajustar concorrência pela latência e respostas 429")
+        self.concorrencia_adaptativa.setChecked(True)
+        config_layout.addRow("Concorrência Adaptativa:", self.concorrencia_adaptativa)
+        
+        self.concorrencia_minima = QSpinBox()
+        self.concorrencia_minima.setRange(1, 50)
+        self.concorrencia_minima.setValue(2)
+        config_layout.addRow("Concorrência Mínima:", self.concorrencia_minima)
+        
+        self.concorrencia_maxima = QSpinBox()
+        self.concorrencia_maxima.setRange(1, 500)
+        self.concorrencia_maxima.setValue(100)
+        self.concorrencia_maxima.setToolTip("Teto do limitador adaptativo; não aumenta o número de workers")
+        config_layout.addRow("Concorrência Máxima:", self.concorrencia_maxima)
+        
+        self.taxa_por_host = QSpinBox()
+        self.taxa_por_host.setRange(0, 1000)
+        self.taxa_por_host.setValue(20)
+        self.taxa_por_host.setToolTip("0 = sem limite próprio, apenas os headers de rate limit da VTEX")
+        config_layout.addRow("Requisições/s por Loja:", self.taxa_por_host)
+        
+        self.max_tentativas = QSpinBox()
+        self.max_tentativas.setRange(1, 10)
+        self.max_tentativas.setValue(3)
+        config_layout.addRow("Tentativas por Requisição:", self.max_tentativas)
+        
+        self.orcamento_retentativas = QSpinBox()
+        self.orcamento_retentativas.setRange(0, 10000)
+        self.orcamento_retentativas.setValue(200)
+        self.orcamento_retentativas.setToolTip("Máximo de retentativas somadas em uma simulação")
+        config_layout.addRow("Retentativas por Execução:", self.orcamento_retentativas)
+        
+        self.requisicoes_hedge = QCheckBox("Duplicar requisições mais lentas que o p90 da loja")
+        config_layout.addRow("Requisições Hedge:", self.requisicoes_hedge)
+        
+        self.hedge_carga_maxima = QSpinBox()
+        self.hedge_carga_maxima.setRange(1, 100)
+        self.hedge_carga_maxima.setValue(10)
+        self.hedge_carga_maxima.setSuffix(" %")
+        self.hedge_carga_maxima.setToolTip("Máximo de duplicatas em relação ao total de requisições")
+        config_layout.addRow("Carga Extra Máxima (hedge):", self.hedge_carga_maxima)
+        
+        self.circuito_falhas = QSpinBox()
+        self.circuito_falhas.setRange(0, 100)
+        self.circuito_falhas.setValue(5)
+        self.circuito_falhas.setToolTip("Falhas consecutivas que abrem o circuito da loja (0 = desligado)")
+        config_layout.addRow("Falhas para Abrir Circuito:", self.circuito_falhas)
+        
+        self.circuito_espera = QSpinBox()
+        self.circuito_espera.setRange(1, 3600)
+        self.circuito_espera.setValue(30)
+        config_layout.addRow("Circuito Aberto (segundos):", self.circuito_espera)
+        
+        self.deduplicar_requisicoes = QCheckBox("Compartilhar requisições idênticas em andamento")
+        self.deduplicar_requisicoes.setChecked(True)
+        config_layout.addRow("Deduplicar Requisições:", self.deduplicar_requisicoes)
+        
+        self.servico_porta = QSpinBox()
+        self.servico_porta.setRange(1, 65535)
+        self.servico_porta.setValue(8787)
+        self.servico_porta.setToolTip("Porta do serviço HTTP local (servico.py)")
+        config_layout.addRow("Porta do Serviço HTTP:", self.servico_porta)
+        
+        self.servico_limite_por_cliente = QSpinBox()
+        self.servico_limite_por_cliente.setRange(0, 100)
+        self.servico_limite_por_cliente.setValue(2)
+        self.servico_limite_por_cliente.setToolTip("Consultas simultâneas por cliente do serviço HTTP (0 = sem limite)")
+        config_layout.addRow("Consultas por Cliente:", self.servico_limite_por_cliente)
+        
+        self.cassete_modo = QComboBox()
+        self.cassete_modo.addItems(["desligado", "gravar", "reproduzir"])
+        self.cassete_modo.setToolTip("Gravar as requisições à VTEX ou responder com uma gravação anterior")
+        config_layout.addRow("Cassete de Requisições:", self.cassete_modo)
+        
+        self.cassete_arquivo = QLineEdit()
+        self.cassete_arquivo.setPlaceholderText("cassete.jsonl.gz")
+        config_layout.addRow("Arquivo do Cassete:", self.cassete_arquivo)
+        
+        self.cassete_velocidade = QComboBox()
+        self.cassete_velocidade.addItems(["gravada", "maxima"])
+        self.cassete_velocidade.setToolTip("Reproduzir na duração gravada ou o mais rápido possível")
+        config_layout.addRow("Velocidade da Reprodução:", self.cassete_velocidade)
+        
+        self.metricas_arquivo = QLineEdit()
+        self.metricas_arquivo.setPlaceholderText("vazio = não exportar (ex.: metricas_vtex.prom)")
+        self.metricas_arquivo.setToolTip("Arquivo com as métricas da última execução no formato texto do Prometheus")
+        config_layout.addRow("Métricas (Prometheus):", self.metricas_arquivo)
+        
+        self.rastreamento_arquivo = QLineEdit()
+        self.rastreamento_arquivo.setPlaceholderText("vazio = não rastrear")
+        self.rastreamento_arquivo.setToolTip("Arquivo com os spans da última simulação (um por loja e por chamada à VTEX)")
+        config_layout.addRow("Rastreamento:", self.rastreamento_arquivo)
+        
+        self.rastreamento_formato = QComboBox()
+        self.rastreamento_formato.addItems(["chrome", "otlp"])
+        self.rastreamento_formato.setToolTip("chrome: Perfetto/chrome://tracing; otlp: OpenTelemetry JSON (Jaeger)")
+        config_layout.addRow("Formato do Rastreamento:", self.rastreamento_formato)
+        
+        self.historico_arquivo = QLineEdit()
+        self.historico_arquivo.setPlaceholderText("vazio = não gravar histórico")
+        self.historico_arquivo.setToolTip("Banco SQLite com as simulações e consultas de estoque anteriores")
+        config_layout.addRow("Histórico (SQLite):", self.historico_arquivo)
+        
+        self.historico_max = QSpinBox()
+        self.historico_max.setRange(10, 100000)
+        self.historico_max.setToolTip("Execuções mantidas no histórico; as mais antigas são descartadas")
+        config_layout.addRow("Execuções no Histórico:", self.historico_max)
+        
         layout.addWidget(config_group)
         layout.addStretch()
         
@@ -231,6 +378,34 @@ class ConfigDialog(QDialog):
         self.max_skus.setValue(config.get("max_skus_recentes", 5))
         self.max_workers.setValue(config.get("max_workers", 20))
         self.timeout.setValue(config.get("timeout_requests", 10))
+        self.engine.setCurrentText(config.get("engine", "threads"))
+        self.limite_async.setValue(config.get("limite_conexoes_async", 200))
+        self.ttl_politicas.setValue(config.get("ttl_cache_politicas", 3600))
+        self.ttl_simulacoes.setValue(config.get("ttl_cache_simulacoes", 300))
+        self.max_cache_simulacoes.setValue(config.get("max_cache_simulacoes", 5000))
+        self.ttl_estoque.setValue(config.get("ttl_cache_estoque", 60))
+        self.estoque_revalidar.setChecked(config.get("estoque_revalidar_em_segundo_plano", True))
+        self.concorrencia_adaptativa.setChecked(config.get("concorrencia_adaptativa", True))
+        self.concorrencia_minima.setValue(config.get("concorrencia_minima", 2))
+        self.concorrencia_maxima.setValue(config.get("concorrencia_maxima", 100))
+        self.taxa_por_host.setValue(config.get("taxa_maxima_por_host", 20))
+        self.max_tentativas.setValue(config.get("max_tentativas", 3))
+        self.orcamento_retentativas.setValue(config.get("orcamento_retentativas", 200))
+        self.requisicoes_hedge.setChecked(config.get("requisicoes_hedge", False))
+        self.hedge_carga_maxima.setValue(config.get("hedge_carga_maxima", 10))
+        self.circuito_falhas.setValue(config.get("circuito_falhas", 5))
+        self.circuito_espera.setValue(config.get("circuito_espera", 30))
+        self.deduplicar_requisicoes.setChecked(config.get("deduplicar_requisicoes", True))
+        self.servico_porta.setValue(config.get("servico_porta", 8787))
+        self.servico_limite_por_cliente.setValue(config.get("servico_limite_por_cliente", 2))
+        self.cassete_modo.setCurrentText(config.get("cassete_modo", "desligado"))
+        self.cassete_arquivo.setText(config.get("cassete_arquivo", "cassete.jsonl.gz"))
+        self.cassete_velocidade.setCurrentText(config.get("cassete_velocidade", "gravada"))
+        self.metricas_arquivo.setText(config.get("metricas_arquivo_prometheus", ""))
+        self.rastreamento_arquivo.setText(config.get("rastreamento_arquivo", ""))
+        self.rastreamento_formato.setCurrentText(config.get("rastreamento_formato", "chrome"))
+        self.historico_arquivo.setText(config.get("historico_arquivo", "historico_vtex.db"))
+        self.historico_max.setValue(config.get("historico_max_execucoes", 500))
     
     def load_lojas_table(self):
         """Carrega tabela de lojas simplificada"""
@@ -406,9 +581,38 @@ class ConfigDialog(QDialog):
                 "sku_padrao": self.sku_padrao.text(),
                 "max_skus_recentes": self.max_skus.value(),
                 "max_workers": self.max_workers.value(),
-                "timeout_requests": self.timeout.value()
+                "timeout_requests": self.timeout.value(),
+                "engine": self.engine.currentText(),
+                "limite_conexoes_async": self.limite_async.value(),
+                "ttl_cache_politicas": self.ttl_politicas.value(),
+                "ttl_cache_simulacoes": self.ttl_simulacoes.value(),
+                "max_cache_simulacoes": self.max_cache_simulacoes.value(),
+                "ttl_cache_estoque": self.ttl_estoque.value(),
+                "estoque_revalidar_em_segundo_plano": self.estoque_revalidar.isChecked(),
+                "concorrencia_adaptativa": self.concorrencia_adaptativa.isChecked(),
+                "concorrencia_minima": self.concorrencia_minima.value(),
+                "concorrencia_maxima": self.concorrencia_maxima.value(),
+                "taxa_maxima_por_host": self.taxa_por_host.value(),
+                "max_tentativas": self.max_tentativas.value(),
+                "orcamento_retentativas": self.orcamento_retentativas.value(),
+                "requisicoes_hedge": self.requisicoes_hedge.isChecked(),
+                "hedge_carga_maxima": self.hedge_carga_maxima.value(),
+                "circuito_falhas": self.circuito_falhas.value(),
+                "circuito_espera": self.circuito_espera.value(),
+                "deduplicar_requisicoes": self.deduplicar_requisicoes.isChecked(),
+                "servico_porta": self.servico_porta.value(),
+                "servico_limite_por_cliente": self.servico_limite_por_cliente.value(),
+                "cassete_modo": self.cassete_modo.currentText(),
+                "cassete_arquivo": self.cassete_arquivo.text().strip() or "cassete.jsonl.gz",
+                "cassete_velocidade": self.cassete_velocidade.currentText(),
+                "metricas_arquivo_prometheus": self.metricas_arquivo.text().strip(),
+                "rastreamento_arquivo": self.rastreamento_arquivo.text().strip(),
+                "rastreamento_formato": self.rastreamento_formato.currentText(),
+                "historico_arquivo": self.historico_arquivo.text().strip(),
+                "historico_max_execucoes": self.historico_max.value()
             }
-            self.config_manager.config["configuracoes"] = config_data
+            # Atualizar sem descartar chaves que não aparecem nesta tela
+            self.config_manager.config.setdefault("configuracoes", {}).update(config_data)
             
             # Salvar arquivo
             if self.config_manager.save_config():
@@ -0,0 +1,377 @@
+"""
+Histórico das execuções (simulações e consultas de estoque) em SQLite
+
+Cada execução concluída é gravada por uma thread própria, fora da
+interface: os resultados completos (JSON comprimido, para reabrir nas abas
+sem consultar a VTEX de novo) e um resumo por loja com a melhor SLA do
+ranking (preço, prazo, transportadora), estoque, erro e o tempo somado das
+requisições da loja. As execuções são indexadas por SKU, CEP e data.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from contextlib import closing
+
+from retentativas import ERRO_CANCELADO, descrever_erro
+from utils import resumir_resultado, extrair_ceps
+
+
+TIPO_SIMULACAO = "simulacao"
+TIPO_ESTOQUE = "estoque"
+
+ARQUIVO_PADRAO = "historico_vtex.db"
+MAX_EXECUCOES_PADRAO = 500
+VERSAO_ESQUEMA = 2
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    lote TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    cep TEXT,
+    executado_em REAL NOT NULL,
+    duracao_s REAL,
+    engine TEXT,
+    lojas INTEGER NOT NULL,
+    com_entrega INTEGER,
+    com_falha INTEGER NOT NULL,
+    cancelada INTEGER NOT NULL DEFAULT 0,
+    resultados BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_execucoes_sku_cep ON execucoes (sku, cep, executado_em);
+CREATE INDEX IF NOT EXISTS idx_execucoes_cep ON execucoes (cep, executado_em);
+CREATE INDEX IF NOT EXISTS idx_execucoes_data ON execucoes (executado_em);
+CREATE INDEX IF NOT EXISTS idx_execucoes_lote ON execucoes (lote);
+
+CREATE TABLE IF NOT EXISTS lojas_execucao (
+    execucao_id INTEGER NOT NULL,
+    loja TEXT NOT NULL,
+    disponivel INTEGER,
+    preco INTEGER,
+    prazo TEXT,
+    prazo_dias INTEGER,
+    transportadora TEXT,
+    estoque INTEGER,
+    erro TEXT,
+    tipo_erro TEXT,
+    requisicoes INTEGER,
+    compartilhadas INTEGER,
+    tempo_ms REAL,
+    PRIMARY KEY (execucao_id, loja)
+);
+CREATE INDEX IF NOT EXISTS idx_lojas_execucao_loja ON lojas_execucao (loja, execucao_id);
+"""
+
+COLUNAS_EXECUCAO = (
+    "id", "tipo", "lote", "sku", "cep", "executado_em", "duracao_s", "engine",
+    "lojas", "com_entrega", "com_falha", "cancelada"
+)
+COLUNAS_LOJA = (
+    "loja", "disponivel", "preco", "prazo", "prazo_dias", "transportadora",
+    "estoque", "erro", "tipo_erro", "requisicoes", "compartilhadas", "tempo_ms"
+)
+
+# Migrações do esquema a partir de cada versão anterior
+MIGRACOES = {
+    1: "ALTER TABLE lojas_execucao ADD COLUMN compartilhadas INTEGER",
+}
+
+
+def formatar_cep(cep):
+    """CEP no formato 00000-000, para que 05372110 e 05372-110 sejam o mesmo no índice"""
+    ceps = extrair_ceps(cep or "")
+    return ceps[0] if ceps else cep
+
+
+def comprimir_resultados(resultados):
+    return zlib.compress(json.dumps(resultados, ensure_ascii=False).encode('utf-8'), 6)
+
+
+def descomprimir_resultados(dados):
+    return json.loads(zlib.decompress(dados).decode('utf-8'))
+
+
+def resumir_lojas_simulacao(resultados, tempos=None):
+    """Linhas por loja de uma simulação: a melhor SLA do ranking, estoque, erro e tempo"""
+    tempos = tempos or {}
+    linhas = []
+    for loja, resultado in resultados.items():
+        # Mesma melhor opção exibida no ranking (menor preço entre as entregas)
+        resumo = resumir_resultado(resultado)
+        requisicoes, compartilhadas, tempo = tempos.get(loja, (None, None, None))
+        linhas.append((
+            loja,
+            1 if resumo['disponivel'] else 0,
+            resumo['preco'],
+            resumo['prazo_str'],
+            resumo['prazo_dias'],
+            resumo['transportadora'],
+            resumo['estoque'],
+            resumo['erro'],
+            resumo['tipo_erro'],
+            requisicoes,
+            compartilhadas,
+            round(tempo * 1000, 1) if tempo is not None else None,
+        ))
+    return linhas
+
+
+def resumir_lojas_estoque(resultados, tempos=None):
+    """Linhas por loja de uma consulta de estoque"""
+    tempos = tempos or {}
+    linhas = []
+    for loja, estoque in resultados.items():
+        requisicoes, compartilhadas, tempo = tempos.get(loja, (None, None, None))
+        # A consulta de estoque guarda em 'erro' a classe da falha (retentativas.py)
+        tipo_erro = estoque.get('erro') or None
+        linhas.append((
+            loja, None, None, None, None, None,
+            estoque.get('total', 0),
+            f"Falha na consulta: {descrever_erro(tipo_erro)}" if tipo_erro else None,
+            tipo_erro,
+            requisicoes,
+            compartilhadas,
+            round(tempo * 1000, 1) if tempo is not None else None,
+        ))
+    return linhas
+
+
+class HistoricoExecucoes:
+    """Banco SQLite do histórico com gravação em segundo plano
+    
+    registrar_simulacao e registrar_estoque só enfileiram a execução; a
+    thread de gravação resume, comprime e grava em lote, e descarta as
+    execuções mais antigas além de max_execucoes. As consultas abrem uma
+    conexão própria (o banco fica em modo WAL, leitura e gravação não se
+    bloqueiam). Falhas de gravação vão para ao_erro(mensagem), chamada na
+    thread de gravação.
+    """
+    
+    def __init__(self, caminho=ARQUIVO_PADRAO, max_execucoes=MAX_EXECUCOES_PADRAO, ao_erro=None):
+        self.caminho = caminho
+        self.max_execucoes = max_execucoes
+        self.ao_erro = ao_erro
+        self._fila = queue.Queue()
+        
+        with closing(self._conectar()) as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+            # Banco novo (versão 0) já nasce com o esquema atual
+            for origem in range(versao, VERSAO_ESQUEMA) if versao else ():
+                conexao.execute(MIGRACOES[origem])
+            conexao.executescript(ESQUEMA)
+            conexao.execute(f"PRAGMA user_version={VERSAO_ESQUEMA}")
+        
+        self._thread = threading.Thread(target=self._gravar, name="historico", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+    
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=10)
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+    
+    def registrar_simulacao(self, resultados_por_sku, cep, metricas=None, engine=None, cancelada=False):
+        """Enfileira uma simulação {sku: {loja: resultado}}
+        
+        Cada SKU vira uma execução; os SKUs de uma simulação multi-SKU
+        compartilham o lote e são reabertos juntos.
+        """
+        tempos = metricas.tempos_por_loja() if metricas is not None else None
+        duracao = metricas.duracao if metricas is not None else None
+        lote, executado_em = os.urandom(8).hex(), time.time()
+        for sku, resultados in resultados_por_sku.items():
+            # Chamadas interrompidas pelo cancelamento não são resultado da loja
+            resultados = {
+                loja: resultado for loja, resultado in resultados.items()
+                if resultado and resultado.get('error_type') != ERRO_CANCELADO
+            }
+            if resultados:
+                self._fila.put((
+                    TIPO_SIMULACAO, lote, sku, formatar_cep(cep), executado_em, duracao, engine, cancelada,
+                    resultados, tempos
+                ))
+    
+    def registrar_estoque(self, sku, resultados, metricas=None, cancelada=False):
+        """Enfileira uma consulta de estoque {loja: {'total', 'principal', 'erro'}}"""
+        if resultados:
+            tempos = metricas.tempos_por_loja() if metricas is not None else None
+            duracao = metricas.duracao if metricas is not None else None
+            self._fila.put((
+                TIPO_ESTOQUE, os.urandom(8).hex(), sku, None, time.time(), duracao, None, cancelada,
+                dict(resultados), tempos
+            ))
+    
+    def _gravar(self):
+        conexao = self._conectar()
+        try:
+            while True:
+                item = self._fila.get()
+                # Junta no mesmo commit o que chegou enquanto o anterior era gravado
+                itens = [item]
+                while item is not None:
+                    try:
+                        item = self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    itens.append(item)
+                
+                execucoes = [i for i in itens if i is not None]
+                if execucoes:
+                    try:
+                        with conexao:
+                            for execucao in execucoes:
+                                self._inserir(conexao, execucao)
+                            self._descartar_antigas(conexao)
+                    except (sqlite3.Error, ValueError, TypeError) as e:
+                        _avisar(self.ao_erro, f"Erro ao gravar o histórico em {self.caminho}: {str(e)}")
+                
+                for _ in itens:
+                    self._fila.task_done()
+                if None in itens:
+                    return
+        finally:
+            conexao.close()
+    
+    def _inserir(self, conexao, execucao):
+        tipo, lote, sku, cep, executado_em, duracao, engine, cancelada, resultados, tempos = execucao
+        if tipo == TIPO_SIMULACAO:
+            linhas = resumir_lojas_simulacao(resultados, tempos)
+            com_entrega = sum(linha[1] for linha in linhas)
+        else:
+            linhas = resumir_lojas_estoque(resultados, tempos)
+            com_entrega = None
+        com_falha = sum(1 for linha in linhas if linha[7])
+        
+        cursor = conexao.execute(
+            "INSERT INTO execucoes (tipo, lote, sku, cep, executado_em, duracao_s, engine, lojas, "
+            "com_entrega, com_falha, cancelada, resultados) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tipo, lote, sku, cep, executado_em, duracao, engine, len(linhas), com_entrega, com_falha,
+             int(cancelada), comprimir_resultados(resultados))
+        )
+        execucao_id = cursor.lastrowid
+        conexao.executemany(
+            f"INSERT INTO lojas_execucao (execucao_id, {', '.join(COLUNAS_LOJA)}) "
+            f"VALUES (?{', ?' * len(COLUNAS_LOJA)})",
+            [(execucao_id, *linha) for linha in linhas]
+        )
+    
+    def _descartar_antigas(self, conexao):
+        if not self.max_execucoes:
+            return
+        antigas = [linha[0] for linha in conexao.execute(
+            "SELECT id FROM execucoes ORDER BY executado_em DESC, id DESC LIMIT -1 OFFSET ?",
+            (self.max_execucoes,)
+        )]
+        if antigas:
+            conexao.executemany("DELETE FROM lojas_execucao WHERE execucao_id = ?", [(i,) for i in antigas])
+            conexao.executemany("DELETE FROM execucoes WHERE id = ?", [(i,) for i in antigas])
+    
+    def aguardar(self):
+        """Bloqueia até as execuções enfileiradas serem gravadas"""
+        self._fila.join()
+    
+    def fechar(self):
+        """Grava o que estiver na fila e encerra a thread de gravação"""
+        if self._thread.is_alive():
+            self._fila.put(None)
+            self._thread.join(timeout=10)
+        atexit.unregister(self.fechar)
+    
+    def listar(self, sku=None, cep=None, tipo=None, limite=200):
+        """Execuções mais recentes primeiro, filtradas por SKU, CEP e tipo (sem os resultados)"""
+        condicoes, parametros = [], []
+        for coluna, valor in (("sku", sku), ("cep", formatar_cep(cep)), ("tipo", tipo)):
+            if valor:
+                condicoes.append(f"{coluna} = ?")
+                parametros.append(valor)
+        where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_EXECUCAO)} FROM execucoes {where}"
+                "ORDER BY executado_em DESC, id DESC LIMIT ?",
+                (*parametros, limite)
+            ).fetchall()
+        return [dict(zip(COLUNAS_EXECUCAO, linha)) for linha in linhas]
+    
+    def obter(self, execucao_id):
+        """Execução com os resultados completos, ou None"""
+        with closing(self._conectar()) as conexao:
+            linha = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_EXECUCAO)}, resultados FROM execucoes WHERE id = ?",
+                (execucao_id,)
+            ).fetchone()
+        if linha is None:
+            return None
+        execucao = dict(zip(COLUNAS_EXECUCAO, linha))
+        execucao['resultados'] = descomprimir_resultados(linha[-1])
+        return execucao
+    
+    def obter_lote(self, lote):
+        """Execuções do mesmo lote (os SKUs de uma simulação multi-SKU), com os resultados"""
+        with closing(self._conectar()) as conexao:
+            ids = [linha[0] for linha in conexao.execute(
+                "SELECT id FROM execucoes WHERE lote = ? ORDER BY id", (lote,)
+            )]
+        return [self.obter(execucao_id) for execucao_id in ids]
+    
+    def anterior(self, execucao):
+        """Execução imediatamente anterior do mesmo tipo, SKU e CEP (sem os resultados), ou None"""
+        with closing(self._conectar()) as conexao:
+            linha = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_EXECUCAO)} FROM execucoes "
+                "WHERE tipo = ? AND sku = ? AND cep IS ? AND (executado_em < ? OR (executado_em = ? AND id < ?)) "
+                "ORDER BY executado_em DESC, id DESC LIMIT 1",
+                (execucao['tipo'], execucao['sku'], execucao['cep'],
+                 execucao['executado_em'], execucao['executado_em'], execucao['id'])
+            ).fetchone()
+        return dict(zip(COLUNAS_EXECUCAO, linha)) if linha else None
+    
+    def lojas(self, execucao_id):
+        """Resumo {loja: {...}} de cada loja da execução, sem descomprimir os resultados"""
+        with closing(self._conectar()) as conexao:
+            linhas = conexao.execute(
+                f"SELECT {', '.join(COLUNAS_LOJA)} FROM lojas_execucao WHERE execucao_id = ?",
+                (execucao_id,)
+            ).fetchall()
+        return {linha[0]: dict(zip(COLUNAS_LOJA, linha)) for linha in linhas}
+
+
+def _avisar(ao_erro, mensagem):
+    """Entrega o erro a ao_erro(mensagem) ou, sem ela, à saída de erro"""
+    if ao_erro is not None:
+        ao_erro(mensagem)
+    else:
+        print(mensagem, file=sys.stderr)
+
+
+def configurar_historico(configuracoes, atual=None, ao_erro=None):
+    """Histórico das configurações, ou None com o histórico desligado (arquivo vazio)
+    
+    Mantém o histórico atual se o arquivo não mudou. Erros de abertura e de
+    gravação vão para ao_erro(mensagem).
+    """
+    caminho = configuracoes.get("historico_arquivo", ARQUIVO_PADRAO)
+    max_execucoes = configuracoes.get("historico_max_execucoes", MAX_EXECUCOES_PADRAO)
+    
+    if atual is not None:
+        if atual.caminho == caminho:
+            atual.max_execucoes = max_execucoes
+            atual.ao_erro = ao_erro
+            return atual
+        atual.fechar()
+    
+    if not caminho:
+        return None
+    try:
+        return HistoricoExecucoes(caminho, max_execucoes, ao_erro)
+    except sqlite3.Error as e:
+        _avisar(ao_erro, f"Erro ao abrir o histórico {caminho}: {str(e)}")
+        return None
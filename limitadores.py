@@ -0,0 +1,400 @@
+"""
+Controle de concorrência das requisições à VTEX
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from retentativas import FalhaRequisicao, ERRO_CIRCUITO
+
+
+# Pausa máxima de um host pedida pelos headers (Retry-After, X-RateLimit-Reset)
+PAUSA_MAXIMA = 300.0
+
+# X-RateLimit-Reset acima disto é um instante epoch, não segundos até o reset
+INICIO_EPOCH_RESET = 1e9
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de uma lista de valores, por posição na lista ordenada"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class LimitadorAdaptativo:
+    """Limite de requisições em voo ajustado por AIMD
+    
+    O limite cresce 1 unidade a cada "rodada" (limite respostas concluídas)
+    enquanto o p95 de latência se mantém estável, e é reduzido
+    multiplicativamente em respostas 429/503, timeouts ou picos de latência.
+    """
+    
+    STATUS_SOBRECARGA = (429, 503)
+    
+    def __init__(self, limite_inicial=20, limite_minimo=2, limite_maximo=100,
+                 fator_reducao=0.7, tolerancia_latencia=2.0, intervalo_reducao=1.0):
+        self.limite_minimo = limite_minimo
+        self.limite_maximo = limite_maximo
+        self.limite = float(min(max(limite_inicial, limite_minimo), limite_maximo))
+        self.fator_reducao = fator_reducao
+        self.tolerancia_latencia = tolerancia_latencia
+        self.intervalo_reducao = intervalo_reducao
+        self.ativo = True
+        
+        self.em_voo = 0
+        self._amostras = deque(maxlen=200)
+        self._concluidas_na_rodada = 0
+        self._p95_referencia = None
+        self._ultima_reducao = 0.0
+        self._cond = threading.Condition()
+    
+    def limite_atual(self):
+        """Número máximo de requisições simultâneas neste momento"""
+        if not self.ativo:
+            return float('inf')
+        return int(self.limite)
+    
+    def adquirir(self):
+        """Bloqueia até haver vaga abaixo do limite atual"""
+        with self._cond:
+            while self.em_voo >= self.limite_atual():
+                self._cond.wait()
+            self.em_voo += 1
+    
+    def liberar(self, duracao, status=None, falha=False):
+        """Libera a vaga e registra o resultado da requisição"""
+        with self._cond:
+            self.em_voo -= 1
+            self._registrar(duracao, status, falha)
+            self._cond.notify_all()
+    
+    def devolver(self):
+        """Libera a vaga sem registrar resultado (requisição que não chegou ao host)"""
+        with self._cond:
+            self.em_voo -= 1
+            self._cond.notify_all()
+    
+    def registrar(self, duracao, status=None, falha=False):
+        """Registra o resultado de uma requisição controlada fora deste objeto"""
+        with self._cond:
+            self._registrar(duracao, status, falha)
+            self._cond.notify_all()
+    
+    def _registrar(self, duracao, status, falha):
+        if falha or status in self.STATUS_SOBRECARGA:
+            self._reduzir()
+            return
+        
+        self._amostras.append(duracao)
+        self._concluidas_na_rodada += 1
+        if self._concluidas_na_rodada < self.limite_atual():
+            return
+        
+        # Fim de uma rodada: comparar o p95 recente com a referência
+        self._concluidas_na_rodada = 0
+        p95 = percentil(list(self._amostras)[-max(int(self.limite), 10):], 95)
+        if self._p95_referencia is None:
+            self._p95_referencia = p95
+        
+        # Referência acompanha lentamente a latência do serviço, de modo que
+        # uma mudança permanente não mantenha o limite no mínimo para sempre
+        pico = p95 > self._p95_referencia * self.tolerancia_latencia
+        self._p95_referencia = 0.9 * self._p95_referencia + 0.1 * p95
+        if pico:
+            self._reduzir()
+            return
+        
+        self.limite = min(self.limite + 1, self.limite_maximo)
+    
+    def _reduzir(self):
+        # Uma rajada de 429 conta como um único sinal de sobrecarga
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < self.intervalo_reducao:
+            return
+        self._ultima_reducao = agora
+        self._concluidas_na_rodada = 0
+        self.limite = max(self.limite * self.fator_reducao, self.limite_minimo)
+
+
+def segundos_retry_after(valor):
+    """Converte o header Retry-After (segundos ou data HTTP) em segundos de espera"""
+    if not valor:
+        return None
+    try:
+        return min(max(float(valor), 0.0), PAUSA_MAXIMA)
+    except ValueError:
+        pass
+    try:
+        instante = parsedate_to_datetime(valor)
+        return min(max((instante - datetime.now(timezone.utc)).total_seconds(), 0.0), PAUSA_MAXIMA)
+    except (TypeError, ValueError):
+        return None
+
+
+def segundos_reset(valor):
+    """Converte o header X-RateLimit-Reset (segundos ou instante epoch) em segundos até o reset
+    
+    Retorna None para valores inválidos ou já passados; limita a PAUSA_MAXIMA.
+    """
+    try:
+        segundos = float(valor)
+    except (TypeError, ValueError):
+        return None
+    if segundos >= INICIO_EPOCH_RESET:
+        segundos -= time.time()
+    if segundos < 0:
+        return None
+    return min(segundos, PAUSA_MAXIMA)
+
+
+class BaldeTokens:
+    """Token bucket de um host: distribui as requisições no tempo
+    
+    reservar() não bloqueia: consome um token (ficando "devendo" se
+    necessário) e devolve quantos segundos o chamador deve aguardar, o que
+    permite usar o mesmo balde com time.sleep e com asyncio.sleep.
+    """
+    
+    def __init__(self, taxa=None, capacidade=None):
+        self.taxa_configurada = taxa
+        self.taxa = taxa
+        self.capacidade = capacidade or taxa or 1
+        self._tokens = float(self.capacidade)
+        self._atualizado = time.monotonic()
+        self._pausado_ate = 0.0
+        self._lock = threading.Lock()
+    
+    def reservar(self):
+        """Reserva a próxima vaga e retorna o tempo de espera em segundos"""
+        with self._lock:
+            agora = time.monotonic()
+            espera = 0.0
+            if self.taxa:
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+                self._tokens -= 1
+                if self._tokens < 0:
+                    espera = -self._tokens / self.taxa
+            self._atualizado = agora
+            return max(espera, self._pausado_ate - agora)
+    
+    def pausar(self, segundos):
+        """Suspende o host (Retry-After ou janela de rate limit esgotada)"""
+        with self._lock:
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+    
+    def atualizar_por_headers(self, headers):
+        """Ajusta o ritmo pelos headers de rate limit devolvidos pela VTEX"""
+        retry_after = segundos_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            self.pausar(retry_after)
+        
+        try:
+            restantes = int(headers.get('X-RateLimit-Remaining'))
+        except (TypeError, ValueError):
+            return
+        reset = segundos_reset(headers.get('X-RateLimit-Reset'))
+        if reset is None:
+            return
+        
+        if restantes <= 0:
+            self.pausar(reset)
+        elif reset > 0:
+            # Espalhar o que resta da janela até o reset, sem passar da taxa configurada
+            taxa_janela = restantes / reset
+            with self._lock:
+                if self.taxa_configurada:
+                    self.taxa = min(self.taxa_configurada, taxa_janela)
+                else:
+                    self.taxa = taxa_janela
+                self.capacidade = max(self.taxa, 1)
+
+
+class LimitadorTaxaPorHost:
+    """Um BaldeTokens por host de conta VTEX"""
+    
+    def __init__(self, taxa=None):
+        self.taxa = taxa
+        self.reagendadas = 0
+        self._baldes = {}
+        self._lock = threading.Lock()
+    
+    def balde(self, host):
+        with self._lock:
+            balde = self._baldes.get(host)
+            if balde is None:
+                balde = BaldeTokens(self.taxa)
+                self._baldes[host] = balde
+            return balde
+    
+    def configurar(self, taxa):
+        """Aplica nova taxa (requisições/s por host; 0 ou None = só pelos headers)"""
+        with self._lock:
+            self.taxa = taxa or None
+            self._baldes = {}
+    
+    def registrar_429(self, host, headers):
+        """Pausa o host após um 429; sem Retry-After, aguarda 1 segundo"""
+        balde = self.balde(host)
+        with self._lock:
+            self.reagendadas += 1
+        if segundos_retry_after(headers.get('Retry-After')) is None:
+            balde.pausar(1.0)
+
+
+class ControleHedge:
+    """Decide quando duplicar uma requisição lenta (hedged request)
+    
+    A duplicata é enviada quando a requisição passa do p90 de latência
+    observado no host (ou de todos os hosts, enquanto o host tem poucas
+    amostras), e o total de duplicatas fica limitado a carga_maxima% das
+    requisições.
+    """
+    
+    AMOSTRAS_MINIMAS = 10
+    
+    def __init__(self, ativo=False, carga_maxima=10):
+        self.ativo = ativo
+        self.carga_maxima = carga_maxima
+        self.requisicoes = 0
+        self.duplicadas = 0
+        self.vencedoras = 0
+        self._por_host = {}
+        self._geral = deque(maxlen=500)
+        self._lock = threading.Lock()
+    
+    def registrar(self, host, duracao):
+        """Registra a latência de uma resposta recebida do host"""
+        with self._lock:
+            amostras = self._por_host.get(host)
+            if amostras is None:
+                amostras = self._por_host[host] = deque(maxlen=100)
+            amostras.append(duracao)
+            self._geral.append(duracao)
+    
+    def atraso(self, host):
+        """Segundos de espera antes de duplicar; None quando não deve duplicar"""
+        if not self.ativo:
+            return None
+        with self._lock:
+            self.requisicoes += 1
+            amostras = self._por_host.get(host)
+            if amostras is None or len(amostras) < self.AMOSTRAS_MINIMAS:
+                amostras = self._geral
+            if len(amostras) < self.AMOSTRAS_MINIMAS:
+                return None
+            return percentil(list(amostras), 90)
+    
+    def permitir(self):
+        """Reserva uma duplicata se a carga extra ainda está abaixo do limite"""
+        with self._lock:
+            if self.duplicadas + 1 > self.requisicoes * self.carga_maxima / 100:
+                return False
+            self.duplicadas += 1
+            return True
+    
+    def registrar_vitoria(self):
+        """A duplicata respondeu antes da requisição original"""
+        with self._lock:
+            self.vencedoras += 1
+
+
+class CircuitoAberto(FalhaRequisicao):
+    """Requisição recusada sem ser enviada porque o circuito do host está aberto"""
+    
+    def __init__(self, host, em_sondagem=False):
+        super().__init__(ERRO_CIRCUITO, f"Loja ignorada: circuito aberto para {host} após falhas consecutivas")
+        self.host = host
+        # Recusada só porque a sondagem do host ainda está em voo: vale tentar de novo
+        self.em_sondagem = em_sondagem
+
+
+class Disjuntor:
+    """Circuit breaker de um host: fechado, aberto ou meio-aberto"""
+    
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio-aberto"
+    
+    def __init__(self):
+        self.estado = self.FECHADO
+        self.falhas_consecutivas = 0
+        self.aberto_em = 0.0
+        self.sondando = False
+
+
+class DisjuntoresPorHost:
+    """Circuit breakers por host de conta VTEX
+    
+    Após limite_falhas falhas consecutivas (timeout, conexão ou 5xx) o host
+    é recusado na hora durante espera segundos; depois uma única requisição
+    de sondagem decide se o circuito fecha ou volta a abrir.
+    """
+    
+    def __init__(self, limite_falhas=5, espera=30):
+        self.limite_falhas = limite_falhas
+        self.espera = espera
+        self._disjuntores = {}
+        self._lock = threading.Lock()
+    
+    def _disjuntor(self, host):
+        disjuntor = self._disjuntores.get(host)
+        if disjuntor is None:
+            disjuntor = self._disjuntores[host] = Disjuntor()
+        return disjuntor
+    
+    def verificar(self, host):
+        """Levanta CircuitoAberto se o host não deve receber a requisição agora"""
+        if not self.limite_falhas:
+            return
+        with self._lock:
+            disjuntor = self._disjuntor(host)
+            if disjuntor.estado == Disjuntor.FECHADO:
+                return
+            if disjuntor.estado == Disjuntor.ABERTO and time.monotonic() - disjuntor.aberto_em >= self.espera:
+                disjuntor.estado = Disjuntor.MEIO_ABERTO
+            if disjuntor.estado == Disjuntor.MEIO_ABERTO and not disjuntor.sondando:
+                # Esta requisição é a sondagem
+                disjuntor.sondando = True
+                return
+            em_sondagem = disjuntor.estado == Disjuntor.MEIO_ABERTO
+        raise CircuitoAberto(host, em_sondagem)
+    
+    def registrar(self, host, falha):
+        """Registra o resultado de uma requisição enviada ao host"""
+        if not self.limite_falhas:
+            return
+        with self._lock:
+            disjuntor = self._disjuntor(host)
+            disjuntor.sondando = False
+            if not falha:
+                disjuntor.estado = Disjuntor.FECHADO
+                disjuntor.falhas_consecutivas = 0
+                return
+            
+            disjuntor.falhas_consecutivas += 1
+            if (disjuntor.estado == Disjuntor.MEIO_ABERTO
+                    or disjuntor.falhas_consecutivas >= self.limite_falhas):
+                disjuntor.estado = Disjuntor.ABERTO
+                disjuntor.aberto_em = time.monotonic()
+    
+    def desistir(self, host):
+        """A requisição liberada por verificar() foi cancelada antes de terminar"""
+        with self._lock:
+            self._disjuntor(host).sondando = False
+    
+    def abertos(self):
+        """Hosts com o circuito aberto ou aguardando sondagem"""
+        with self._lock:
+            return sorted(
+                host for host, disjuntor in self._disjuntores.items()
+                if disjuntor.estado != Disjuntor.FECHADO
+            )
+    
+    def fechar_todos(self):
+        with self._lock:
+            self._disjuntores.clear()
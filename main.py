@@ -4,9 +4,10 @@ VTEX Freight Calculator - Arquivo Principal
 import sys
 import time
 import json
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QListWidgetItem, QDialog
+from datetime import datetime
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QListWidgetItem, QDialog, QLabel, QComboBox
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon, QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
 
 # Importar módulos locais
 from config_manager import ConfigManager
@@ -18,17 +19,32 @@ from tabs.retirada_tab import RetiradaTab
 from tabs.estoque_tab import EstoqueTab
 from tabs.sem_entrega_tab import SemEntregaTab
 from tabs.json_tab import JsonTab
-from threads import SimulacaoThread, EstoqueThread
+from tabs.matriz_tab import MatrizTab
+from tabs.metricas_tab import MetricasTab
+from tabs.historico_tab import HistoricoTab
+from threads import SimulacaoThread, EstoqueThread, MatrizThread
+from transporte import configurar_transporte, get_transporte, workers_para_configuracao
+from cassete import ErroCassete
+from cache import cache_politicas, cache_simulacoes, cache_estoque, configurar_caches
+from metricas import exportar_metricas
+from rastreamento import criar_rastreador
+from historico import configurar_historico, TIPO_SIMULACAO
+from retentativas import ERRO_CIRCUITO
 from splash_screen import SplashScreen
 from config_ui import ConfigDialog
 
 
 class FreteSimulator(QMainWindow):
+    # Erros do histórico (a gravação acontece na thread do histórico)
+    historico_erro_signal = Signal(str)
+    
     def __init__(self):
         super().__init__()
         
         # Inicializar gerenciador de configurações
         self.config_manager = ConfigManager()
+        self.erro_historico = None
+        self.historico_erro_signal.connect(self.mostrar_erro_historico)
         
         # Carregar configurações
         self.load_config()
@@ -39,8 +55,16 @@ class FreteSimulator(QMainWindow):
         
         # Variáveis
         self.skus_recentes = [self.sku_default]
+        self.resultados_por_sku = {}
+        # Ranking, retirada e sem entrega já montados pelos resultados parciais da execução atual
+        self.exibicao_parcial = False
+        self.simulacao_cancelada = False
         
         self.init_ui()
+        if self.erro_historico:
+            self.atualizar_status(self.erro_historico, "red")
+        if self.erro_cassete:
+            self.atualizar_status(self.erro_cassete, "red")
     
     def load_config(self):
         """Carrega configurações da empresa"""
@@ -61,7 +85,23 @@ class FreteSimulator(QMainWindow):
         # Carregar configurações gerais
         config = self.config_manager.get_configuracoes()
         self.sku_default = config.get('sku_padrao', '149718')
-        self.max_workers = config.get('max_workers', 20)
+        self.max_workers = workers_para_configuracao(config)
+        self.engine = config.get('engine', 'threads')
+        self.limite_async = config.get('limite_conexoes_async', 200)
+        
+        # Pool de conexões compartilhado entre simulações e consultas de estoque;
+        # com o cassete de reprodução indisponível, nenhuma execução é iniciada
+        try:
+            configurar_transporte(config)
+            self.erro_cassete = None
+        except ErroCassete as e:
+            self.erro_cassete = str(e)
+        configurar_caches(config)
+        
+        # Histórico das execuções em SQLite (None com o histórico desligado)
+        self.historico = configurar_historico(
+            config, getattr(self, 'historico', None), ao_erro=self.historico_erro_signal.emit
+        )
         
         # Carregar cores
         cores = self.config_manager.get_cores()
@@ -117,6 +157,22 @@ class FreteSimulator(QMainWindow):
         # Barra de status
         self.status_bar = StatusBarWidget(cores)
         
+        # Seletor do SKU exibido (apenas no modo multi-SKU)
+        self.sku_resultado_widget = QWidget()
+        sku_resultado_layout = QHBoxLayout(self.sku_resultado_widget)
+        sku_resultado_layout.setContentsMargins(0, 0, 0, 0)
+        sku_resultado_label = QLabel("SKU exibido:")
+        sku_resultado_label.setFont(QFont("Arial", 10, QFont.Bold))
+        self.sku_resultado_selector = QComboBox()
+        self.sku_resultado_selector.setFont(QFont("Arial", 10))
+        self.sku_resultado_selector.setMinimumWidth(200)
+        self.sku_resultado_selector.currentIndexChanged.connect(self.trocar_sku_exibido)
+        sku_resultado_layout.addWidget(sku_resultado_label)
+        sku_resultado_layout.addWidget(self.sku_resultado_selector)
+        sku_resultado_layout.addStretch()
+        self.sku_resultado_widget.setVisible(False)
+        right_layout.addWidget(self.sku_resultado_widget)
+        
         # Área de resultados
         self.tab_widget = QTabWidget()
         self.tab_widget.setFont(QFont("Arial", 10))
@@ -155,6 +211,15 @@ class FreteSimulator(QMainWindow):
         self.estoque_tab = EstoqueTab(self)
         self.tab_widget.addTab(self.estoque_tab, "📦 Estoque")
         
+        self.matriz_tab = MatrizTab(self)
+        self.tab_widget.addTab(self.matriz_tab, "🗺️ Matriz CEP")
+        
+        self.historico_tab = HistoricoTab(self)
+        self.tab_widget.addTab(self.historico_tab, "🕘 Histórico")
+        
+        self.metricas_tab = MetricasTab(self)
+        self.tab_widget.addTab(self.metricas_tab, "📈 Métricas")
+        
         self.json_tab = JsonTab(self)
         self.tab_widget.addTab(self.json_tab, "📄 JSON")
         
@@ -271,6 +336,27 @@ class FreteSimulator(QMainWindow):
         
         buttons_layout.addWidget(self.config_btn)
         
+        # Botão de invalidação dos caches de políticas de envio e de simulações
+        self.limpar_cache_btn = QPushButton("🗑️ Limpar Caches")
+        self.limpar_cache_btn.setFont(QFont("Segoe UI", 12, QFont.Bold))
+        self.limpar_cache_btn.setMinimumHeight(50)
+        self.limpar_cache_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {self.COR_BORDA};
+                color: {self.COR_TEXTO};
+                padding: 15px 30px;
+                border-radius: 8px;
+                font-size: 12pt;
+                border: 1px solid {self.COR_BORDA};
+            }}
+            QPushButton:hover {{
+                background-color: {self.COR_FUNDO};
+            }}
+        """)
+        self.limpar_cache_btn.clicked.connect(self.limpar_caches)
+        
+        buttons_layout.addWidget(self.limpar_cache_btn)
+        
         layout.addWidget(buttons_frame)
         
         # Seção de informações com design moderno
@@ -402,6 +488,8 @@ class FreteSimulator(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             # Recarregar configurações
             self.load_config()
+            if self.erro_cassete:
+                self.mostrar_erro(self.erro_cassete)
             
             # Atualizar título da janela
             empresa_nome = self.config_manager.get_empresa_info().get('nome', 'Sua Empresa')
@@ -430,8 +518,11 @@ class FreteSimulator(QMainWindow):
                 self.criar_icone_sem_entrega(),  # 2: Sem Entrega
                 self.criar_icone_retirada(),     # 3: Retirada
                 self.criar_icone_estoque(),      # 4: Estoque
-                self.criar_icone_json(),         # 5: JSON
-                self.criar_icone_config()        # 6: Configurações
+                self.criar_icone_matriz(),       # 5: Matriz CEP
+                self.criar_icone_historico(),    # 6: Histórico
+                self.criar_icone_metricas(),     # 7: Métricas
+                self.criar_icone_json(),         # 8: JSON
+                self.criar_icone_config()        # 9: Configurações
             ]
             
             # Aplicar ícones nas abas
@@ -472,6 +563,24 @@ class FreteSimulator(QMainWindow):
         pixmap.fill(Qt.transparent)
         return QIcon(pixmap)
     
+    def criar_icone_matriz(self):
+        """Cria ícone para aba matriz CEP"""
+        pixmap = QPixmap(24, 24)
+        pixmap.fill(Qt.transparent)
+        return QIcon(pixmap)
+    
+    def criar_icone_historico(self):
+        """Cria ícone para aba de histórico"""
+        pixmap = QPixmap(24, 24)
+        pixmap.fill(Qt.transparent)
+        return QIcon(pixmap)
+    
+    def criar_icone_metricas(self):
+        """Cria ícone para aba de métricas"""
+        pixmap = QPixmap(24, 24)
+        pixmap.fill(Qt.transparent)
+        return QIcon(pixmap)
+    
     def criar_icone_json(self):
         """Cria ícone para aba JSON"""
         pixmap = QPixmap(24, 24)
@@ -618,7 +727,17 @@ class FreteSimulator(QMainWindow):
                 lojas.append(loja_original)
         return lojas
     
+    def cassete_indisponivel(self):
+        """Mostra o erro e retorna True se o cassete de reprodução configurado não abriu"""
+        if not self.erro_cassete:
+            return False
+        self.mostrar_erro(f"{self.erro_cassete}\n\nCorrija o cassete na configuração: a reprodução não consulta a VTEX.")
+        return True
+    
     def iniciar_simulacao_thread(self):
+        if self.cassete_indisponivel():
+            return
+        
         lojas_selecionadas = self.get_lojas_selecionadas()
         if not lojas_selecionadas:
             self.mostrar_erro("Selecione pelo menos uma loja para simular!")
@@ -628,14 +747,15 @@ class FreteSimulator(QMainWindow):
             self.mostrar_erro("Formato de CEP inválido! Use 00000-000")
             return
         
-        # Obter SKU do campo de entrada
-        sku = self.input_panel.sku_combo.currentText().strip()
-        if not sku:
+        # Obter SKU(s) do campo de entrada
+        skus = self.input_panel.get_skus()
+        if not skus:
             self.mostrar_erro("O SKU não pode estar vazio!")
             return
         
-        # Atualizar histórico de SKUs
-        self.atualizar_historico_skus(sku)
+        # Atualizar histórico de SKUs (modo de SKU único)
+        if len(skus) == 1:
+            self.atualizar_historico_skus(skus[0])
         
         # Obter conta principal da configuração
         conta_principal = self.config_manager.get_empresa_info().get('conta_principal', 'trackfield')
@@ -643,23 +763,51 @@ class FreteSimulator(QMainWindow):
         self.simulacao_thread = SimulacaoThread(
             self.input_panel.cep_input.text(),
             lojas_selecionadas,
-            sku,
+            skus if len(skus) > 1 else skus[0],
             self.APP_KEY,
             self.APP_TOKEN,
             conta_principal,
-            self.max_workers
+            self.max_workers,
+            engine=self.engine,
+            limite_async=self.limite_async,
+            forcar_atualizacao=self.input_panel.forcar_atualizacao_check.isChecked(),
+            rastreador=criar_rastreador(self.config_manager.get_configuracoes())
         )
         
         self.simulacao_thread.result_signal.connect(self.mostrar_resultados)
+        self.simulacao_thread.result_multi_signal.connect(self.mostrar_resultados_multi)
+        self.simulacao_thread.resultado_parcial_signal.connect(self.exibir_resultados_parciais)
+        self.simulacao_thread.finished.connect(self.finalizar_simulacao)
         self.simulacao_thread.error_signal.connect(self.mostrar_erro)
         self.simulacao_thread.status_signal.connect(self.atualizar_status)
         self.simulacao_thread.progress_signal.connect(self.atualizar_progresso)
+        self.simulacao_thread.metricas_signal.connect(self.mostrar_metricas)
         
         self.input_panel.simular_btn.setEnabled(False)
         self.input_panel.limpar_btn.setEnabled(False)
         self.input_panel.simular_btn.setText("PROCESSANDO...")
+        self.input_panel.cancelar_btn.setEnabled(True)
+        self.simulacao_cancelada = False
+        self.iniciar_exibicao_parcial()
         self.simulacao_thread.start()
     
+    def cancelar_simulacao(self):
+        """Interrompe a simulação em andamento; as lojas já simuladas continuam exibidas"""
+        if self.simulacao_thread.isRunning():
+            self.simulacao_thread.cancelar()
+            self.simulacao_cancelada = True
+            self.input_panel.cancelar_btn.setEnabled(False)
+            self.atualizar_status("Cancelando simulação...", "red")
+    
+    def finalizar_simulacao(self):
+        self.input_panel.cancelar_btn.setEnabled(False)
+        if self.historico is not None:
+            thread = self.simulacao_thread
+            self.historico.registrar_simulacao(
+                thread.resultados_por_sku, thread.cep, metricas=thread.metricas, engine=thread.engine,
+                cancelada=self.simulacao_cancelada
+            )
+    
     def atualizar_historico_skus(self, novo_sku):
         """Atualiza o histórico de SKUs mantendo os mais recentes"""
         # Adiciona novo SKU se não existir
@@ -690,8 +838,65 @@ class FreteSimulator(QMainWindow):
         else:
             self.status_bar.setStyleSheet(f"background-color: {self.COR_SECUNDARIA}; color: {self.COR_TEXTO};")
     
+    def mostrar_erro_historico(self, mensagem):
+        """Erros de abertura e gravação do histórico vão para a barra de status"""
+        if not hasattr(self, 'status_bar'):
+            # Configuração carregada antes da interface: exibido ao final do __init__
+            self.erro_historico = mensagem
+            return
+        self.atualizar_status(mensagem, "red")
+    
     def atualizar_progresso(self, atual, total):
         self.status_bar.showMessage(f"Processando: {atual}/{total} lojas...")
+        self.atualizar_indicadores()
+    
+    def atualizar_indicadores(self):
+        """Atualiza os indicadores permanentes da barra de status"""
+        stats = cache_politicas.estatisticas()
+        texto = f"Cache de políticas: {stats['acertos']} acertos / {stats['falhas']} falhas"
+        
+        stats = cache_simulacoes.estatisticas()
+        texto += f"  |  Cache de simulações: {stats['acertos']} acertos / {stats['itens']} itens"
+        
+        stats = cache_estoque.estatisticas()
+        texto += f"  |  Cache de estoque: {stats['acertos']} acertos / {stats['itens']} itens"
+        
+        limitador = get_transporte().limitador
+        if limitador.ativo:
+            texto += f"  |  Concorrência: {limitador.limite_atual()} (em voo {limitador.em_voo})"
+        
+        abertos = get_transporte().disjuntores.abertos()
+        if abertos:
+            texto += f"  |  Circuitos abertos: {len(abertos)}"
+        self.status_bar.indicadores_label.setToolTip(
+            "Lojas com circuito aberto:\n" + "\n".join(abertos) if abertos else ""
+        )
+        
+        hedge = get_transporte().hedge
+        if hedge.ativo:
+            texto += f"  |  Hedge: {hedge.duplicadas} duplicatas ({hedge.vencedoras} mais rápidas)"
+        
+        chamadas_em_voo = get_transporte().chamadas_em_voo
+        if chamadas_em_voo.compartilhadas:
+            texto += f"  |  Requisições compartilhadas: {chamadas_em_voo.compartilhadas}"
+        
+        cassete = get_transporte().cassete
+        if cassete is not None:
+            texto += f"  |  {cassete.descrever()}"
+        self.status_bar.atualizar_indicadores(texto)
+    
+    def mostrar_metricas(self, metricas):
+        """Atualiza a aba de métricas e, se configurado, exporta o arquivo do Prometheus ao fim de cada execução"""
+        arquivo = exportar_metricas(metricas, self.config_manager.get_configuracoes())
+        self.metricas_tab.mostrar_metricas(metricas, arquivo)
+    
+    def limpar_caches(self):
+        """Descarta políticas de envio, simulações e estoque em cache para forçar nova consulta"""
+        cache_politicas.invalidar()
+        cache_simulacoes.invalidar()
+        cache_estoque.invalidar()
+        self.atualizar_indicadores()
+        self.atualizar_status("Caches de políticas de envio, simulações e estoque limpos!", "green")
     
     def limpar_resultados(self):
         # Limpa conteúdo das abas
@@ -703,6 +908,11 @@ class FreteSimulator(QMainWindow):
         # Limpa JSON
         self.json_tab.json_edit.clear()
         self.resumo_tab.loja_selector.clear()
+        
+        # Limpa resultados do modo multi-SKU
+        self.resultados_por_sku = {}
+        self.sku_resultado_selector.clear()
+        self.sku_resultado_widget.setVisible(False)
         self.atualizar_status("Resultados limpos", "green")
     
     def calcular_prazo_entrega(self, shipping_estimate):
@@ -717,7 +927,55 @@ class FreteSimulator(QMainWindow):
     def calcular_estoque_total(self, inventory_data):
         return calcular_estoque_total(inventory_data)
     
-    def mostrar_resultados(self, resultados):
+    def iniciar_exibicao_parcial(self):
+        """Prepara ranking, retirada e sem entrega para receber os resultados conforme chegam"""
+        self.ranking_tab.iniciar_ranking()
+        self.retirada_tab.iniciar_pontos_retirada()
+        self.sem_entrega_tab.iniciar_aba_sem_entrega()
+        self.exibicao_parcial = True
+    
+    def exibir_resultados_parciais(self, lote):
+        """Acrescenta às abas um lote {loja: resultado} da simulação em andamento"""
+        if not self.exibicao_parcial:
+            return
+        self.ranking_tab.adicionar_ao_ranking(lote)
+        self.retirada_tab.adicionar_pontos_retirada(lote)
+        self.sem_entrega_tab.adicionar_lojas_sem_entrega(self.coletar_lojas_sem_entrega(lote))
+    
+    def mostrar_resultados_multi(self, resultados_por_sku):
+        """Exibe os resultados do modo multi-SKU, um SKU por vez"""
+        self.resultados_por_sku = resultados_por_sku
+        
+        self.sku_resultado_selector.blockSignals(True)
+        self.sku_resultado_selector.clear()
+        for sku, resultados in resultados_por_sku.items():
+            com_entrega = sum(1 for data in resultados.values()
+                              if loja_tem_entrega_normal(data.get('simulation', {})))
+            self.sku_resultado_selector.addItem(f"{sku} ({com_entrega} lojas com entrega)", sku)
+        self.sku_resultado_selector.blockSignals(False)
+        self.sku_resultado_widget.setVisible(True)
+        
+        primeiro_sku = next(iter(resultados_por_sku))
+        self.mostrar_resultados(resultados_por_sku[primeiro_sku], manter_skus=True)
+        if self.simulacao_cancelada:
+            return
+        self.atualizar_status(
+            f"Simulação concluída para {len(resultados_por_sku)} SKUs em "
+            f"{len(resultados_por_sku[primeiro_sku])} lojas!", "green"
+        )
+    
+    def trocar_sku_exibido(self, index):
+        """Reexibe as abas com o ranking do SKU selecionado"""
+        sku = self.sku_resultado_selector.currentData()
+        if sku in self.resultados_por_sku:
+            self.mostrar_resultados(self.resultados_por_sku[sku], manter_skus=True)
+    
+    def mostrar_resultados(self, resultados, manter_skus=False):
+        if not manter_skus:
+            # Resultado de SKU único: esconder o seletor do modo multi-SKU
+            self.resultados_por_sku = {}
+            self.sku_resultado_widget.setVisible(False)
+        
         # Salva JSON formatado
         formatted_json = json.dumps(resultados, indent=2, ensure_ascii=False)
         self.json_tab.json_edit.setPlainText(formatted_json)
@@ -735,16 +993,21 @@ class FreteSimulator(QMainWindow):
             self.resumo_tab.loja_selector.addItem(nome_formatado, loja)
         
         try:
-            # Exibir informações formatadas nas abas
-            self.atualizar_status("Exibindo ranking...", "black")
-            self.ranking_tab.exibir_ranking(resultados)
+            # Ranking, retirada e sem entrega já foram montados durante a execução
+            if self.exibicao_parcial:
+                self.exibicao_parcial = False
+                self.ranking_tab.finalizar_ranking()
+            else:
+                # Exibir informações formatadas nas abas
+                self.atualizar_status("Exibindo ranking...", "black")
+                self.ranking_tab.exibir_ranking(resultados)
             
-            self.atualizar_status("Exibindo pontos de retirada...", "black")
-            self.retirada_tab.exibir_pontos_retirada(resultados)
+                self.atualizar_status("Exibindo pontos de retirada...", "black")
+                self.retirada_tab.exibir_pontos_retirada(resultados)
             
-            # Exibir lojas sem entrega
-            self.atualizar_status("Exibindo lojas sem entrega...", "black")
-            self.exibir_lojas_sem_entrega(resultados)
+                # Exibir lojas sem entrega
+                self.atualizar_status("Exibindo lojas sem entrega...", "black")
+                self.exibir_lojas_sem_entrega(resultados)
             
             # Seleciona a primeira loja na visão detalhada
             if self.resumo_tab.loja_selector.count() > 0:
@@ -755,7 +1018,21 @@ class FreteSimulator(QMainWindow):
             self.input_panel.simular_btn.setEnabled(True)
             self.input_panel.limpar_btn.setEnabled(True)
             self.input_panel.simular_btn.setText("▶ SIMULAR FRETE")
-            self.atualizar_status(f"Simulação concluída para {len(resultados)} lojas!", "green")
+            com_falha = sum(1 for data in resultados.values() if data.get('error'))
+            ignoradas = sum(1 for data in resultados.values() if data.get('error_type') == ERRO_CIRCUITO)
+            if self.simulacao_cancelada:
+                self.atualizar_status(
+                    f"Simulação cancelada: resultados parciais de {len(resultados)} de "
+                    f"{len(self.simulacao_thread.lojas)} lojas", "red"
+                )
+            elif com_falha:
+                self.atualizar_status(
+                    f"Simulação concluída para {len(resultados)} lojas ({com_falha} com falha na consulta, "
+                    f"{ignoradas} ignoradas por circuito aberto)", "red"
+                )
+            else:
+                self.atualizar_status(f"Simulação concluída para {len(resultados)} lojas!", "green")
+            self.atualizar_indicadores()
             
         except Exception as e:
             # Em caso de erro, reabilitar botões e mostrar erro
@@ -769,6 +1046,10 @@ class FreteSimulator(QMainWindow):
     
     def exibir_lojas_sem_entrega(self, resultados):
         """Exibe as lojas sem entrega disponível"""
+        self.sem_entrega_tab.popular_aba_sem_entrega(self.coletar_lojas_sem_entrega(resultados))
+    
+    def coletar_lojas_sem_entrega(self, resultados):
+        """Lista (loja, estoque total, classe do erro) das lojas sem entrega"""
         lojas_sem_entrega = []
         
         for loja, data in resultados.items():
@@ -779,12 +1060,12 @@ class FreteSimulator(QMainWindow):
             tem_entrega = loja_tem_qualquer_entrega(simulation)
             
             if not tem_entrega:
-                # Calcular estoque total
+                # Calcular estoque total; consultas que falharam entram com a classe do erro
                 estoque_total = self.calcular_estoque_total(inventory)
-                lojas_sem_entrega.append((loja, estoque_total))
+                tipo_erro = data.get('error_type') or ('erro' if data.get('error') else None)
+                lojas_sem_entrega.append((loja, estoque_total, tipo_erro))
         
-        # Popular a aba sem entrega
-        self.sem_entrega_tab.popular_aba_sem_entrega(lojas_sem_entrega)
+        return lojas_sem_entrega
     
     def atualizar_resumo(self, index):
         # Limpa o conteúdo atual
@@ -800,6 +1081,38 @@ class FreteSimulator(QMainWindow):
             data = self.resultados_completos[loja_selecionada]
             self.resumo_tab.exibir_resumo_para_loja(loja_selecionada, data)
 
+    def carregar_execucao_historico(self, execucao_id):
+        """Reabre nas abas uma execução do histórico, sem consultar a VTEX"""
+        execucao = self.historico.obter(execucao_id)
+        if execucao is None:
+            self.atualizar_status("Execução não encontrada no histórico", "red")
+            return
+        
+        data = datetime.fromtimestamp(execucao['executado_em']).strftime("%d/%m/%Y %H:%M")
+        if execucao['tipo'] != TIPO_SIMULACAO:
+            self.estoque_tab.mostrar_resultados_estoque(execucao['resultados'])
+            self.tab_widget.setCurrentWidget(self.estoque_tab)
+            self.atualizar_status(
+                f"Estoque do SKU {execucao['sku']} de {data} carregado do histórico "
+                f"({len(execucao['resultados'])} lojas)", "green"
+            )
+            return
+        
+        # SKUs da mesma simulação (modo multi-SKU) voltam juntos para o seletor
+        self.simulacao_cancelada = False
+        self.exibicao_parcial = False
+        lote = self.historico.obter_lote(execucao['lote'])
+        if len(lote) > 1:
+            self.mostrar_resultados_multi({item['sku']: item['resultados'] for item in lote})
+            self.sku_resultado_selector.setCurrentIndex(self.sku_resultado_selector.findData(execucao['sku']))
+        else:
+            self.mostrar_resultados(execucao['resultados'])
+        self.tab_widget.setCurrentWidget(self.ranking_tab)
+        self.atualizar_status(
+            f"Simulação do SKU {execucao['sku']} para o CEP {execucao['cep']} de {data} carregada do histórico "
+            f"({execucao['lojas']} lojas)", "green"
+        )
+    
     def mostrar_erro(self, mensagem):
         from PySide6.QtWidgets import QMessageBox
         QMessageBox.critical(self, "Erro", mensagem)
@@ -808,9 +1121,14 @@ class FreteSimulator(QMainWindow):
         self.input_panel.simular_btn.setText("▶ SIMULAR FRETE")
         self.estoque_tab.consultar_estoque_btn.setEnabled(True)
         self.estoque_tab.consultar_estoque_btn.setText("CONSULTAR ESTOQUE")
+        self.matriz_tab.simular_matriz_btn.setEnabled(True)
+        self.matriz_tab.simular_matriz_btn.setText("SIMULAR MATRIZ")
         self.atualizar_status(mensagem, "red")
     
     def iniciar_consulta_estoque(self):
+        if self.cassete_indisponivel():
+            return
+        
         sku = self.estoque_tab.estoque_sku_input.currentText().strip()
         if not sku:
             self.mostrar_erro("O SKU não pode estar vazio!")
@@ -828,20 +1146,110 @@ class FreteSimulator(QMainWindow):
             self.APP_KEY,
             self.APP_TOKEN,
             conta_principal,
-            self.max_workers
+            self.max_workers,
+            revalidar_em_segundo_plano=self.config_manager.get_configuracoes().get(
+                'estoque_revalidar_em_segundo_plano', True
+            )
         )
         
         self.estoque_tab.consultar_estoque_btn.setEnabled(False)
-        self.estoque_thread.result_signal.connect(self.estoque_tab.mostrar_resultados_estoque)
+        self.estoque_tab.cancelar_estoque_btn.setEnabled(True)
+        self.estoque_thread.result_signal.connect(self.mostrar_resultados_estoque)
+        self.estoque_thread.cache_signal.connect(self.estoque_tab.mostrar_estoque_em_cache)
         self.estoque_thread.error_signal.connect(self.mostrar_erro)
         self.estoque_thread.status_signal.connect(self.atualizar_status)
         self.estoque_thread.progress_signal.connect(self.atualizar_progresso_estoque)
+        self.estoque_thread.finished.connect(self.finalizar_consulta_estoque)
+        self.estoque_thread.metricas_signal.connect(self.mostrar_metricas)
         
         self.estoque_tab.consultar_estoque_btn.setText("PROCESSANDO...")
         self.estoque_thread.start()
     
+    def cancelar_consulta_estoque(self):
+        """Interrompe a consulta de estoque; as lojas já consultadas continuam exibidas"""
+        if self.estoque_thread.isRunning():
+            self.estoque_thread.cancelar()
+            self.estoque_tab.cancelar_estoque_btn.setEnabled(False)
+            self.atualizar_status("Cancelando consulta de estoque...", "red")
+    
+    def mostrar_resultados_estoque(self, resultados):
+        self.estoque_tab.mostrar_resultados_estoque(resultados)
+        if self.estoque_thread.cancelada:
+            self.atualizar_status(
+                f"Consulta de estoque cancelada: resultados parciais de {len(resultados)} de "
+                f"{len(self.estoque_thread.lojas)} lojas", "red"
+            )
+    
+    def finalizar_consulta_estoque(self):
+        self.estoque_tab.cancelar_estoque_btn.setEnabled(False)
+        if self.historico is not None:
+            thread = self.estoque_thread
+            self.historico.registrar_estoque(
+                thread.sku, thread.resultados, metricas=thread.metricas, cancelada=thread.cancelada
+            )
+    
     def atualizar_progresso_estoque(self, atual, total):
         self.status_bar.showMessage(f"Consultando estoque: {atual}/{total} lojas...")
+    
+    def iniciar_simulacao_matriz(self):
+        if self.cassete_indisponivel():
+            return
+        
+        lojas_selecionadas = self.get_lojas_selecionadas()
+        if not lojas_selecionadas:
+            self.mostrar_erro("Selecione pelo menos uma loja para simular!")
+            return
+        
+        ceps = self.matriz_tab.get_ceps()
+        if not ceps:
+            self.mostrar_erro("Informe pelo menos um CEP válido (00000-000)!")
+            return
+        
+        skus = self.input_panel.get_skus()
+        if not skus:
+            self.mostrar_erro("O SKU não pode estar vazio!")
+            return
+        
+        # Obter conta principal da configuração
+        conta_principal = self.config_manager.get_empresa_info().get('conta_principal', 'trackfield')
+        
+        self.matriz_thread = MatrizThread(
+            ceps,
+            lojas_selecionadas,
+            skus[0],
+            self.APP_KEY,
+            self.APP_TOKEN,
+            conta_principal,
+            self.max_workers
+        )
+        
+        self.matriz_thread.result_signal.connect(self.matriz_tab.mostrar_matriz)
+        self.matriz_thread.error_signal.connect(self.mostrar_erro)
+        self.matriz_thread.status_signal.connect(self.atualizar_status)
+        self.matriz_thread.progress_signal.connect(self.atualizar_progresso_matriz)
+        self.matriz_thread.metricas_signal.connect(self.mostrar_metricas)
+        self.matriz_thread.finished.connect(self.finalizar_simulacao_matriz)
+        
+        self.matriz_tab.simular_matriz_btn.setEnabled(False)
+        self.matriz_tab.simular_matriz_btn.setText("PROCESSANDO...")
+        self.matriz_tab.cancelar_matriz_btn.setEnabled(True)
+        self.matriz_thread.start()
+    
+    def cancelar_simulacao_matriz(self):
+        """Interrompe a matriz em andamento; as células já simuladas continuam exibidas"""
+        if self.matriz_thread.isRunning():
+            self.matriz_thread.cancelar()
+            self.matriz_tab.cancelar_matriz_btn.setEnabled(False)
+            self.atualizar_status("Cancelando simulação da matriz...", "red")
+    
+    def finalizar_simulacao_matriz(self):
+        self.matriz_tab.cancelar_matriz_btn.setEnabled(False)
+        if self.matriz_thread.cancelada:
+            self.atualizar_status("Matriz cancelada: exibindo só as células já simuladas", "red")
+    
+    def atualizar_progresso_matriz(self, atual, total):
+        self.status_bar.showMessage(f"Simulando matriz: {atual}/{total} combinações CEP × loja...")
+        self.atualizar_indicadores()
 
 
 if __name__ == "__main__":
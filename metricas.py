@@ -0,0 +1,262 @@
+"""
+Métricas das requisições HTTP de uma execução (simulação, matriz ou estoque)
+
+Cada requisição enviada à VTEX é registrada com endpoint, loja, status,
+bytes recebidos e duração. As durações ficam em histogramas por endpoint e
+por loja, com os limites dos buckets do Prometheus, e o resumo da execução
+(p50/p95/p99 por endpoint, lojas mais lentas, erros e requisições/s) é
+exibido na aba de métricas e, se configurado, exportado em formato texto do Prometheus.
+"""
+import functools
+import os
+import threading
+import time
+
+from limitadores import percentil
+from retentativas import ERRO_CONEXAO, tipo_erro_status
+
+
+ENDPOINT_POLITICAS = "politicas"
+ENDPOINT_SIMULACAO = "simulacao"
+ENDPOINT_ESTOQUE = "estoque"
+
+# Limites superiores (s) dos buckets dos histogramas de duração
+BUCKETS_DURACAO = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ARQUIVO_PROMETHEUS_PADRAO = "metricas_vtex.prom"
+LOJAS_MAIS_LENTAS = 10
+
+
+class Histograma:
+    """Contagem cumulativa por bucket, soma e total das durações"""
+    
+    def __init__(self, limites=BUCKETS_DURACAO):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+    
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class MetricasExecucao:
+    """Requisições de uma execução, agregadas por endpoint e por loja
+    
+    Criada pela thread (ou pelo motor) no início da execução e passada a
+    cada requisição como medicao(endpoint, loja); o transporte registra
+    cada tentativa enviada, incluindo retentativas e duplicatas de hedge.
+    Chamadas atendidas por uma requisição idêntica já em voo (single-flight)
+    não vão à rede e são contadas à parte, como compartilhadas.
+    """
+    
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.fim = None
+        self.duracoes = {}
+        self.histogramas_endpoint = {}
+        self.histogramas_loja = {}
+        self.bytes_endpoint = {}
+        self.status = {}
+        self.erros = {}
+        self.compartilhadas = {}
+        self.compartilhadas_loja = {}
+        self._lock = threading.Lock()
+    
+    def medicao(self, endpoint, loja):
+        """Função medicao(status, tamanho, duracao, erro, compartilhada=False) repassada ao transporte"""
+        return functools.partial(self.registrar, endpoint, loja)
+    
+    def registrar(self, endpoint, loja, status, tamanho, duracao, erro=None, compartilhada=False):
+        """Registra uma requisição; sem status (sem resposta), erro é a classe da falha
+        
+        compartilhada indica uma chamada atendida pela requisição idêntica em
+        voo: conta só a chamada e a espera da loja, não uma requisição à VTEX.
+        """
+        if compartilhada:
+            with self._lock:
+                self.compartilhadas[endpoint] = self.compartilhadas.get(endpoint, 0) + 1
+                chamadas, espera = self.compartilhadas_loja.get(loja, (0, 0.0))
+                self.compartilhadas_loja[loja] = (chamadas + 1, espera + duracao)
+            return
+        
+        if status is None:
+            erro = erro or ERRO_CONEXAO
+        elif status >= 400:
+            erro = tipo_erro_status(status)
+        
+        with self._lock:
+            self.duracoes.setdefault(endpoint, []).append(duracao)
+            self.histogramas_endpoint.setdefault(endpoint, Histograma()).observar(duracao)
+            self.histogramas_loja.setdefault(loja, Histograma()).observar(duracao)
+            self.bytes_endpoint[endpoint] = self.bytes_endpoint.get(endpoint, 0) + (tamanho or 0)
+            chave_status = (endpoint, str(status) if status is not None else erro)
+            self.status[chave_status] = self.status.get(chave_status, 0) + 1
+            if erro:
+                self.erros[(endpoint, erro)] = self.erros.get((endpoint, erro), 0) + 1
+    
+    def concluir(self):
+        """Marca o fim da execução (base do cálculo de requisições/s)"""
+        self.fim = time.monotonic()
+    
+    @property
+    def duracao(self):
+        return (self.fim or time.monotonic()) - self.inicio
+    
+    @property
+    def total_requisicoes(self):
+        return sum(histograma.total for histograma in self.histogramas_endpoint.values())
+    
+    @property
+    def total_compartilhadas(self):
+        return sum(self.compartilhadas.values())
+    
+    def tempos_por_loja(self):
+        """{loja: (requisições, chamadas compartilhadas, tempo somado em s)} da execução
+        
+        O tempo inclui a espera das chamadas compartilhadas.
+        """
+        with self._lock:
+            tempos = {
+                loja: (histograma.total, 0, histograma.soma) for loja, histograma in self.histogramas_loja.items()
+            }
+            for loja, (chamadas, espera) in self.compartilhadas_loja.items():
+                requisicoes, _, tempo = tempos.get(loja, (0, 0, 0.0))
+                tempos[loja] = (requisicoes, chamadas, tempo + espera)
+            return tempos
+    
+    def resumo(self, lojas_mais_lentas=LOJAS_MAIS_LENTAS):
+        """Resumo da execução para o painel de métricas e a linha de comando"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, duracoes in sorted(self.duracoes.items()):
+                endpoints[endpoint] = {
+                    "requisicoes": len(duracoes),
+                    "p50_ms": round(percentil(duracoes, 50) * 1000, 1),
+                    "p95_ms": round(percentil(duracoes, 95) * 1000, 1),
+                    "p99_ms": round(percentil(duracoes, 99) * 1000, 1),
+                    "bytes": self.bytes_endpoint.get(endpoint, 0),
+                    "erros": sum(n for (nome, _), n in self.erros.items() if nome == endpoint),
+                    "compartilhadas": self.compartilhadas.get(endpoint, 0),
+                }
+            
+            # Lojas que mais tempo passaram em requisições (soma das durações)
+            lentas = sorted(self.histogramas_loja.items(), key=lambda item: item[1].soma, reverse=True)
+            lojas = [
+                {
+                    "loja": loja,
+                    "requisicoes": histograma.total,
+                    "tempo_total_ms": round(histograma.soma * 1000, 1),
+                    "tempo_medio_ms": round(histograma.soma / histograma.total * 1000, 1),
+                    "compartilhadas": self.compartilhadas_loja.get(loja, (0, 0.0))[0],
+                }
+                for loja, histograma in lentas[:lojas_mais_lentas]
+            ]
+            
+            erros = {}
+            for (_, tipo), n in self.erros.items():
+                erros[tipo] = erros.get(tipo, 0) + n
+            compartilhadas = sum(self.compartilhadas.values())
+        
+        total = sum(endpoint["requisicoes"] for endpoint in endpoints.values())
+        duracao = self.duracao
+        return {
+            "duracao_s": round(duracao, 3),
+            "requisicoes": total,
+            "requisicoes_por_s": round(total / duracao, 1) if duracao > 0 else 0.0,
+            "compartilhadas": compartilhadas,
+            "endpoints": endpoints,
+            "lojas_mais_lentas": lojas,
+            "erros": erros,
+        }
+    
+    def texto_prometheus(self, prefixo="vtex"):
+        """Métricas no formato texto de exposição do Prometheus"""
+        linhas = []
+        
+        def cabecalho(nome, tipo, ajuda):
+            linhas.append(f"# HELP {prefixo}_{nome} {ajuda}")
+            linhas.append(f"# TYPE {prefixo}_{nome} {tipo}")
+        
+        def histograma(nome, rotulo, valor_rotulo, dados):
+            base = f'{rotulo}="{_escapar_rotulo(valor_rotulo)}"'
+            for limite, contagem in zip(dados.limites, dados.contagens):
+                linhas.append(f'{prefixo}_{nome}_bucket{{{base},le="{limite}"}} {contagem}')
+            linhas.append(f'{prefixo}_{nome}_bucket{{{base},le="+Inf"}} {dados.total}')
+            linhas.append(f"{prefixo}_{nome}_sum{{{base}}} {dados.soma:.6f}")
+            linhas.append(f"{prefixo}_{nome}_count{{{base}}} {dados.total}")
+        
+        with self._lock:
+            cabecalho("requisicao_duracao_segundos", "histogram", "Duração das requisições à VTEX por endpoint")
+            for endpoint, dados in sorted(self.histogramas_endpoint.items()):
+                histograma("requisicao_duracao_segundos", "endpoint", endpoint, dados)
+            
+            cabecalho("loja_requisicao_duracao_segundos", "histogram", "Duração das requisições à VTEX por loja")
+            for loja, dados in sorted(self.histogramas_loja.items()):
+                histograma("loja_requisicao_duracao_segundos", "loja", loja, dados)
+            
+            cabecalho("requisicoes_total", "counter", "Requisições por endpoint e status (ou classe de falha)")
+            for (endpoint, status), n in sorted(self.status.items()):
+                linhas.append(
+                    f'{prefixo}_requisicoes_total{{endpoint="{_escapar_rotulo(endpoint)}",'
+                    f'status="{_escapar_rotulo(status)}"}} {n}'
+                )
+            
+            cabecalho("resposta_bytes_total", "counter", "Bytes recebidos por endpoint")
+            for endpoint, total in sorted(self.bytes_endpoint.items()):
+                linhas.append(f'{prefixo}_resposta_bytes_total{{endpoint="{_escapar_rotulo(endpoint)}"}} {total}')
+            
+            cabecalho("requisicao_erros_total", "counter", "Requisições com erro por endpoint e classe")
+            for (endpoint, tipo), n in sorted(self.erros.items()):
+                linhas.append(
+                    f'{prefixo}_requisicao_erros_total{{endpoint="{_escapar_rotulo(endpoint)}",'
+                    f'tipo="{_escapar_rotulo(tipo)}"}} {n}'
+                )
+        
+            cabecalho(
+                "chamadas_compartilhadas_total", "counter",
+                "Chamadas atendidas por uma requisição idêntica em voo, sem ir à VTEX, por endpoint"
+            )
+            for endpoint, n in sorted(self.compartilhadas.items()):
+                linhas.append(f'{prefixo}_chamadas_compartilhadas_total{{endpoint="{_escapar_rotulo(endpoint)}"}} {n}')
+        
+        duracao = self.duracao
+        cabecalho("execucao_duracao_segundos", "gauge", "Duração da última execução")
+        linhas.append(f"{prefixo}_execucao_duracao_segundos {duracao:.3f}")
+        cabecalho("execucao_requisicoes_por_segundo", "gauge", "Requisições por segundo da última execução")
+        linhas.append(
+            f"{prefixo}_execucao_requisicoes_por_segundo {self.total_requisicoes / duracao if duracao > 0 else 0:.3f}"
+        )
+        return "\n".join(linhas) + "\n"
+    
+    def exportar_prometheus(self, caminho=ARQUIVO_PROMETHEUS_PADRAO):
+        """Grava as métricas no arquivo lido pelo coletor (substituição atômica)"""
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporario, caminho)
+
+
+def _escapar_rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exportar_metricas(metricas, configuracoes):
+    """Exporta as métricas da execução para o arquivo do Prometheus da configuração
+    
+    A exportação é opcional: retorna o caminho gravado, ou None se ela estiver
+    desligada (caminho vazio, o padrão) ou falhar.
+    """
+    caminho = configuracoes.get("metricas_arquivo_prometheus", "")
+    if not caminho:
+        return None
+    try:
+        metricas.exportar_prometheus(caminho)
+    except OSError as e:
+        print(f"Erro ao exportar métricas para {caminho}: {str(e)}")
+        return None
+    return caminho
@@ -0,0 +1,516 @@
+"""
+Servidor local que imita as APIs da VTEX usadas pelo simulador
+
+Implementa shipping-policies, inventory/skus/{sku} e orderForms/simulation
+com latência, taxa de erros e tamanho de resposta configuráveis, para medir
+o desempenho dos motores sem acessar a VTEX de produção:
+
+    python mock_vtex.py --porta 8800 --latencia lognormal:80:0.4 --taxa-429 0.02
+
+Para apontar o simulador (interface, cli.py ou servico.py) para o mock:
+
+    VTEX_URL_BASE="http://127.0.0.1:8800/{conta}" python main.py
+
+A loja é identificada pelo host ({loja}.vtexcommercestable.com.br ou
+{loja}.localhost, quando o DNS aponta esses nomes para o mock) ou pelo
+primeiro segmento do caminho (/{loja}/api/...). As respostas de cada loja
+e SKU são determinísticas (mesma loja, mesmo resultado).
+
+GET /__mock/estatisticas devolve as requisições atendidas desde o último
+POST /__mock/zerar: contagem por rota e status e latência em ms.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from limitadores import percentil
+
+
+PORTA_PADRAO = 8800
+
+ROTA_POLITICAS = "politicas"
+ROTA_ESTOQUE = "estoque"
+ROTA_SIMULACAO = "simulacao"
+
+_CAMINHO_ESTOQUE = re.compile(r"^/api/logistics/pvt/inventory/skus/([^/]+)$")
+_SUFIXOS_HOST = (".vtexcommercestable.com.br", ".localhost")
+
+
+class DistribuicaoLatencia:
+    """Latência sorteada a cada resposta, descrita como "tipo:parâmetros" em ms
+    
+    fixa:50           sempre 50 ms
+    uniforme:20:120   entre 20 e 120 ms
+    normal:80:20      média 80 ms, desvio 20 ms
+    lognormal:80:0.5  mediana 80 ms, sigma 0.5 (cauda longa, como a VTEX)
+    """
+    
+    TIPOS = ("fixa", "uniforme", "normal", "lognormal")
+    
+    def __init__(self, tipo="fixa", parametros=(0,)):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Distribuição desconhecida: {tipo}")
+        self.tipo = tipo
+        self.parametros = parametros
+    
+    @classmethod
+    def de_texto(cls, texto):
+        tipo, *parametros = texto.split(":")
+        quantidade = {"fixa": 1, "uniforme": 2, "normal": 2, "lognormal": 2}.get(tipo)
+        if quantidade is None or len(parametros) != quantidade:
+            raise ValueError(f"Latência inválida: {texto} (ex.: fixa:50, lognormal:80:0.5)")
+        return cls(tipo, tuple(float(p) for p in parametros))
+    
+    def amostra(self, rng=random):
+        """Latência sorteada, em segundos"""
+        if self.tipo == "fixa":
+            ms = self.parametros[0]
+        elif self.tipo == "uniforme":
+            ms = rng.uniform(*self.parametros)
+        elif self.tipo == "normal":
+            ms = rng.gauss(*self.parametros)
+        else:
+            mediana, sigma = self.parametros
+            ms = mediana * rng.lognormvariate(0, sigma)
+        return max(ms, 0) / 1000
+    
+    def __str__(self):
+        return ":".join([self.tipo] + [f"{p:g}" for p in self.parametros])
+
+
+class CenarioMock:
+    """Comportamento do mock: latências, erros e tamanho das respostas"""
+    
+    def __init__(self, latencia="fixa:50", latencias_por_rota=None, taxa_429=0.0, taxa_5xx=0.0,
+                 taxa_timeout=0.0, atraso_timeout=30.0, retry_after=1, politicas=5, slas=4,
+                 armazens=3, fracao_retirada=0.3, fracao_sem_cobertura=0.1, tamanho_extra_kb=0):
+        self.latencia = DistribuicaoLatencia.de_texto(latencia)
+        # Latência específica de uma rota (ROTA_POLITICAS, ROTA_ESTOQUE, ROTA_SIMULACAO)
+        self.latencias_por_rota = {
+            rota: DistribuicaoLatencia.de_texto(texto)
+            for rota, texto in (latencias_por_rota or {}).items() if texto
+        }
+        self.taxa_429 = taxa_429
+        self.taxa_5xx = taxa_5xx
+        # Respostas que demoram atraso_timeout segundos (mais que o timeout do cliente)
+        self.taxa_timeout = taxa_timeout
+        self.atraso_timeout = atraso_timeout
+        self.retry_after = retry_after
+        self.politicas = politicas
+        self.slas = slas
+        self.armazens = armazens
+        self.fracao_retirada = fracao_retirada
+        self.fracao_sem_cobertura = fracao_sem_cobertura
+        self.tamanho_extra_kb = tamanho_extra_kb
+    
+    def latencia_da_rota(self, rota):
+        return self.latencias_por_rota.get(rota, self.latencia)
+
+
+def _rng(*partes):
+    """Gerador determinístico para a combinação (loja, sku, ...)"""
+    return random.Random(zlib.crc32("|".join(str(p) for p in partes).encode("utf-8")))
+
+
+def gerar_politicas(cenario, loja):
+    """Resposta de shipping-policies: as primeiras políticas ativas, a última inativa"""
+    return {
+        "items": [
+            {
+                "id": f"{loja}-politica-{i}",
+                "name": f"Transportadora {i}",
+                "shippingMethod": "Normal" if i % 2 == 0 else "Expressa",
+                "isActive": i < cenario.politicas - 1 or cenario.politicas == 1,
+            }
+            for i in range(cenario.politicas)
+        ],
+        "paging": {"page": 1, "perPage": 50, "total": cenario.politicas, "pages": 1},
+    }
+
+
+def gerar_estoque(cenario, loja, sku):
+    """Resposta de inventory/skus/{sku}; o primeiro armazém é o principal (1_1)"""
+    rng = _rng(loja, sku, "estoque")
+    return {
+        "skuId": sku,
+        "balance": [
+            {
+                "warehouseId": "1_1" if i == 0 else f"{loja}_{i}",
+                "warehouseName": "Principal" if i == 0 else f"Armazém {i}",
+                "totalQuantity": rng.choice((0, 0, 1, 2, 5, 10, 50)),
+                "reservedQuantity": 0,
+                "hasUnlimitedQuantity": False,
+            }
+            for i in range(cenario.armazens)
+        ],
+    }
+
+
+def _sla_entrega(loja, i, rng):
+    dias = rng.randint(1, 12)
+    preco = rng.randint(0, 60) * 100 + 90
+    return {
+        "id": f"Transportadora {i}",
+        "deliveryChannel": "delivery",
+        "name": f"Transportadora {i}",
+        "deliveryIds": [{
+            "courierId": f"{loja}-politica-{i}",
+            "warehouseId": "1_1",
+            "dockId": "1",
+            "courierName": f"Transportadora {i}",
+            "quantity": 1,
+        }],
+        "shippingEstimate": f"{dias}bd",
+        "shippingEstimateDate": None,
+        "price": preco,
+        "listPrice": preco,
+        "tax": 0,
+        "pickupStoreInfo": {"isPickupStore": False, "friendlyName": None, "address": None},
+        "pickupPointId": None,
+        "pickupDistance": 0.0,
+        "polygonName": "",
+    }
+
+
+def _sla_retirada(loja, i, rng):
+    return {
+        "id": f"Retirada ({loja})",
+        "deliveryChannel": "pickup-in-point",
+        "name": f"Retirada ({loja})",
+        "deliveryIds": [{
+            "courierId": f"{loja}-politica-{i}",
+            "warehouseId": "1_1",
+            "dockId": "1",
+            "courierName": "Retirada na loja",
+            "quantity": 1,
+        }],
+        "shippingEstimate": f"{rng.randint(0, 3)}bd",
+        "price": 0,
+        "listPrice": 0,
+        "tax": 0,
+        "pickupStoreInfo": {
+            "isPickupStore": True,
+            "friendlyName": f"Loja {loja}",
+            "address": {
+                "addressType": "pickup",
+                "postalCode": f"0{rng.randint(1000, 9999)}000",
+                "city": "São Paulo",
+                "state": "SP",
+                "country": "BRA",
+                "street": "Rua do Mock",
+                "number": str(rng.randint(1, 2000)),
+                "neighborhood": "Centro",
+                "complement": "",
+            },
+        },
+        "pickupPointId": f"1_{loja}",
+        "pickupDistance": round(rng.uniform(0.5, 30), 2),
+        "polygonName": "",
+    }
+
+
+def gerar_simulacao(cenario, loja, corpo):
+    """Resposta de orderForms/simulation para os itens do corpo enviado"""
+    itens = corpo.get("items") or []
+    cep = str(corpo.get("postalCode", ""))
+    sem_cobertura = _rng(loja, cep, "cobertura").random() < cenario.fracao_sem_cobertura
+    
+    items, logistics_info = [], []
+    for indice, item in enumerate(itens):
+        sku = str(item.get("id"))
+        rng = _rng(loja, sku, cep)
+        preco = rng.randint(50, 900) * 100 + 99
+        items.append({
+            "id": sku,
+            "requestIndex": indice,
+            "quantity": item.get("quantity", 1),
+            "seller": item.get("seller", "1"),
+            "sellerChain": ["1", item.get("seller", "1")],
+            "price": preco,
+            "listPrice": preco,
+            "sellingPrice": preco,
+            "measurementUnit": "un",
+            "unitMultiplier": 1.0,
+            "availability": "available",
+            "offerings": [],
+            "priceTags": [],
+        })
+        
+        slas = []
+        if not sem_cobertura:
+            slas = [_sla_entrega(loja, i % cenario.politicas, rng) for i in range(cenario.slas)]
+            if rng.random() < cenario.fracao_retirada:
+                slas.append(_sla_retirada(loja, 0, rng))
+        logistics_info.append({
+            "itemIndex": indice,
+            "addressId": None,
+            "selectedSla": None,
+            "selectedDeliveryChannel": None,
+            "quantity": item.get("quantity", 1),
+            "shipsTo": ["BRA"],
+            "slas": slas,
+            "deliveryChannels": [{"id": "delivery"}, {"id": "pickup-in-point"}],
+        })
+    
+    resposta = {
+        "items": items,
+        "ratesAndBenefitsData": {"rateAndBenefitsIdentifiers": [], "teaser": []},
+        "paymentData": {"installmentOptions": [], "paymentSystems": [], "payments": [], "giftCards": []},
+        "selectableGifts": [],
+        "marketingData": None,
+        "postalCode": cep,
+        "country": corpo.get("country", "BRA"),
+        "logisticsInfo": logistics_info,
+        "messages": [],
+        "purchaseConditions": {"itemPurchaseConditions": []},
+        "pickupPoints": [],
+        "subscriptionData": None,
+        "totals": [{"id": "Items", "name": "Total dos Itens", "value": sum(i["price"] for i in items)}],
+        "itemMetadata": None,
+    }
+    if cenario.tamanho_extra_kb:
+        # Campos que o simulador ignora, mas que a VTEX devolve e precisam ser lidos
+        resposta["paymentData"]["installmentOptions"] = [
+            {"paymentSystem": str(i), "bin": None, "paymentName": "Cartão " * 10, "value": 0}
+            for i in range(cenario.tamanho_extra_kb * 1024 // 100)
+        ]
+    return resposta
+
+
+class EstatisticasMock:
+    """Requisições atendidas: contagem por (rota, status) e latência de cada uma"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+    
+    def zerar(self):
+        with self._lock:
+            self.inicio = time.monotonic()
+            self.contagem = {}
+            self.latencias = []
+    
+    def registrar(self, rota, status, duracao):
+        with self._lock:
+            chave = f"{rota} {status}"
+            self.contagem[chave] = self.contagem.get(chave, 0) + 1
+            self.latencias.append(duracao)
+    
+    def resumo(self):
+        with self._lock:
+            latencias = list(self.latencias)
+            contagem = dict(self.contagem)
+            decorrido = time.monotonic() - self.inicio
+        return {
+            "requisicoes": len(latencias),
+            "decorrido_s": round(decorrido, 3),
+            "contagem": contagem,
+            "latencia_ms": {
+                f"p{p}": round(percentil(latencias, p) * 1000, 1) for p in (50, 95, 99)
+            },
+        }
+
+
+class ServidorMock(ThreadingHTTPServer):
+    daemon_threads = True
+    # Muitas lojas conectando ao mesmo tempo não podem estourar a fila de conexões
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Cliente que desistiu (timeout) e fechou a conexão não é erro do mock
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class ManipuladorMock(BaseHTTPRequestHandler):
+    """Rotas da VTEX imitadas; cenario e estatisticas são definidos em criar_mock"""
+    
+    protocol_version = "HTTP/1.1"
+    cenario = None
+    estatisticas = None
+    
+    def log_message(self, formato, *args):
+        pass
+    
+    def _responder(self, status, corpo, headers=None):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        try:
+            self.end_headers()
+            self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            # O cliente já desistiu da resposta (timeout); a conexão não serve mais
+            self.close_connection = True
+    
+    def _loja_e_caminho(self):
+        """(loja, caminho da API) pelo host ou pelo primeiro segmento do caminho"""
+        caminho = urlsplit(self.path).path
+        host = (self.headers.get("Host") or "").split(":")[0]
+        for sufixo in _SUFIXOS_HOST:
+            if host.endswith(sufixo):
+                return host[:-len(sufixo)], caminho
+        partes = caminho.split("/", 2)
+        if len(partes) == 3 and partes[1] and partes[1] != "api":
+            return partes[1], "/" + partes[2]
+        return None, caminho
+    
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if not tamanho:
+            return {}
+        try:
+            return json.loads(self.rfile.read(tamanho))
+        except ValueError:
+            return None
+    
+    def do_GET(self):
+        if self.path.startswith("/__mock/estatisticas"):
+            self._responder(200, self.estatisticas.resumo())
+            return
+        self._atender("GET")
+    
+    def do_POST(self):
+        if self.path.startswith("/__mock/zerar"):
+            self.estatisticas.zerar()
+            self._responder(200, {"ok": True})
+            return
+        self._atender("POST")
+    
+    def _atender(self, metodo):
+        inicio = time.monotonic()
+        corpo = self._ler_corpo() if metodo == "POST" else {}
+        loja, caminho = self._loja_e_caminho()
+        
+        rota, status, resposta, headers = None, 404, {"error": "Not Found"}, None
+        if loja and metodo == "GET" and caminho == "/api/logistics/pvt/shipping-policies":
+            rota = ROTA_POLITICAS
+        elif loja and metodo == "GET" and _CAMINHO_ESTOQUE.match(caminho):
+            rota = ROTA_ESTOQUE
+        elif loja and metodo == "POST" and caminho == "/api/checkout/pub/orderForms/simulation":
+            rota = ROTA_SIMULACAO
+        
+        if rota is not None:
+            time.sleep(self.cenario.latencia_da_rota(rota).amostra())
+            status, resposta, headers = self._responder_rota(rota, loja, caminho, corpo)
+        
+        # Registrada antes do envio: conta também as respostas que o cliente abandonou
+        self.estatisticas.registrar(rota or "desconhecida", status, time.monotonic() - inicio)
+        self._responder(status, resposta, headers)
+    
+    def _responder_rota(self, rota, loja, caminho, corpo):
+        """(status, corpo, headers) da rota, já com os erros sorteados do cenário"""
+        cenario = self.cenario
+        sorteio = random.random()
+        if sorteio < cenario.taxa_429:
+            return 429, {"error": "Too Many Requests"}, {"Retry-After": str(cenario.retry_after)}
+        sorteio -= cenario.taxa_429
+        if sorteio < cenario.taxa_5xx:
+            return 503, {"error": "Service Unavailable"}, None
+        sorteio -= cenario.taxa_5xx
+        if sorteio < cenario.taxa_timeout:
+            time.sleep(cenario.atraso_timeout)
+        
+        if rota == ROTA_POLITICAS:
+            return 200, gerar_politicas(cenario, loja), None
+        if rota == ROTA_ESTOQUE:
+            sku = _CAMINHO_ESTOQUE.match(caminho).group(1)
+            return 200, gerar_estoque(cenario, loja, sku), None
+        if corpo is None:
+            return 400, {"error": {"code": "ORD002", "message": "Invalid JSON"}}, None
+        return 200, gerar_simulacao(cenario, loja, corpo), None
+
+
+def criar_mock(cenario=None, host="127.0.0.1", porta=PORTA_PADRAO):
+    """Cria o servidor mock (ainda parado); porta 0 escolhe uma porta livre"""
+    manipulador = type("Manipulador", (ManipuladorMock,), {
+        "cenario": cenario or CenarioMock(),
+        "estatisticas": EstatisticasMock(),
+    })
+    return ServidorMock((host, porta), manipulador)
+
+
+def iniciar_mock(cenario=None, host="127.0.0.1", porta=0):
+    """Cria e inicia o mock em uma thread; retorna (servidor, url_base com {conta})"""
+    servidor = criar_mock(cenario, host, porta)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address[:2]
+    return servidor, f"http://{host}:{porta}/{{conta}}"
+
+
+def adicionar_argumentos_cenario(parser):
+    """Opções do cenário, compartilhadas com o teste_carga.py"""
+    grupo = parser.add_argument_group("cenário do mock")
+    grupo.add_argument("--latencia", default="fixa:50",
+                       help="Distribuição de latência em ms: fixa:50, uniforme:20:120, normal:80:20, lognormal:80:0.5")
+    grupo.add_argument("--latencia-politicas", help="Latência específica de shipping-policies")
+    grupo.add_argument("--latencia-estoque", help="Latência específica de inventory")
+    grupo.add_argument("--latencia-simulacao", help="Latência específica de orderForms/simulation")
+    grupo.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 (0-1)")
+    grupo.add_argument("--taxa-5xx", type=float, default=0.0, help="Fração de respostas 503 (0-1)")
+    grupo.add_argument("--taxa-timeout", type=float, default=0.0, help="Fração de respostas atrasadas além do timeout")
+    grupo.add_argument("--atraso-timeout", type=float, default=30.0, help="Atraso dessas respostas, em segundos")
+    grupo.add_argument("--retry-after", type=int, default=1, help="Retry-After das respostas 429, em segundos")
+    grupo.add_argument("--politicas", type=int, default=5, help="Políticas de envio por loja")
+    grupo.add_argument("--slas", type=int, default=4, help="SLAs de entrega por item")
+    grupo.add_argument("--armazens", type=int, default=3, help="Armazéns por resposta de estoque")
+    grupo.add_argument("--fracao-retirada", type=float, default=0.3, help="Fração de itens com retirada na loja")
+    grupo.add_argument("--fracao-sem-cobertura", type=float, default=0.1, help="Fração de lojas sem entrega no CEP")
+    grupo.add_argument("--tamanho-extra-kb", type=int, default=0,
+                       help="KB de campos extras em cada simulação (respostas reais passam de 10 KB)")
+    return grupo
+
+
+def cenario_dos_argumentos(args):
+    return CenarioMock(
+        latencia=args.latencia,
+        latencias_por_rota={
+            ROTA_POLITICAS: args.latencia_politicas,
+            ROTA_ESTOQUE: args.latencia_estoque,
+            ROTA_SIMULACAO: args.latencia_simulacao,
+        },
+        taxa_429=args.taxa_429, taxa_5xx=args.taxa_5xx, taxa_timeout=args.taxa_timeout,
+        atraso_timeout=args.atraso_timeout, retry_after=args.retry_after, politicas=args.politicas,
+        slas=args.slas, armazens=args.armazens, fracao_retirada=args.fracao_retirada,
+        fracao_sem_cobertura=args.fracao_sem_cobertura, tamanho_extra_kb=args.tamanho_extra_kb
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mock_vtex.py", description="Servidor local que imita as APIs da VTEX")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO, help="Porta de escuta")
+    adicionar_argumentos_cenario(parser)
+    args = parser.parse_args(argv)
+    
+    try:
+        cenario = cenario_dos_argumentos(args)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    servidor = criar_mock(cenario, args.host, args.porta)
+    host, porta = servidor.server_address[:2]
+    print(f"Mock VTEX em http://{host}:{porta} (latência {cenario.latencia})", file=sys.stderr)
+    print(f'Use VTEX_URL_BASE="http://{host}:{porta}/{{conta}}" para apontar o simulador', file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
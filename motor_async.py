@@ -0,0 +1,400 @@
+"""
+Motor de simulação assíncrono (asyncio + aiohttp)
+
+Alternativa ao ThreadPoolExecutor: uma única thread mantém centenas de
+requisições em voo e devolve o mesmo formato de resultado por loja.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # Dependência opcional
+    aiohttp = None
+
+from cache import cache_politicas, cache_estoque
+from cassete import MODO_REPRODUZIR, ForaDoCassete, headers_da_entrada
+from limitadores import CircuitoAberto
+from metricas import MetricasExecucao, ENDPOINT_POLITICAS, ENDPOINT_SIMULACAO, ENDPOINT_ESTOQUE
+from rastreamento import rastrear, SPAN_CLIENTE
+from retentativas import (
+    FalhaRequisicao, ERRO_TIMEOUT, ERRO_CONEXAO, ERRO_RESPOSTA, INTERVALO_CANCELAMENTO,
+    tipo_erro_status, status_repetivel
+)
+from transporte import chave_requisicao
+from simulacao import (
+    HEADERS_PUBLICOS, url_conta, seller_da_loja, headers_privados,
+    montar_payload_simulacao, extrair_politicas_ativas, montar_resultados_chamadas,
+    resultados_em_cache, guardar_em_cache
+)
+
+
+def motor_async_disponivel():
+    """Indica se o aiohttp está instalado"""
+    return aiohttp is not None
+
+
+class MotorSimulacaoAsync:
+    """Executa a simulação de frete de várias lojas em um event loop"""
+    
+    def __init__(self, cep, skus, app_key, app_token, conta_principal, limite_conexoes=200, timeout=10,
+                 transporte=None, orcamento=None, forcar_atualizacao=False, cancelamento=None,
+                 metricas=None, rastreador=None):
+        self.cep = cep
+        self.skus = skus
+        self.app_key = app_key
+        self.app_token = app_token
+        self.conta_principal = conta_principal
+        self.limite_conexoes = limite_conexoes
+        self.timeout = timeout
+        self.orcamento = orcamento
+        self.forcar_atualizacao = forcar_atualizacao
+        # threading.Event ativado por quem quer interromper a execução
+        self.cancelamento = cancelamento
+        # Requisições da execução por endpoint e por loja (metricas.py)
+        self.metricas = metricas or MetricasExecucao()
+        # Rastreador opcional (rastreamento.py): o span atual acompanha cada tarefa
+        self.rastreador = rastreador
+        
+        # Controles compartilhados com o transporte das threads (sem transporte,
+        # as requisições saem sem limites nem retentativas)
+        self.limitador = transporte.limitador if transporte else None
+        self.limitador_taxa = transporte.limitador_taxa if transporte else None
+        self.retentativas = transporte.retentativas if transporte else None
+        self.hedge = transporte.hedge if transporte else None
+        self.disjuntores = transporte.disjuntores if transporte else None
+        self.chamadas_em_voo = transporte.chamadas_em_voo if transporte else None
+        self.cassete = transporte.cassete if transporte else None
+        self._em_voo = 0
+        self._vaga = None
+    
+    async def executar(self, lojas, ao_progresso=None, ao_erro=None, ao_resultado=None):
+        """Simula todas as lojas e retorna {loja: {sku: resultado}}
+        
+        ao_resultado(loja, data) recebe cada loja assim que ela termina. Com o
+        cancelamento ativado, as tarefas pendentes (e suas requisições em voo)
+        são canceladas e retorna só o que já havia terminado.
+        """
+        resultados = {}
+        total = len(lojas)
+        self._vaga = asyncio.Condition()
+        
+        connector = aiohttp.TCPConnector(limit=self.limite_conexoes, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as sessao:
+            pendentes = {asyncio.ensure_future(self._simular_loja(sessao, loja)) for loja in lojas}
+            concluidas = 0
+            
+            # Processar resultados conforme ficam prontos
+            while pendentes and not self._cancelada():
+                prontas, pendentes = await asyncio.wait(
+                    pendentes, timeout=INTERVALO_CANCELAMENTO, return_when=asyncio.FIRST_COMPLETED
+                )
+                for tarefa in prontas:
+                    loja, data, erro = tarefa.result()
+                    if erro is not None:
+                        if ao_erro:
+                            ao_erro(loja, erro)
+                    elif data:
+                        resultados[loja] = data
+                        if ao_resultado:
+                            ao_resultado(loja, data)
+                    
+                    # Atualizar progresso
+                    concluidas += 1
+                    if ao_progresso:
+                        ao_progresso(concluidas, total)
+            
+            # Cancelada: interromper as requisições que ainda estão em voo
+            for tarefa in pendentes:
+                tarefa.cancel()
+            if pendentes:
+                await asyncio.gather(*pendentes, return_exceptions=True)
+        
+        self.metricas.concluir()
+        return resultados
+    
+    def _cancelada(self):
+        return self.cancelamento is not None and self.cancelamento.is_set()
+    
+    async def _simular_loja(self, sessao, loja):
+        """Envolve simular_frete para nunca propagar exceções ao laço de resultados"""
+        try:
+            return loja, await self.simular_frete(sessao, loja), None
+        except Exception as e:
+            return loja, None, e
+    
+    async def _adquirir(self):
+        """Aguarda vaga abaixo do limite adaptativo (sem limitador, não bloqueia)"""
+        if self.limitador is None:
+            return
+        async with self._vaga:
+            await self._vaga.wait_for(lambda: self._em_voo < self.limitador.limite_atual())
+            self._em_voo += 1
+    
+    async def _liberar(self, duracao, status, falha, registrar=True):
+        if self.limitador is None:
+            return
+        if registrar:
+            self.limitador.registrar(duracao, status, falha)
+        async with self._vaga:
+            self._em_voo -= 1
+            self._vaga.notify_all()
+    
+    async def _requisitar(self, sessao, metodo, url, **kwargs):
+        """Retorna o JSON de uma resposta 200 ou levanta FalhaRequisicao classificada
+        
+        Chamadas idênticas em voo (deste motor ou das threads) são compartilhadas.
+        """
+        if self.chamadas_em_voo is None:
+            return await self._requisitar_com_retentativas(sessao, metodo, url, **kwargs)
+        chave = chave_requisicao(metodo, url, kwargs.get("params"), kwargs.get("json"))
+        return await self.chamadas_em_voo.executar_async(
+            chave, lambda: self._requisitar_com_retentativas(sessao, metodo, url, **kwargs), kwargs.get("medicao")
+        )
+    
+    async def _requisitar_com_retentativas(self, sessao, metodo, url, **kwargs):
+        """Segue as regras do transporte das threads
+        
+        Ritmo por host, limite adaptativo, circuit breaker e retentativas com
+        backoff para timeouts, falhas de conexão, 5xx e 429 (que também pausa
+        o host pelo Retry-After).
+        """
+        host = urlsplit(url).hostname
+        balde = self.limitador_taxa.balde(host) if self.limitador_taxa is not None else None
+        
+        tentativa = 0
+        while True:
+            try:
+                status, dados, headers = await self._enviar_com_hedge(sessao, balde, host, metodo, url, **kwargs)
+            except asyncio.TimeoutError:
+                falha = FalhaRequisicao(ERRO_TIMEOUT, "Erro de conexão: tempo esgotado")
+            except aiohttp.ClientError as e:
+                falha = FalhaRequisicao(ERRO_CONEXAO, f"Erro de conexão: {str(e)}")
+            except ValueError as e:
+                raise FalhaRequisicao(ERRO_RESPOSTA, f"Resposta inválida: {str(e)}") from e
+            except CircuitoAberto as e:
+                if not e.em_sondagem:
+                    raise
+                falha = e
+            else:
+                if status == 200:
+                    return dados
+                falha = FalhaRequisicao(tipo_erro_status(status), f"Erro na API: Status {status}")
+                if not status_repetivel(status):
+                    raise falha
+                if status == 429 and self.limitador_taxa is not None:
+                    self.limitador_taxa.registrar_429(host, headers)
+            
+            if self.retentativas is None or not self.retentativas.pode_repetir(tentativa, self.orcamento):
+                raise falha
+            if self.cassete is None or not self.cassete.sem_espera:
+                await asyncio.sleep(self.retentativas.espera(tentativa))
+            tentativa += 1
+    
+    async def _enviar_com_hedge(self, sessao, balde, host, metodo, url, **kwargs):
+        """Envia a requisição e, se passar do p90 do host, uma duplicata
+        
+        Vale a primeira resposta que chegar; a outra é cancelada.
+        """
+        atraso = self.hedge.atraso(host) if self.hedge is not None else None
+        if atraso is None:
+            return await self._enviar(sessao, balde, host, metodo, url, **kwargs)
+        
+        original = asyncio.ensure_future(self._enviar(sessao, balde, host, metodo, url, **kwargs))
+        concluidos, _ = await asyncio.wait([original], timeout=atraso)
+        if concluidos or not self.hedge.permitir():
+            return await original
+        
+        duplicata = asyncio.ensure_future(self._enviar(sessao, balde, host, metodo, url, **kwargs))
+        pendentes = {original, duplicata}
+        while True:
+            concluidos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            
+            # Uma exceção só vale se a outra requisição também falhar
+            for vencedor in sorted(concluidos, key=lambda tarefa: tarefa.exception() is not None):
+                if vencedor.exception() is None or not pendentes:
+                    for perdedor in pendentes:
+                        perdedor.cancel()
+                    if vencedor is duplicata and vencedor.exception() is None:
+                        self.hedge.registrar_vitoria()
+                    return vencedor.result()
+    
+    async def _enviar(self, sessao, balde, host, metodo, url, medicao=None, **kwargs):
+        # Host com circuito aberto: recusar sem esperar token nem vaga
+        if self.disjuntores is not None:
+            self.disjuntores.verificar(host)
+        
+        try:
+            # A reprodução de cassete na velocidade máxima não tem ritmo por host
+            if balde is not None and (self.cassete is None or not self.cassete.sem_espera):
+                espera = balde.reservar()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+            
+            await self._adquirir()
+        except BaseException:
+            # Cancelada antes de enviar: devolver a sondagem que verificar() possa ter liberado
+            if self.disjuntores is not None:
+                self.disjuntores.desistir(host)
+            raise
+        inicio = time.monotonic()
+        status = None
+        erro = None
+        tamanho = 0
+        cancelada = False
+        fora_do_cassete = False
+        try:
+            if self.cassete is not None:
+                status, dados, headers, tamanho = await self._enviar_com_cassete(sessao, metodo, url, **kwargs)
+            else:
+                async with sessao.request(metodo, url, **kwargs) as response:
+                    status = response.status
+                    headers = response.headers
+                    corpo = await response.read()
+                    tamanho = len(corpo)
+                    # Corpo vazio vale None, como em response.json()
+                    dados = json.loads(corpo) if status == 200 and corpo.strip() else None
+            if balde is not None:
+                balde.atualizar_por_headers(headers)
+            if self.hedge is not None:
+                self.hedge.registrar(host, time.monotonic() - inicio)
+            return status, dados, headers
+        except asyncio.CancelledError:
+            # Perdedora de um hedge: não conta como falha do host
+            cancelada = True
+            raise
+        except asyncio.TimeoutError:
+            erro = ERRO_TIMEOUT
+            raise
+        except ForaDoCassete:
+            # Não chegou ao host: nada a dizer sobre a saúde dele
+            fora_do_cassete = True
+            raise
+        finally:
+            duracao = time.monotonic() - inicio
+            falha = status is None and not cancelada
+            await self._liberar(duracao, status, falha, registrar=not fora_do_cassete)
+            if self.disjuntores is not None:
+                if cancelada or fora_do_cassete:
+                    self.disjuntores.desistir(host)
+                else:
+                    self.disjuntores.registrar(host, falha=falha or status >= 500)
+            # Requisição cancelada (hedge perdedor ou execução cancelada) não chegou a terminar
+            if medicao is not None and not cancelada:
+                medicao(status, tamanho, duracao, erro)
+    
+    async def _enviar_com_cassete(self, sessao, metodo, url, **kwargs):
+        """(status, JSON, headers, bytes) reproduzidos do cassete ou enviados e gravados nele"""
+        cassete = self.cassete
+        if cassete.modo == MODO_REPRODUZIR:
+            entrada = await cassete.responder_async(metodo, url, kwargs.get("params"), kwargs.get("json"))
+            if entrada is None:
+                # Repetir não adianta: a requisição continuaria fora do cassete
+                raise ForaDoCassete(metodo, url)
+            if entrada.get("erro") == ERRO_TIMEOUT:
+                raise asyncio.TimeoutError()
+            if entrada.get("erro"):
+                raise aiohttp.ClientConnectionError(f"Falha de conexão (cassete): {url}")
+            status = entrada["status"]
+            texto = entrada.get("resposta") or ""
+            dados = json.loads(texto or "null") if status == 200 else None
+            return status, dados, headers_da_entrada(entrada), len(texto.encode("utf-8"))
+        
+        inicio = time.monotonic()
+        try:
+            async with sessao.request(metodo, url, **kwargs) as response:
+                texto = await response.text()
+        except asyncio.TimeoutError:
+            cassete.registrar(metodo, url, kwargs, inicio, erro=ERRO_TIMEOUT)
+            raise
+        except aiohttp.ClientError:
+            cassete.registrar(metodo, url, kwargs, inicio, erro=ERRO_CONEXAO)
+            raise
+        cassete.registrar(metodo, url, kwargs, inicio, status=response.status, headers=response.headers, texto=texto)
+        dados = json.loads(texto) if response.status == 200 else None
+        return response.status, dados, response.headers, len(texto.encode("utf-8"))
+    
+    async def get_shipping_policies(self, sessao, loja):
+        active_policies = cache_politicas.obter(loja)
+        if active_policies is not None:
+            return active_policies
+        
+        url = url_conta(loja, self.conta_principal, "/api/logistics/pvt/shipping-policies")
+        headers = headers_privados(self.app_key, self.app_token)
+        
+        with rastrear(self.rastreador, ENDPOINT_POLITICAS, SPAN_CLIENTE, loja=loja):
+            policies = await self._requisitar(
+                sessao, "GET", url, headers=headers, medicao=self.metricas.medicao(ENDPOINT_POLITICAS, loja)
+            )
+        active_policies = extrair_politicas_ativas(policies)
+        cache_politicas.definir(loja, active_policies)
+        return active_policies
+    
+    async def get_inventory(self, sessao, loja, seller, sku):
+        # Cache compartilhado com a consulta de estoque
+        if not self.forcar_atualizacao:
+            inventory_data = cache_estoque.obter((loja, seller, sku))
+            if inventory_data is not None:
+                return inventory_data
+        
+        url = url_conta(loja, self.conta_principal, f"/api/logistics/pvt/inventory/skus/{sku}")
+        params = {'sellerId': seller}
+        headers = headers_privados(self.app_key, self.app_token)
+        
+        with rastrear(self.rastreador, ENDPOINT_ESTOQUE, SPAN_CLIENTE, loja=loja, sku=sku):
+            inventory_data = await self._requisitar(
+                sessao, "GET", url, headers=headers, params=params,
+                medicao=self.metricas.medicao(ENDPOINT_ESTOQUE, loja)
+            )
+        cache_estoque.definir((loja, seller, sku), inventory_data)
+        return inventory_data
+    
+    async def simular_frete(self, sessao, loja):
+        """Resultados {sku: resultado} da loja, reaproveitando o cache de simulações"""
+        with rastrear(self.rastreador, "simular_frete", loja=loja) as span:
+            if self.forcar_atualizacao:
+                resultados, faltantes = {}, self.skus
+            else:
+                resultados, faltantes = resultados_em_cache(loja, self.skus, self.cep)
+            
+            if span is not None:
+                span.definir(skus_em_cache=len(self.skus) - len(faltantes))
+            if faltantes:
+                novos = await self._consultar_skus(sessao, loja, faltantes)
+                guardar_em_cache(loja, self.cep, novos)
+                resultados.update(novos)
+            return resultados
+    
+    async def _consultar_skus(self, sessao, loja, skus):
+        seller = seller_da_loja(loja, self.conta_principal)
+        
+        # As chamadas são independentes até o filtro de SLAs; falhas classificadas
+        # voltam como valor para que a loja registre de qual chamada veio o erro
+        respostas = await asyncio.gather(
+            self.get_shipping_policies(sessao, loja),
+            self._simular_ordem(sessao, loja, seller, skus),
+            *(self.get_inventory(sessao, loja, seller, sku) for sku in skus),
+            return_exceptions=True
+        )
+        for resposta in respostas:
+            if isinstance(resposta, BaseException) and not isinstance(resposta, FalhaRequisicao):
+                raise resposta
+        
+        active_policies, simulation_data, *inventarios = respostas
+        return montar_resultados_chamadas(
+            skus, active_policies, simulation_data, dict(zip(skus, inventarios))
+        )
+    
+    async def _simular_ordem(self, sessao, loja, seller, skus):
+        """POST de simulação; levanta FalhaRequisicao se falhar"""
+        url = url_conta(loja, self.conta_principal, "/api/checkout/pub/orderForms/simulation")
+        payload = montar_payload_simulacao(skus, seller, self.cep)
+        
+        with rastrear(self.rastreador, ENDPOINT_SIMULACAO, SPAN_CLIENTE, loja=loja, skus=len(skus)):
+            return await self._requisitar(
+                sessao, "POST", url, headers=HEADERS_PUBLICOS, json=payload,
+                medicao=self.metricas.medicao(ENDPOINT_SIMULACAO, loja)
+            )
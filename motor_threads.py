@@ -0,0 +1,342 @@
+"""
+Motores de simulação e de estoque com pool de threads, sem dependência de Qt
+
+Usado pelas threads da interface (SimulacaoThread, EstoqueThread), pela
+linha de comando (cli.py) e pelo serviço HTTP (servico.py).
+"""
+import concurrent.futures
+import threading
+
+from transporte import get_transporte
+from cache import cache_politicas, cache_estoque
+from simulacao import (
+    HEADERS_PUBLICOS, url_conta, seller_da_loja, headers_privados,
+    montar_payload_simulacao, extrair_politicas_ativas, montar_resultados_chamadas,
+    resultados_em_cache, guardar_em_cache
+)
+from retentativas import FalhaRequisicao, ERRO_CANCELADO, INTERVALO_CANCELAMENTO
+from metricas import MetricasExecucao, ENDPOINT_POLITICAS, ENDPOINT_SIMULACAO, ENDPOINT_ESTOQUE
+from rastreamento import rastrear, copiar_contexto, SPAN_CLIENTE
+from config import MAX_WORKERS
+
+
+def aguardar_concluidos(futuros, cancelamento):
+    """Gera os futures conforme terminam, até todos terminarem ou a execução ser cancelada
+    
+    Ao cancelar, os futures ainda na fila são descartados e as requisições
+    em voo deixam de ser aguardadas (o resultado delas é ignorado).
+    """
+    pendentes = set(futuros)
+    while pendentes and not cancelamento.is_set():
+        concluidos, pendentes = concurrent.futures.wait(
+            pendentes, timeout=INTERVALO_CANCELAMENTO, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in concluidos:
+            yield future
+    for future in pendentes:
+        future.cancel()
+
+
+class MotorSimulacaoThreads:
+    """Executa a simulação de frete de várias lojas em um pool de threads"""
+    
+    def __init__(self, cep, skus, app_key, app_token, conta_principal, max_workers=MAX_WORKERS,
+                 transporte=None, orcamento=None, forcar_atualizacao=False, cancelamento=None,
+                 metricas=None, rastreador=None):
+        self.cep = cep
+        self.skus = skus
+        self.sku = skus[0]
+        self.app_key = app_key
+        self.app_token = app_token
+        self.conta_principal = conta_principal
+        self.max_workers = max_workers
+        self.forcar_atualizacao = forcar_atualizacao
+        self.transporte = transporte or get_transporte(max_workers)
+        self.orcamento = orcamento or self.transporte.novo_orcamento()
+        # threading.Event ativado por quem quer interromper a execução
+        self.cancelamento = cancelamento or threading.Event()
+        # Requisições da execução por endpoint e por loja (metricas.py)
+        self.metricas = metricas or MetricasExecucao()
+        # Rastreador opcional (rastreamento.py): spans por loja e por chamada
+        self.rastreador = rastreador
+        self.executor_chamadas = None
+    
+    def executar(self, lojas, ao_progresso=None, ao_erro=None, ao_resultado=None):
+        """Simula todas as lojas e retorna {loja: {sku: resultado}}
+        
+        Mesma interface do motor asyncio: ao_resultado(loja, data) recebe
+        cada loja assim que ela termina. Com o cancelamento ativado, retorna
+        só o que já havia terminado, sem esperar as requisições em voo.
+        """
+        resultados = {}
+        total = len(lojas)
+        
+        # Pool auxiliar para as chamadas de políticas e estoque de cada loja,
+        # que rodam em paralelo à simulação
+        self.executor_chamadas = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._tamanho_pool_chamadas(), thread_name_prefix="chamadas"
+        )
+        
+        # Usar ThreadPoolExecutor para processamento paralelo
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lojas")
+        try:
+            # Criar lista de futures (cada loja leva o contexto do rastreamento)
+            future_to_loja = {
+                executor.submit(copiar_contexto(self.simular_frete_skus), loja): loja
+                for loja in lojas
+            }
+            
+            # Processar resultados conforme ficam prontos
+            for idx, future in enumerate(aguardar_concluidos(future_to_loja, self.cancelamento)):
+                loja = future_to_loja[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    if ao_erro:
+                        ao_erro(loja, e)
+                else:
+                    if data:
+                        resultados[loja] = data
+                        if ao_resultado:
+                            ao_resultado(loja, data)
+                
+                # Atualizar progresso
+                if ao_progresso:
+                    ao_progresso(idx + 1, total)
+        finally:
+            # Cancelada, a execução não espera as requisições em voo
+            cancelada = self.cancelamento.is_set()
+            executor.shutdown(wait=not cancelada, cancel_futures=True)
+            self.executor_chamadas.shutdown(wait=False, cancel_futures=True)
+            self.metricas.concluir()
+        
+        return resultados
+    
+    def _tamanho_pool_chamadas(self):
+        """Threads do pool auxiliar: além do limite de requisições em voo, ficariam só esperando vaga"""
+        limitador = self.transporte.limitador
+        if limitador.ativo:
+            return max(1, int(limitador.limite_maximo))
+        return self.max_workers
+    
+    def get_shipping_policies(self, loja):
+        """Políticas de envio ativas da loja; levanta FalhaRequisicao se a consulta falhar"""
+        # Políticas mudam raramente: reutilizar as consultadas recentemente
+        active_policies = cache_politicas.obter(loja)
+        if active_policies is not None:
+            return active_policies
+        
+        url = url_conta(loja, self.conta_principal, "/api/logistics/pvt/shipping-policies")
+        headers = headers_privados(self.app_key, self.app_token)
+        
+        # Filtrar políticas ativas
+        with rastrear(self.rastreador, ENDPOINT_POLITICAS, SPAN_CLIENTE, loja=loja):
+            policies = self.transporte.requisitar_json(
+                "GET", url, headers=headers, orcamento=self.orcamento, cancelamento=self.cancelamento,
+                medicao=self.metricas.medicao(ENDPOINT_POLITICAS, loja)
+            )
+        active_policies = extrair_politicas_ativas(policies)
+        cache_politicas.definir(loja, active_policies)
+        return active_policies
+    
+    def get_inventory(self, loja, seller, sku):
+        """Estoque do SKU na loja; levanta FalhaRequisicao se a consulta falhar"""
+        # Cache compartilhado com a consulta de estoque
+        if not self.forcar_atualizacao:
+            inventory_data = cache_estoque.obter((loja, seller, sku))
+            if inventory_data is not None:
+                return inventory_data
+        
+        url = url_conta(loja, self.conta_principal, f"/api/logistics/pvt/inventory/skus/{sku}")
+        params = {'sellerId': seller}
+        headers = headers_privados(self.app_key, self.app_token)
+        
+        with rastrear(self.rastreador, ENDPOINT_ESTOQUE, SPAN_CLIENTE, loja=loja, sku=sku):
+            inventory_data = self.transporte.requisitar_json(
+                "GET", url, headers=headers, params=params, orcamento=self.orcamento,
+                cancelamento=self.cancelamento, medicao=self.metricas.medicao(ENDPOINT_ESTOQUE, loja)
+            )
+        cache_estoque.definir((loja, seller, sku), inventory_data)
+        return inventory_data
+    
+    @staticmethod
+    def _valor_ou_falha(futuro):
+        """Resultado do future ou a FalhaRequisicao que a chamada levantou"""
+        try:
+            return futuro.result()
+        except FalhaRequisicao as e:
+            return e
+    
+    def simular_frete(self, loja):
+        """Simula a loja para o SKU principal (modo de SKU único)"""
+        return self.simular_frete_skus(loja)[self.sku]
+    
+    def simular_frete_skus(self, loja):
+        """Simula todos os SKUs da loja; retorna {sku: resultado}
+        
+        SKUs com resultado recente no cache não são consultados de novo,
+        a não ser que a atualização seja forçada.
+        """
+        with rastrear(self.rastreador, "simular_frete", loja=loja) as span:
+            if self.forcar_atualizacao:
+                resultados, faltantes = {}, self.skus
+            else:
+                resultados, faltantes = resultados_em_cache(loja, self.skus, self.cep)
+            
+            if span is not None:
+                span.definir(skus_em_cache=len(self.skus) - len(faltantes))
+            if faltantes:
+                novos = self._consultar_skus(loja, faltantes)
+                guardar_em_cache(loja, self.cep, novos)
+                resultados.update(novos)
+            return resultados
+    
+    def _consultar_skus(self, loja, skus):
+        """Consulta os SKUs da loja em uma única simulação; retorna {sku: resultado}"""
+        # Determinar seller baseado na loja
+        seller = seller_da_loja(loja, self.conta_principal)
+        
+        # 1. Disparar políticas de envio e estoque em paralelo: nenhuma das
+        # chamadas depende das outras até o filtro de SLAs
+        futuro_politicas = self.executor_chamadas.submit(copiar_contexto(self.get_shipping_policies), loja)
+        futuros_estoque = {
+            sku: self.executor_chamadas.submit(copiar_contexto(self.get_inventory), loja, seller, sku)
+            for sku in skus
+        }
+        
+        # 2. Simular a ordem nesta thread enquanto as outras chamadas estão em voo
+        url = url_conta(loja, self.conta_principal, "/api/checkout/pub/orderForms/simulation")
+        payload = montar_payload_simulacao(skus, seller, self.cep)
+        
+        try:
+            with rastrear(self.rastreador, ENDPOINT_SIMULACAO, SPAN_CLIENTE, loja=loja, skus=len(skus)):
+                simulation_data = self.transporte.requisitar_json(
+                    "POST", url, headers=HEADERS_PUBLICOS, json=payload, orcamento=self.orcamento,
+                    cancelamento=self.cancelamento, medicao=self.metricas.medicao(ENDPOINT_SIMULACAO, loja)
+                )
+        except FalhaRequisicao as e:
+            simulation_data = e
+        
+        # 3. Juntar as chamadas paralelas
+        active_policies = self._valor_ou_falha(futuro_politicas)
+        inventarios = {sku: self._valor_ou_falha(futuro) for sku, futuro in futuros_estoque.items()}
+        
+        # 4. Filtrar SLAs e separar a resposta por SKU
+        return montar_resultados_chamadas(skus, active_policies, simulation_data, inventarios)
+
+
+class MotorEstoqueThreads:
+    """Consulta o estoque de um SKU em várias lojas em um pool de threads"""
+    
+    def __init__(self, sku, app_key, app_token, conta_principal, max_workers=MAX_WORKERS,
+                 transporte=None, orcamento=None, forcar_atualizacao=False, cancelamento=None,
+                 metricas=None):
+        self.sku = sku
+        self.app_key = app_key
+        self.app_token = app_token
+        self.conta_principal = conta_principal
+        self.max_workers = max_workers
+        self.forcar_atualizacao = forcar_atualizacao
+        self.transporte = transporte or get_transporte(max_workers)
+        self.orcamento = orcamento or self.transporte.novo_orcamento()
+        # threading.Event ativado por quem quer interromper a execução
+        self.cancelamento = cancelamento or threading.Event()
+        # Requisições da execução por endpoint e por loja (metricas.py)
+        self.metricas = metricas or MetricasExecucao()
+    
+    def executar(self, lojas, ao_progresso=None, ao_erro=None):
+        """Consulta todas as lojas e retorna {loja: {'total', 'principal'[, 'erro']}}
+        
+        Com o cancelamento ativado, retorna só o estoque já coletado.
+        """
+        resultados = {}
+        total = len(lojas)
+        
+        # Usar ThreadPoolExecutor para processamento paralelo
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            # Criar lista de futures
+            future_to_loja = {
+                executor.submit(self.get_inventory_for_loja, loja): loja
+                for loja in lojas
+            }
+            
+            # Processar resultados conforme ficam prontos
+            for idx, future in enumerate(aguardar_concluidos(future_to_loja, self.cancelamento)):
+                loja = future_to_loja[future]
+                try:
+                    result = future.result()
+                    if result:
+                        resultados[result['loja']] = result['estoque_data']
+                except Exception as e:
+                    if ao_erro:
+                        ao_erro(loja, e)
+                
+                # Atualizar progresso
+                if ao_progresso:
+                    ao_progresso(idx + 1, total)
+        finally:
+            # Cancelada, a consulta não espera as requisições em voo
+            executor.shutdown(wait=not self.cancelamento.is_set(), cancel_futures=True)
+            self.metricas.concluir()
+        
+        return resultados
+    
+    def estoque_em_cache(self, lojas):
+        """Estoque das lojas presente no cache, incluindo itens expirados"""
+        em_cache = {}
+        for loja in lojas:
+            item = cache_estoque.obter_obsoleto((loja, seller_da_loja(loja, self.conta_principal), self.sku))
+            if item is not None:
+                em_cache[loja] = self.resumir_estoque(item[0])
+        return em_cache
+    
+    def get_inventory_for_loja(self, loja):
+        seller = seller_da_loja(loja, self.conta_principal)
+        try:
+            inventory_data = self.get_inventory(loja, seller, self.sku)
+        except FalhaRequisicao as e:
+            if e.tipo == ERRO_CANCELADO:
+                return None
+            # Consulta que falhou não é estoque zerado
+            return {'loja': loja, 'estoque_data': {'total': 0, 'principal': 0, 'erro': e.tipo}}
+        return {'loja': loja, 'estoque_data': self.resumir_estoque(inventory_data)}
+    
+    @staticmethod
+    def resumir_estoque(inventory_data):
+        """Estoque total e do armazém principal (1_1)"""
+        estoque_data = {'total': 0, 'principal': 0}
+        
+        if inventory_data:
+            total_estoque = 0
+            estoque_principal = 0
+            for warehouse in inventory_data.get('balance', []):
+                quantidade = warehouse.get('totalQuantity', 0)
+                total_estoque += quantidade
+                if warehouse.get('warehouseId') == '1_1':
+                    estoque_principal = quantidade
+            
+            estoque_data = {
+                'total': total_estoque,
+                'principal': estoque_principal
+            }
+        
+        return estoque_data
+    
+    def get_inventory(self, loja, seller, sku):
+        # Mesmo cache usado pela simulação
+        if not self.forcar_atualizacao:
+            inventory_data = cache_estoque.obter((loja, seller, sku))
+            if inventory_data is not None:
+                return inventory_data
+        
+        url = url_conta(loja, self.conta_principal, f"/api/logistics/pvt/inventory/skus/{sku}")
+        params = {'sellerId': seller}
+        headers = headers_privados(self.app_key, self.app_token)
+        
+        inventory_data = self.transporte.requisitar_json(
+            "GET", url, headers=headers, params=params, orcamento=self.orcamento,
+            cancelamento=self.cancelamento, medicao=self.metricas.medicao(ENDPOINT_ESTOQUE, loja)
+        )
+        cache_estoque.definir((loja, seller, sku), inventory_data)
+        return inventory_data
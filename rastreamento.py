@@ -0,0 +1,221 @@
+"""
+Rastreamento (tracing) opcional de uma execução da simulação
+
+Um span raiz por execução, um span por loja e um span por chamada à VTEX
+(políticas, simulação e estoque), gravados ao fim da execução em um
+arquivo local em um de dois formatos:
+
+- "chrome": Trace Event Format, aberto em chrome://tracing ou no Perfetto
+  (ui.perfetto.dev); cada linha da linha do tempo é uma thread do pool,
+  o que mostra lojas esperando atrás de outras (head-of-line blocking);
+- "otlp": JSON do OpenTelemetry (OTLP/JSON), importável no Jaeger e em
+  outros coletores.
+
+O span atual fica em uma ContextVar: no asyncio ele acompanha as tarefas
+sozinho; nos pools de threads, as funções são enviadas com copiar_contexto.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+
+FORMATO_CHROME = "chrome"
+FORMATO_OTLP = "otlp"
+FORMATOS = (FORMATO_CHROME, FORMATO_OTLP)
+
+ARQUIVO_PADRAO = "rastreamento.json"
+NOME_SERVICO = "vtex-freight-calculator"
+
+# Tipos de span do OpenTelemetry
+SPAN_INTERNO = 1
+SPAN_CLIENTE = 3
+
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+
+class Span:
+    """Trecho cronometrado da execução, com atributos e erro (se houve)"""
+    
+    __slots__ = ("nome", "span_id", "pai", "tipo", "inicio", "fim", "atributos", "erro", "thread", "thread_nome")
+    
+    def __init__(self, nome, pai, tipo, inicio, atributos):
+        self.nome = nome
+        self.span_id = os.urandom(8).hex()
+        self.pai = pai
+        self.tipo = tipo
+        self.inicio = inicio
+        self.fim = None
+        self.atributos = atributos
+        self.erro = None
+        thread = threading.current_thread()
+        self.thread = thread.ident
+        self.thread_nome = thread.name
+    
+    def definir(self, **atributos):
+        self.atributos.update(atributos)
+    
+    def descende_de(self, outro):
+        pai = self.pai
+        while pai is not None:
+            if pai is outro:
+                return True
+            pai = pai.pai
+        return False
+
+
+class Rastreador:
+    """Coleta os spans de uma execução e os grava no formato escolhido"""
+    
+    def __init__(self, caminho=ARQUIVO_PADRAO, formato=FORMATO_CHROME):
+        self.caminho = caminho
+        self.formato = formato if formato in FORMATOS else FORMATO_CHROME
+        self.trace_id = os.urandom(16).hex()
+        # Relógio de parede (ns) derivado de um contador monotônico
+        self._base_parede = time.time_ns()
+        self._base_contador = time.perf_counter_ns()
+        self.spans = []
+        self._lock = threading.Lock()
+    
+    def _agora(self):
+        return self._base_parede + time.perf_counter_ns() - self._base_contador
+    
+    @contextlib.contextmanager
+    def span(self, nome, tipo=SPAN_INTERNO, **atributos):
+        """Abre um span filho do span atual (ou raiz) enquanto o bloco executa"""
+        pai = _span_atual.get()
+        span = Span(nome, pai, tipo, self._agora(), atributos)
+        token = _span_atual.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            # FalhaRequisicao traz a classe do erro; as demais, o nome da exceção
+            span.erro = getattr(e, "tipo", None) or type(e).__name__
+            raise
+        finally:
+            span.fim = self._agora()
+            _span_atual.reset(token)
+            with self._lock:
+                self.spans.append(span)
+    
+    def exportar_chrome(self):
+        """Spans no Trace Event Format (eventos "X" com ts e dur em µs)"""
+        pid = os.getpid()
+        eventos = [{"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": NOME_SERVICO}}]
+        faixas = self._faixas()
+        nomes_faixas = {}
+        for span in sorted(self.spans, key=lambda s: s.inicio):
+            chave = (span.thread, faixas[span])
+            if chave not in nomes_faixas:
+                nomes_faixas[chave] = len(nomes_faixas) + 1
+                rotulo = span.thread_nome if faixas[span] == 0 else f"{span.thread_nome} ({faixas[span] + 1})"
+                eventos.append({
+                    "ph": "M", "name": "thread_name", "pid": pid, "tid": nomes_faixas[chave],
+                    "args": {"name": rotulo}
+                })
+            argumentos = dict(span.atributos)
+            if span.erro:
+                argumentos["erro"] = span.erro
+            eventos.append({
+                "name": span.nome,
+                "cat": "requisicao" if span.tipo == SPAN_CLIENTE else "execucao",
+                "ph": "X",
+                "ts": (span.inicio - self._base_parede) / 1000,
+                "dur": (span.fim - span.inicio) / 1000,
+                "pid": pid,
+                "tid": nomes_faixas[chave],
+                "args": argumentos,
+            })
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+    
+    def _faixas(self):
+        """Faixa de cada span dentro da sua thread
+        
+        Na mesma faixa, um span só pode começar dentro de um ancestral ainda
+        aberto (o visualizador exige aninhamento); spans que se sobrepõem sem
+        parentesco, como as chamadas simultâneas de uma loja no asyncio, vão
+        para a próxima faixa livre da thread.
+        """
+        faixas = {}
+        pilhas_por_thread = {}
+        for span in sorted(self.spans, key=lambda s: (s.inicio, -s.fim)):
+            pilhas = pilhas_por_thread.setdefault(span.thread, [])
+            for indice, pilha in enumerate(pilhas):
+                while pilha and pilha[-1].fim <= span.inicio:
+                    pilha.pop()
+                if not pilha or (span.descende_de(pilha[-1]) and span.fim <= pilha[-1].fim):
+                    pilha.append(span)
+                    faixas[span] = indice
+                    break
+            else:
+                pilhas.append([span])
+                faixas[span] = len(pilhas) - 1
+        return faixas
+    
+    def exportar_otlp(self):
+        """Spans no formato OTLP/JSON do OpenTelemetry"""
+        spans = []
+        for span in sorted(self.spans, key=lambda s: s.inicio):
+            item = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.nome,
+                "kind": span.tipo,
+                "startTimeUnixNano": str(span.inicio),
+                "endTimeUnixNano": str(span.fim),
+                "attributes": [_atributo_otlp(chave, valor) for chave, valor in span.atributos.items()],
+                "status": {"code": 2, "message": span.erro} if span.erro else {"code": 0},
+            }
+            if span.pai is not None:
+                item["parentSpanId"] = span.pai.span_id
+            item["attributes"].append(_atributo_otlp("thread.name", span.thread_nome))
+            spans.append(item)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_atributo_otlp("service.name", NOME_SERVICO)]},
+                "scopeSpans": [{"scope": {"name": "rastreamento"}, "spans": spans}],
+            }]
+        }
+    
+    def salvar(self):
+        """Grava os spans concluídos no arquivo (substitui a execução anterior)"""
+        with self._lock:
+            dados = self.exportar_otlp() if self.formato == FORMATO_OTLP else self.exportar_chrome()
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+        return self.caminho
+
+
+def _atributo_otlp(chave, valor):
+    if isinstance(valor, bool):
+        return {"key": chave, "value": {"boolValue": valor}}
+    if isinstance(valor, int):
+        return {"key": chave, "value": {"intValue": str(valor)}}
+    if isinstance(valor, float):
+        return {"key": chave, "value": {"doubleValue": valor}}
+    return {"key": chave, "value": {"stringValue": str(valor)}}
+
+
+def rastrear(rastreador, nome, tipo=SPAN_INTERNO, **atributos):
+    """Span do rastreador, ou um bloco sem efeito com o rastreamento desligado"""
+    if rastreador is None:
+        return contextlib.nullcontext()
+    return rastreador.span(nome, tipo, **atributos)
+
+
+def copiar_contexto(funcao):
+    """Função que executa no contexto atual (com o span atual) em outra thread"""
+    return functools.partial(contextvars.copy_context().run, funcao)
+
+
+def criar_rastreador(configuracoes):
+    """Rastreador das configurações, ou None com o rastreamento desligado (arquivo vazio)"""
+    caminho = configuracoes.get("rastreamento_arquivo", "")
+    if not caminho:
+        return None
+    return Rastreador(caminho, configuracoes.get("rastreamento_formato", FORMATO_CHROME))
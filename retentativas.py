@@ -0,0 +1,105 @@
+"""
+Política de retentativas das requisições à VTEX
+"""
+import random
+import threading
+
+
+# Classes de erro registradas no resultado de cada loja ("error_type")
+ERRO_TIMEOUT = "timeout"
+ERRO_CONEXAO = "conexao"
+ERRO_SERVIDOR = "servidor"
+ERRO_LIMITE = "rate_limit"
+ERRO_HTTP = "http"
+ERRO_RESPOSTA = "resposta_invalida"
+ERRO_CIRCUITO = "circuito_aberto"
+ERRO_CANCELADO = "cancelado"
+
+DESCRICAO_ERROS = {
+    ERRO_TIMEOUT: "tempo esgotado",
+    ERRO_CONEXAO: "falha de conexão",
+    ERRO_SERVIDOR: "erro no servidor VTEX",
+    ERRO_LIMITE: "limite de requisições",
+    ERRO_HTTP: "requisição recusada",
+    ERRO_RESPOSTA: "resposta inválida",
+    ERRO_CIRCUITO: "circuito aberto, loja ignorada",
+    ERRO_CANCELADO: "consulta cancelada",
+}
+
+MAX_TENTATIVAS_PADRAO = 3
+ORCAMENTO_RETENTATIVAS_PADRAO = 200
+
+# Intervalo máximo entre as verificações do pedido de cancelamento de uma execução
+INTERVALO_CANCELAMENTO = 0.2
+
+
+class FalhaRequisicao(Exception):
+    """Falha definitiva de uma chamada (após as retentativas), já classificada"""
+    
+    def __init__(self, tipo, mensagem):
+        super().__init__(mensagem)
+        self.tipo = tipo
+
+
+def verificar_cancelamento(cancelamento):
+    """Levanta FalhaRequisicao(ERRO_CANCELADO) se a execução foi cancelada"""
+    if cancelamento is not None and cancelamento.is_set():
+        raise FalhaRequisicao(ERRO_CANCELADO, "Consulta cancelada pelo usuário")
+
+
+def tipo_erro_status(status):
+    """Classe de erro de uma resposta HTTP diferente de 200"""
+    if status == 429:
+        return ERRO_LIMITE
+    if status >= 500:
+        return ERRO_SERVIDOR
+    return ERRO_HTTP
+
+
+def status_repetivel(status):
+    """429 e 5xx são transitórios; os demais 4xx não mudam ao repetir"""
+    return status == 429 or status >= 500
+
+
+def descrever_erro(tipo):
+    return DESCRICAO_ERROS.get(tipo, tipo or "erro desconhecido")
+
+
+class OrcamentoRetentativas:
+    """Número máximo de retentativas de uma execução inteira
+    
+    Evita que uma VTEX degradada transforme cada chamada em várias: quando
+    o orçamento acaba, as falhas seguintes são devolvidas na primeira tentativa.
+    """
+    
+    def __init__(self, limite=ORCAMENTO_RETENTATIVAS_PADRAO):
+        self.limite = limite
+        self.usadas = 0
+        self._lock = threading.Lock()
+    
+    def consumir(self):
+        """Reserva uma retentativa; False quando o orçamento acabou"""
+        with self._lock:
+            if self.usadas >= self.limite:
+                return False
+            self.usadas += 1
+            return True
+
+
+class PoliticaRetentativas:
+    """Backoff exponencial com jitter completo entre as tentativas"""
+    
+    def __init__(self, max_tentativas=MAX_TENTATIVAS_PADRAO, espera_base=0.25, espera_maxima=4.0):
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+    
+    def pode_repetir(self, tentativa, orcamento=None):
+        """Indica se a tentativa (0, 1, ...) que falhou pode ser repetida"""
+        if tentativa + 1 >= self.max_tentativas:
+            return False
+        return orcamento is None or orcamento.consumir()
+    
+    def espera(self, tentativa):
+        """Segundos até a próxima tentativa"""
+        return random.uniform(0, min(self.espera_maxima, self.espera_base * (2 ** tentativa)))
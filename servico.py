@@ -0,0 +1,521 @@
+"""
+Serviço HTTP local do VTEX Freight Calculator
+
+Mantém o motor de simulação em um processo de longa duração, de modo que
+o pool de conexões keep-alive e os caches (políticas, simulações, estoque)
+continuem aquecidos entre as consultas de outras ferramentas:
+
+    python servico.py --porta 8787
+
+    GET  /simular?cep=05372-110&sku=149718&lojas=trackfield,trackfieldtfsp000066
+    GET  /ranking?cep=05372-110&sku=149718
+    GET  /estoque?sku=149718
+    GET  /saude
+    GET  /schema
+
+Os parâmetros também podem ser enviados por POST em um corpo JSON
+({"cep": "...", "skus": ["..."], "lojas": ["..."]}). Toda resposta é JSON
+no formato descrito por SCHEMA_RESPOSTA (GET /schema).
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from config_manager import ConfigManager
+from cache import configurar_caches, cache_politicas, cache_simulacoes, cache_estoque
+from transporte import get_transporte, configurar_transporte, workers_para_configuracao
+from cassete import ErroCassete
+from motor_threads import MotorSimulacaoThreads, MotorEstoqueThreads
+from retentativas import ERRO_CANCELADO
+from utils import extrair_ceps, resumir_resultado, coletar_dados_ranking
+
+
+VERSAO_SCHEMA = 1
+PORTA_PADRAO = 8787
+LIMITE_POR_CLIENTE_PADRAO = 2
+
+# Corpo máximo aceito em POST (listas de lojas e SKUs)
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+
+
+def _objeto(propriedades, obrigatorias=None):
+    return {
+        'type': 'object',
+        'properties': propriedades,
+        'required': obrigatorias or list(propriedades),
+    }
+
+
+def _opcional(tipo):
+    return {'type': [tipo, 'null']}
+
+
+_TEXTO = {'type': 'string'}
+_INTEIRO = {'type': 'integer'}
+_LISTA_TEXTO = {'type': 'array', 'items': _TEXTO}
+
+_ITEM_RESULTADO = _objeto({
+    'loja': _TEXTO,
+    'nome': _TEXTO,
+    'tipo': _TEXTO,
+    'sku': _TEXTO,
+    'disponivel': {'type': 'boolean'},
+    # Melhor SLA do ranking: preço, prazo e transportadora da mesma opção
+    'preco': _opcional('integer'),
+    'prazo_str': _opcional('string'),
+    'prazo_dias': _opcional('integer'),
+    'transportadora': _opcional('string'),
+    'estoque': _INTEIRO,
+    'erro': _opcional('string'),
+    'tipo_erro': _opcional('string'),
+    'cache_idade': _opcional('number'),
+})
+
+_ITEM_RANKING = _objeto({
+    'posicao': _INTEIRO,
+    'loja': _TEXTO,
+    'nome': _TEXTO,
+    'tipo': _TEXTO,
+    'preco': _INTEIRO,
+    'prazo_str': _TEXTO,
+    'prazo_dias': _INTEIRO,
+    'transportadora': _TEXTO,
+    'estoque': _INTEIRO,
+    'cache_idade': _opcional('number'),
+})
+
+_ITEM_ESTOQUE = _objeto({
+    'loja': _TEXTO,
+    'nome': _TEXTO,
+    'total': _INTEIRO,
+    'principal': _INTEIRO,
+    'erro': _opcional('string'),
+})
+
+_BASE = {
+    'versao': {'const': VERSAO_SCHEMA},
+    'duracao_ms': {'type': 'number'},
+}
+
+# JSON Schema (draft 2020-12) das respostas; "versao" muda quando um campo é removido ou renomeado
+SCHEMA_RESPOSTA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'title': 'Resposta do serviço VTEX Freight Calculator',
+    'oneOf': [
+        {'$ref': '#/$defs/simular'},
+        {'$ref': '#/$defs/ranking'},
+        {'$ref': '#/$defs/estoque'},
+        {'$ref': '#/$defs/erro'},
+    ],
+    '$defs': {
+        'simular': _objeto({
+            **_BASE,
+            'cep': _TEXTO,
+            'skus': _LISTA_TEXTO,
+            'lojas_consultadas': _INTEIRO,
+            'lojas_respondidas': _INTEIRO,
+            'resultados': {'type': 'array', 'items': _ITEM_RESULTADO},
+        }),
+        'ranking': _objeto({
+            **_BASE,
+            'cep': _TEXTO,
+            'skus': _LISTA_TEXTO,
+            'lojas_consultadas': _INTEIRO,
+            'rankings': {'type': 'array', 'items': _objeto({
+                'sku': _TEXTO,
+                'melhor': {'oneOf': [_ITEM_RANKING, {'type': 'null'}]},
+                'lojas': {'type': 'array', 'items': _ITEM_RANKING},
+            })},
+        }),
+        'estoque': _objeto({
+            **_BASE,
+            'sku': _TEXTO,
+            'lojas_consultadas': _INTEIRO,
+            'estoque': {'type': 'array', 'items': _ITEM_ESTOQUE},
+        }),
+        'erro': _objeto({
+            'versao': {'const': VERSAO_SCHEMA},
+            'erro': _objeto({'codigo': _TEXTO, 'mensagem': _TEXTO, 'campo': _opcional('string')}),
+        }),
+    },
+}
+
+
+class ErroServico(Exception):
+    """Erro devolvido ao cliente com status HTTP e código estável
+    
+    campo identifica o parâmetro inválido, quando o erro é de um só campo.
+    """
+    
+    def __init__(self, status, codigo, mensagem, campo=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.codigo = codigo
+        self.campo = campo
+
+
+class LimitePorCliente:
+    """Número máximo de consultas simultâneas de cada cliente
+    
+    Um cliente que dispara muitas consultas de uma vez recebe 429 nas
+    excedentes, em vez de ocupar todo o limite de requisições à VTEX.
+    """
+    
+    def __init__(self, limite=LIMITE_POR_CLIENTE_PADRAO):
+        self.limite = limite
+        self._ativas = {}
+        self._lock = threading.Lock()
+    
+    def entrar(self, cliente):
+        """Reserva uma vaga para o cliente; False quando ele já está no limite"""
+        with self._lock:
+            ativas = self._ativas.get(cliente, 0)
+            if self.limite and ativas >= self.limite:
+                return False
+            self._ativas[cliente] = ativas + 1
+            return True
+    
+    def sair(self, cliente):
+        with self._lock:
+            ativas = self._ativas.get(cliente, 0) - 1
+            if ativas > 0:
+                self._ativas[cliente] = ativas
+            else:
+                self._ativas.pop(cliente, None)
+    
+    def ativas(self):
+        with self._lock:
+            return dict(self._ativas)
+
+
+def _lista(valor, campo):
+    """Lista de textos a partir de uma lista JSON, de valores repetidos ou separados por vírgula
+    
+    Aceita só um texto ou uma lista de textos; outro tipo é erro 400 do campo.
+    """
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        valor = [valor]
+    if not isinstance(valor, list) or not all(isinstance(item, str) for item in valor):
+        raise ErroServico(
+            400, "parametro_invalido", f"O campo '{campo}' deve ser um texto ou uma lista de textos", campo=campo
+        )
+    itens = []
+    for item in valor:
+        for parte in item.split(','):
+            parte = parte.strip()
+            if parte and parte not in itens:
+                itens.append(parte)
+    return itens
+
+
+def _booleano(valor):
+    if isinstance(valor, list):
+        valor = valor[-1] if valor else None
+    return str(valor).lower() in ("1", "true", "sim", "yes")
+
+
+class ServicoFrete:
+    """Consultas de simulação, ranking e estoque sobre o transporte e os caches compartilhados"""
+    
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        self.empresa = config_manager.get_empresa_info()
+        self.configuracoes = config_manager.get_configuracoes()
+        self.max_workers = workers_para_configuracao(self.configuracoes)
+        
+        configurar_caches(self.configuracoes)
+        # Um único transporte para todas as consultas: as conexões keep-alive
+        # abertas por uma consulta são reutilizadas pelas seguintes
+        self.transporte = configurar_transporte(self.configuracoes)
+        self.inicio = time.monotonic()
+    
+    def _argumentos_conta(self):
+        return (
+            self.empresa.get('app_key', ''), self.empresa.get('app_token', ''),
+            self.empresa.get('conta_principal', 'trackfield')
+        )
+    
+    def _lojas(self, parametros):
+        lojas = _lista(parametros.get('lojas'), 'lojas') or self.config_manager.get_lojas_ids()
+        if not lojas:
+            raise ErroServico(400, "sem_lojas", "Nenhuma loja informada nem configurada")
+        return lojas
+    
+    @staticmethod
+    def _skus(parametros):
+        skus = _lista(parametros.get('skus'), 'skus') or _lista(parametros.get('sku'), 'sku')
+        if not skus:
+            raise ErroServico(400, "sku_obrigatorio", "Informe ao menos um SKU (sku ou skus)")
+        return skus
+    
+    @staticmethod
+    def _cep(parametros):
+        valor = parametros.get('cep')
+        if isinstance(valor, list):
+            valor = valor[0] if valor else None
+        ceps = extrair_ceps(str(valor or ''))
+        if len(ceps) != 1:
+            raise ErroServico(400, "cep_invalido", "Informe um único CEP válido (00000-000)")
+        return ceps[0]
+    
+    def _simular(self, parametros):
+        """Executa a simulação; retorna (cep, skus, lojas, {sku: {loja: resultado}})"""
+        cep = self._cep(parametros)
+        skus = self._skus(parametros)
+        lojas = self._lojas(parametros)
+        
+        motor = MotorSimulacaoThreads(
+            cep, skus, *self._argumentos_conta(), max_workers=self.max_workers,
+            transporte=self.transporte, forcar_atualizacao=_booleano(parametros.get('forcar_atualizacao'))
+        )
+        resultados_por_sku = {sku: {} for sku in skus}
+        for loja, data in motor.executar(lojas).items():
+            for sku, resultado in data.items():
+                if resultado and resultado.get('error_type') != ERRO_CANCELADO:
+                    resultados_por_sku[sku][loja] = resultado
+        return cep, skus, lojas, resultados_por_sku
+    
+    def simular(self, parametros):
+        cep, skus, lojas, resultados_por_sku = self._simular(parametros)
+        completo = _booleano(parametros.get('completo'))
+        
+        itens = []
+        for sku, resultados in resultados_por_sku.items():
+            for loja, resultado in resultados.items():
+                item = {
+                    'loja': loja,
+                    'nome': self.config_manager.formatar_nome_loja(loja),
+                    'tipo': self.config_manager.determinar_tipo_loja(loja),
+                    'sku': sku,
+                    **resumir_resultado(resultado),
+                }
+                if completo:
+                    item['resultado'] = resultado
+                itens.append(item)
+        
+        return {
+            'cep': cep,
+            'skus': skus,
+            'lojas_consultadas': len(lojas),
+            'lojas_respondidas': len(resultados_por_sku[skus[0]]),
+            'resultados': itens,
+        }
+    
+    def ranking(self, parametros):
+        cep, skus, lojas, resultados_por_sku = self._simular(parametros)
+        
+        rankings = []
+        for sku, resultados in resultados_por_sku.items():
+            ranking = coletar_dados_ranking(resultados, self.config_manager.determinar_tipo_loja)
+            for posicao, item in enumerate(ranking, 1):
+                item['posicao'] = posicao
+                item['nome'] = self.config_manager.formatar_nome_loja(item['loja'])
+            rankings.append({'sku': sku, 'melhor': ranking[0] if ranking else None, 'lojas': ranking})
+        
+        return {'cep': cep, 'skus': skus, 'lojas_consultadas': len(lojas), 'rankings': rankings}
+    
+    def estoque(self, parametros):
+        skus = self._skus(parametros)
+        if len(skus) != 1:
+            raise ErroServico(400, "sku_unico", "A consulta de estoque aceita um único SKU")
+        lojas = self._lojas(parametros)
+        
+        motor = MotorEstoqueThreads(
+            skus[0], *self._argumentos_conta(), max_workers=self.max_workers,
+            transporte=self.transporte, forcar_atualizacao=_booleano(parametros.get('forcar_atualizacao'))
+        )
+        itens = [
+            {
+                'loja': loja,
+                'nome': self.config_manager.formatar_nome_loja(loja),
+                'total': dados['total'],
+                'principal': dados['principal'],
+                'erro': dados.get('erro'),
+            }
+            for loja, dados in motor.executar(lojas).items()
+        ]
+        itens.sort(key=lambda x: -x['total'])
+        return {'sku': skus[0], 'lojas_consultadas': len(lojas), 'estoque': itens}
+    
+    def saude(self):
+        return {
+            'status': 'ok',
+            'lojas': len(self.config_manager.get_lojas_ids()),
+            'em_execucao_s': round(time.monotonic() - self.inicio, 1),
+            'conexoes_em_voo': self.transporte.limitador.em_voo,
+            'caches': {
+                'politicas': cache_politicas.estatisticas(),
+                'simulacoes': cache_simulacoes.estatisticas(),
+                'estoque': cache_estoque.estatisticas(),
+            },
+        }
+
+
+class ManipuladorServico(BaseHTTPRequestHandler):
+    """Rotas HTTP do serviço; servico e limite_clientes são definidos em criar_servidor"""
+    
+    protocol_version = "HTTP/1.1"
+    servico = None
+    limite_clientes = None
+    
+    ROTAS_CONSULTA = {
+        '/simular': 'simular',
+        '/ranking': 'ranking',
+        '/estoque': 'estoque',
+    }
+    
+    def log_message(self, formato, *args):
+        sys.stderr.write(f"{self.address_string()} - {formato % args}\n")
+    
+    def _responder(self, status, corpo, headers=None):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+    
+    def _responder_erro(self, erro, headers=None):
+        self._responder(erro.status, {
+            'versao': VERSAO_SCHEMA,
+            'erro': {'codigo': erro.codigo, 'mensagem': str(erro), 'campo': erro.campo}
+        }, headers)
+    
+    def _cliente(self):
+        """Identificação do cliente: cabeçalho X-Cliente ou, sem ele, o endereço IP"""
+        return self.headers.get('X-Cliente') or self.client_address[0]
+    
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroServico(413, "corpo_grande", "Corpo da requisição grande demais")
+        if not tamanho:
+            return {}
+        try:
+            corpo = json.loads(self.rfile.read(tamanho))
+        except ValueError:
+            raise ErroServico(400, "json_invalido", "Corpo da requisição não é JSON válido")
+        if not isinstance(corpo, dict):
+            raise ErroServico(400, "json_invalido", "O corpo deve ser um objeto JSON")
+        return corpo
+    
+    def do_GET(self):
+        self._atender(None)
+    
+    def do_POST(self):
+        try:
+            corpo = self._ler_corpo()
+        except ErroServico as e:
+            self._responder_erro(e, {'Connection': 'close'})
+            self.close_connection = True
+            return
+        self._atender(corpo)
+    
+    def _atender(self, corpo):
+        url = urlsplit(self.path)
+        rota = url.path.rstrip('/') or '/'
+        
+        if rota == '/saude':
+            self._responder(200, self.servico.saude())
+            return
+        if rota == '/schema':
+            self._responder(200, SCHEMA_RESPOSTA)
+            return
+        
+        metodo = self.ROTAS_CONSULTA.get(rota)
+        if metodo is None:
+            self._responder_erro(ErroServico(404, "rota_desconhecida", f"Rota desconhecida: {url.path}"))
+            return
+        
+        parametros = parse_qs(url.query)
+        if corpo:
+            parametros.update(corpo)
+        
+        cliente = self._cliente()
+        if not self.limite_clientes.entrar(cliente):
+            self._responder_erro(ErroServico(
+                429, "limite_cliente",
+                f"Limite de {self.limite_clientes.limite} consultas simultâneas por cliente atingido"
+            ), {'Retry-After': '1'})
+            return
+        
+        inicio = time.monotonic()
+        try:
+            resposta = getattr(self.servico, metodo)(parametros)
+        except ErroServico as e:
+            self._responder_erro(e)
+            return
+        except Exception as e:
+            self._responder_erro(ErroServico(500, "erro_interno", str(e)))
+            return
+        finally:
+            self.limite_clientes.sair(cliente)
+        
+        self._responder(200, {
+            'versao': VERSAO_SCHEMA,
+            'duracao_ms': round((time.monotonic() - inicio) * 1000, 1),
+            **resposta
+        })
+
+
+def criar_servidor(config_manager, host="127.0.0.1", porta=None, limite_por_cliente=None):
+    """Cria o servidor HTTP (ainda parado) com o serviço e o limite por cliente"""
+    configuracoes = config_manager.get_configuracoes()
+    if porta is None:
+        porta = configuracoes.get("servico_porta", PORTA_PADRAO)
+    if limite_por_cliente is None:
+        limite_por_cliente = configuracoes.get("servico_limite_por_cliente", LIMITE_POR_CLIENTE_PADRAO)
+    
+    manipulador = type('Manipulador', (ManipuladorServico,), {
+        'servico': ServicoFrete(config_manager),
+        'limite_clientes': LimitePorCliente(limite_por_cliente),
+    })
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="servico.py",
+        description="Serviço HTTP local com as consultas de simulação, ranking e estoque"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: só esta máquina)")
+    parser.add_argument("--porta", type=int, help=f"Porta (padrão: servico_porta da configuração, {PORTA_PADRAO})")
+    parser.add_argument("--limite-por-cliente", type=int,
+                        help="Consultas simultâneas por cliente (padrão: servico_limite_por_cliente; 0 = sem limite)")
+    parser.add_argument("--config", default="empresa_config.json", help="Arquivo de configuração da empresa")
+    args = parser.parse_args(argv)
+    
+    # Avisos do ConfigManager vão para a saída de erro, junto com o log de acesso
+    with contextlib.redirect_stdout(sys.stderr):
+        config_manager = ConfigManager(args.config)
+    
+    try:
+        servidor = criar_servidor(config_manager, args.host, args.porta, args.limite_por_cliente)
+    except ErroCassete as e:
+        # Sem o cassete pedido, as consultas iriam para a rede
+        parser.error(str(e))
+    host, porta = servidor.server_address[:2]
+    print(f"Serviço em http://{host}:{porta} (Ctrl+C para encerrar)", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        get_transporte().fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
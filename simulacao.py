@@ -0,0 +1,222 @@
+"""
+Regras de simulação de frete compartilhadas pelos motores de execução
+"""
+import copy
+import os
+import re
+
+from cache import cache_simulacoes
+from retentativas import FalhaRequisicao
+
+DOMINIO_VTEX = "vtexcommercestable.com.br"
+
+# Modelo da URL base de cada conta. A variável de ambiente VTEX_URL_BASE aponta
+# as lojas para outro servidor, como o mock_vtex.py ("http://127.0.0.1:8800/{conta}")
+URL_BASE_VTEX = os.environ.get("VTEX_URL_BASE") or f"https://{{conta}}.{DOMINIO_VTEX}"
+
+QUANTIDADE_PADRAO = 1
+
+HEADERS_PUBLICOS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json"
+}
+
+
+def url_conta(loja, conta_principal, caminho):
+    """Monta a URL da API na conta da loja (ou na conta principal)"""
+    conta = conta_principal if loja == conta_principal else loja
+    return URL_BASE_VTEX.format(conta=conta) + caminho
+
+
+def seller_da_loja(loja, conta_principal):
+    """Determina o seller da loja: "1" para a conta principal"""
+    return "1" if loja == conta_principal else loja
+
+
+def headers_privados(app_key, app_token):
+    """Headers das APIs autenticadas (logistics)"""
+    return {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "X-VTEX-API-AppKey": app_key,
+        "X-VTEX-API-AppToken": app_token,
+    }
+
+
+def montar_payload_simulacao(skus, seller, cep):
+    """Monta o corpo da simulação de checkout com um item por SKU"""
+    return {
+        "items": [
+            {
+                "id": sku,
+                "quantity": QUANTIDADE_PADRAO,
+                "seller": seller
+            }
+            for sku in skus
+        ],
+        "postalCode": cep.replace('-', ''),
+        "country": "BRA"
+    }
+
+
+def separar_simulacao_por_sku(simulation_data, skus):
+    """Divide a resposta de uma simulação multi-item em uma resposta por SKU
+    
+    Cada parte fica no mesmo formato de uma simulação de item único
+    (um item e o logisticsInfo correspondente com itemIndex 0), de modo
+    que as abas e o ranking funcionam sem alteração.
+    """
+    if len(skus) == 1:
+        return {skus[0]: simulation_data}
+    
+    itens = simulation_data.get('items') or []
+    logistics_info = simulation_data.get('logisticsInfo') or []
+    comuns = {k: v for k, v in simulation_data.items() if k not in ('items', 'logisticsInfo')}
+    
+    por_sku = {}
+    for sku in skus:
+        por_sku[sku] = dict(comuns, items=[], logisticsInfo=[])
+    
+    for posicao, item in enumerate(itens):
+        # requestIndex aponta para a posição do item no payload enviado
+        indice = item.get('requestIndex', posicao)
+        if indice is None or not 0 <= indice < len(skus):
+            continue
+        parte = por_sku[skus[indice]]
+        parte['items'] = [item]
+        parte['logisticsInfo'] = [
+            dict(logistics, itemIndex=0)
+            for logistics in logistics_info
+            if logistics.get('itemIndex') == posicao
+        ]
+    return por_sku
+
+
+def extrair_politicas_ativas(policies):
+    """Filtra as políticas de envio ativas da resposta de shipping-policies"""
+    active_policies = {}
+    for policy in policies.get('items', []):
+        if policy.get('isActive', False):
+            active_policies[policy['id']] = policy
+    return active_policies
+
+
+def filtrar_slas_ativas(simulation_data, active_policies):
+    """Mantém apenas as SLAs que pertencem às políticas ativas"""
+    if 'logisticsInfo' in simulation_data and simulation_data['logisticsInfo']:
+        for logistics in simulation_data['logisticsInfo']:
+            filtered_slas = []
+            for sla in logistics.get('slas', []):
+                # Verificar cada deliveryId na SLA
+                include_sla = False
+                for delivery in sla.get('deliveryIds', []):
+                    courier_id = delivery.get('courierId')
+                    if courier_id in active_policies:
+                        include_sla = True
+                        break
+                if include_sla:
+                    filtered_slas.append(sla)
+            logistics['slas'] = filtered_slas
+    return simulation_data
+
+
+def montar_resultados_skus(skus, active_policies, inventarios, simulation_data=None, erro=None,
+                           tipo_erro=None, erros_estoque=None):
+    """Monta o resultado de cada SKU de uma loja ({sku: resultado})"""
+    erros_estoque = erros_estoque or {}
+    if erro is not None:
+        resultados = {
+            sku: resultado_erro(active_policies, erro, inventarios.get(sku), tipo_erro)
+            for sku in skus
+        }
+    else:
+        # Filtrar SLAs: apenas as que pertencem às políticas ativas
+        simulation_data = filtrar_slas_ativas(simulation_data, active_policies)
+        partes = separar_simulacao_por_sku(simulation_data, skus)
+        resultados = {
+            sku: {
+                "simulation": partes[sku],
+                "active_policies": active_policies,
+                "inventory": inventarios.get(sku)
+            }
+            for sku in skus
+        }
+    
+    # Estoque que falhou não é estoque zerado
+    for sku, tipo in erros_estoque.items():
+        resultados[sku]["inventory_error"] = tipo
+    return resultados
+
+
+def montar_resultados_chamadas(skus, politicas, simulacao, inventarios):
+    """Monta os resultados a partir do retorno de cada chamada da loja
+    
+    Cada argumento é o valor devolvido pela chamada ou a FalhaRequisicao
+    que ela levantou (inventarios é {sku: valor_ou_falha}).
+    """
+    erro = tipo_erro = None
+    if isinstance(simulacao, FalhaRequisicao):
+        erro, tipo_erro = str(simulacao), simulacao.tipo
+        simulacao = None
+    
+    # Sem as políticas não há como filtrar as SLAs: a loja fica como falha,
+    # e não como "sem entrega"
+    if isinstance(politicas, FalhaRequisicao):
+        if erro is None:
+            erro = f"Falha ao consultar políticas de envio: {str(politicas)}"
+            tipo_erro = politicas.tipo
+        politicas = {}
+    
+    erros_estoque = {}
+    for sku, inventario in list(inventarios.items()):
+        if isinstance(inventario, FalhaRequisicao):
+            erros_estoque[sku] = inventario.tipo
+            inventarios[sku] = None
+    
+    return montar_resultados_skus(skus, politicas, inventarios, simulacao, erro, tipo_erro, erros_estoque)
+
+
+def resultado_erro(active_policies, mensagem, inventory_data=None, tipo_erro=None):
+    """Estrutura de resultado de uma loja cuja simulação falhou"""
+    return {
+        "simulation": None,
+        "active_policies": active_policies,
+        "inventory": inventory_data,
+        "error": mensagem,
+        "error_type": tipo_erro
+    }
+
+
+def normalizar_cep(cep):
+    """CEP apenas com dígitos, para comparar 05372-110 e 05372110"""
+    return re.sub(r"\D", "", cep or "")
+
+
+def chave_simulacao(loja, sku, cep, quantidade=QUANTIDADE_PADRAO):
+    return (loja, sku, normalizar_cep(cep), quantidade)
+
+
+def resultados_em_cache(loja, skus, cep):
+    """Resultados ainda válidos no cache; retorna ({sku: resultado}, skus_faltantes)
+    
+    Cada resultado vindo do cache leva "cache_age" com a idade em segundos e
+    é uma cópia: quem altera o resultado (filtrar_slas_ativas, abas) não
+    altera a entrada do cache.
+    """
+    resultados = {}
+    faltantes = []
+    for sku in skus:
+        item = cache_simulacoes.obter_com_idade(chave_simulacao(loja, sku, cep))
+        if item is None:
+            faltantes.append(sku)
+        else:
+            resultado, idade = item
+            resultados[sku] = dict(copy.deepcopy(resultado), cache_age=round(idade))
+    return resultados, faltantes
+
+
+def guardar_em_cache(loja, cep, resultados):
+    """Guarda cópias dos resultados completos; falhas são sempre consultadas de novo"""
+    for sku, resultado in resultados.items():
+        if not resultado.get('error') and not resultado.get('inventory_error'):
+            cache_simulacoes.definir(chave_simulacao(loja, sku, cep), copy.deepcopy(resultado))
@@ -8,6 +8,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QFont, QColor
 from PySide6.QtCore import Qt
 from config import *
+from retentativas import descrever_erro
 
 
 class EstoqueTab(QWidget):
@@ -65,9 +66,26 @@ class EstoqueTab(QWidget):
         """)
         self.consultar_estoque_btn.clicked.connect(self.parent.iniciar_consulta_estoque)
         
+        self.cancelar_estoque_btn = QPushButton("CANCELAR")
+        self.cancelar_estoque_btn.setFont(QFont("Arial", 10))
+        self.cancelar_estoque_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: #e74c3c;
+                color: {COR_SECUNDARIA};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.cancelar_estoque_btn.setEnabled(False)
+        self.cancelar_estoque_btn.clicked.connect(self.parent.cancelar_consulta_estoque)
+        
         estoque_input_layout.addWidget(estoque_sku_label)
         estoque_input_layout.addWidget(self.estoque_sku_input, 1)
         estoque_input_layout.addWidget(self.consultar_estoque_btn)
+        estoque_input_layout.addWidget(self.cancelar_estoque_btn)
         layout.addLayout(estoque_input_layout)
         
         # Tabela de estoque
@@ -104,6 +122,17 @@ class EstoqueTab(QWidget):
         self.consultar_estoque_btn.setEnabled(True)
         self.consultar_estoque_btn.setText("CONSULTAR ESTOQUE")
         
+        self._preencher_tabela(resultados)
+        self.parent.atualizar_status(f"Consulta de estoque concluída! {len(resultados)} lojas processadas.", "green")
+    
+    def mostrar_estoque_em_cache(self, resultados):
+        """Exibe o estoque em cache enquanto a consulta atualiza em segundo plano"""
+        self._preencher_tabela(resultados)
+        self.parent.atualizar_status(
+            f"Exibindo estoque em cache de {len(resultados)} lojas - atualizando em segundo plano...", "black"
+        )
+    
+    def _preencher_tabela(self, resultados):
         self.estoque_table.setRowCount(len(resultados))
         self.estoque_table.setSortingEnabled(False)  # Desabilitar ordenação durante atualização
         
@@ -117,8 +146,16 @@ class EstoqueTab(QWidget):
             total_item = QTableWidgetItem(str(total))
             principal_item = QTableWidgetItem(str(principal))
             
+            # Consulta que falhou: não confundir com estoque zerado
+            if estoque_data.get('erro'):
+                descricao = f"Falha na consulta: {descrever_erro(estoque_data['erro'])}"
+                total_item.setText("—")
+                principal_item.setText("—")
+                for item in (loja_item, total_item, principal_item):
+                    item.setBackground(QColor(225, 225, 225))  # Cinza claro
+                    item.setToolTip(descricao)
             # Destacar estoque zerado
-            if total == 0:
+            elif total == 0:
                 loja_item.setBackground(QColor(255, 200, 200))  # Vermelho claro
                 total_item.setBackground(QColor(255, 200, 200))
                 principal_item.setBackground(QColor(255, 200, 200))
@@ -135,5 +172,4 @@ class EstoqueTab(QWidget):
             row += 1
         
         self.estoque_table.setSortingEnabled(True)  # Reabilitar ordenação
-        self.parent.atualizar_status(f"Consulta de estoque concluída! {len(resultados)} lojas processadas.", "green")
 
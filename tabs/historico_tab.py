@@ -0,0 +1,329 @@
+"""
+Aba de Histórico de Execuções
+"""
+from datetime import datetime
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PySide6.QtGui import QFont, QColor
+from PySide6.QtCore import Qt
+from config import *
+from utils import formatar_moeda
+from historico import TIPO_SIMULACAO, TIPO_ESTOQUE
+from comparacao import (
+    comparar_execucoes, resumir_diferencas, MUDANCA_PERDEU, MUDANCA_GANHOU, MUDANCA_FALHA, MUDANCA_PRESENCA
+)
+
+# Cor de fundo de cada tipo de mudança na tabela de comparação
+CORES_MUDANCA = {
+    MUDANCA_PERDEU: QColor(255, 200, 200),    # Vermelho claro
+    MUDANCA_GANHOU: QColor(200, 255, 200),    # Verde claro
+    MUDANCA_FALHA: QColor(225, 225, 225),     # Cinza claro
+    MUDANCA_PRESENCA: QColor(235, 235, 255),  # Azul claro
+}
+
+
+class HistoricoTab(QWidget):
+    """Aba com as execuções gravadas no histórico (historico.py)"""
+    
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        # Execuções listadas na tabela, por id
+        self.execucoes = {}
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        
+        # Título da aba
+        historico_title = QLabel("Histórico de Execuções")
+        historico_title.setFont(QFont("Arial", 14, QFont.Bold))
+        historico_title.setStyleSheet(f"color: {COR_PRIMARIA}; padding-bottom: 10px;")
+        historico_title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(historico_title)
+        
+        # Filtros por SKU, CEP e tipo de execução
+        filtros_layout = QHBoxLayout()
+        
+        self.sku_filtro = QLineEdit()
+        self.sku_filtro.setPlaceholderText("SKU")
+        self.sku_filtro.returnPressed.connect(self.atualizar_lista)
+        
+        self.cep_filtro = QLineEdit()
+        self.cep_filtro.setPlaceholderText("CEP (00000-000)")
+        self.cep_filtro.returnPressed.connect(self.atualizar_lista)
+        
+        self.tipo_filtro = QComboBox()
+        self.tipo_filtro.addItem("Todas", None)
+        self.tipo_filtro.addItem("Simulações", TIPO_SIMULACAO)
+        self.tipo_filtro.addItem("Estoque", TIPO_ESTOQUE)
+        self.tipo_filtro.currentIndexChanged.connect(self.atualizar_lista)
+        
+        for widget in (self.sku_filtro, self.cep_filtro, self.tipo_filtro):
+            widget.setFont(QFont("Arial", 10))
+            widget.setStyleSheet(f"""
+                background-color: {COR_SECUNDARIA};
+                border: 1px solid {COR_BORDA};
+                border-radius: 4px;
+                padding: 5px;
+            """)
+        
+        self.atualizar_btn = QPushButton("ATUALIZAR")
+        self.atualizar_btn.setFont(QFont("Arial", 10))
+        self.atualizar_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COR_BORDA};
+                color: {COR_TEXTO};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+        """)
+        self.atualizar_btn.clicked.connect(self.atualizar_lista)
+        
+        self.carregar_btn = QPushButton("ABRIR NAS ABAS")
+        self.carregar_btn.setFont(QFont("Arial", 10, QFont.Bold))
+        self.carregar_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COR_DESTAQUE2};
+                color: {COR_SECUNDARIA};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+            QPushButton:hover {{
+                background-color: #239623;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.carregar_btn.clicked.connect(self.carregar_selecionada)
+        
+        self.comparar_btn = QPushButton("COMPARAR")
+        self.comparar_btn.setFont(QFont("Arial", 10, QFont.Bold))
+        self.comparar_btn.setToolTip(
+            "Duas simulações selecionadas: compara uma com a outra; "
+            "uma só: compara com a anterior do mesmo SKU e CEP"
+        )
+        self.comparar_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COR_PRIMARIA};
+                color: {COR_SECUNDARIA};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.comparar_btn.clicked.connect(self.comparar_selecionadas)
+        
+        filtros_layout.addWidget(self.sku_filtro)
+        filtros_layout.addWidget(self.cep_filtro)
+        filtros_layout.addWidget(self.tipo_filtro)
+        filtros_layout.addStretch()
+        filtros_layout.addWidget(self.atualizar_btn)
+        filtros_layout.addWidget(self.carregar_btn)
+        filtros_layout.addWidget(self.comparar_btn)
+        layout.addLayout(filtros_layout)
+        
+        # Execuções gravadas, da mais recente para a mais antiga
+        colunas = ["Data/Hora", "Tipo", "SKU", "CEP", "Lojas", "Com entrega", "Falhas", "Duração", "Motor"]
+        self.historico_table = self._criar_tabela(colunas)
+        self.historico_table.cellDoubleClicked.connect(lambda row, col: self.carregar_selecionada())
+        layout.addWidget(self.historico_table, 1)
+        
+        self.info_label = QLabel("")
+        self.info_label.setFont(QFont("Arial", 9))
+        self.info_label.setStyleSheet("color: #666666;")
+        layout.addWidget(self.info_label)
+        
+        # Diferenças por loja entre duas simulações, da maior mudança para a menor
+        self.comparacao_label = QLabel("Selecione uma ou duas simulações e clique em COMPARAR.")
+        self.comparacao_label.setFont(QFont("Arial", 10, QFont.Bold))
+        self.comparacao_label.setStyleSheet(f"color: {COR_PRIMARIA}; padding-top: 8px;")
+        self.comparacao_label.setWordWrap(True)
+        layout.addWidget(self.comparacao_label)
+        
+        self.comparacao_table = self._criar_tabela([
+            "Loja", "Mudança", "Preço antes", "Preço depois", "Δ Preço",
+            "Prazo antes", "Prazo depois", "Δ Prazo", "Transportadora"
+        ])
+        layout.addWidget(self.comparacao_table, 1)
+    
+    def _criar_tabela(self, colunas):
+        tabela = QTableWidget()
+        tabela.setColumnCount(len(colunas))
+        tabela.setHorizontalHeaderLabels(colunas)
+        tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        tabela.setSelectionBehavior(QAbstractItemView.SelectRows)
+        tabela.verticalHeader().setVisible(False)
+        tabela.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        tabela.horizontalHeader().setStretchLastSection(True)
+        tabela.setStyleSheet(f"""
+            QTableWidget {{
+                background-color: {COR_SECUNDARIA};
+                gridline-color: #ddd;
+                font-size: 9pt;
+                color: {COR_TEXTO};
+                border: 1px solid {COR_BORDA};
+            }}
+            QHeaderView::section {{
+                background-color: {COR_PRIMARIA};
+                color: {COR_SECUNDARIA};
+                font-weight: bold;
+                padding: 4px;
+            }}
+        """)
+        return tabela
+    
+    def showEvent(self, event):
+        # Execuções gravadas desde a última visita aparecem ao abrir a aba
+        super().showEvent(event)
+        self.atualizar_lista()
+    
+    def atualizar_lista(self):
+        """Lista as execuções do histórico com os filtros atuais"""
+        historico = self.parent.historico
+        if historico is None:
+            self.historico_table.setRowCount(0)
+            self.carregar_btn.setEnabled(False)
+            self.comparar_btn.setEnabled(False)
+            self.info_label.setText("Histórico desligado nas configurações (arquivo vazio).")
+            return
+        
+        try:
+            execucoes = historico.listar(
+                sku=self.sku_filtro.text().strip() or None,
+                cep=self.cep_filtro.text().strip() or None,
+                tipo=self.tipo_filtro.currentData()
+            )
+        except Exception as e:
+            self.info_label.setText(f"Erro ao ler o histórico: {str(e)}")
+            return
+        
+        self.execucoes = {execucao['id']: execucao for execucao in execucoes}
+        self.historico_table.setRowCount(len(execucoes))
+        for row, execucao in enumerate(execucoes):
+            simulacao = execucao['tipo'] == TIPO_SIMULACAO
+            valores = [
+                datetime.fromtimestamp(execucao['executado_em']).strftime("%d/%m/%Y %H:%M:%S"),
+                ("Simulação" if simulacao else "Estoque") + (" (cancelada)" if execucao['cancelada'] else ""),
+                execucao['sku'],
+                execucao['cep'] or "—",
+                execucao['lojas'],
+                execucao['com_entrega'] if simulacao else "—",
+                execucao['com_falha'],
+                f"{execucao['duracao_s']:.1f}s" if execucao['duracao_s'] is not None else "—",
+                execucao['engine'] or "—",
+            ]
+            for col, valor in enumerate(valores):
+                item = QTableWidgetItem(str(valor))
+                if col == 0:
+                    item.setData(Qt.UserRole, execucao['id'])
+                if 4 <= col <= 7:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.historico_table.setItem(row, col, item)
+        
+        self.carregar_btn.setEnabled(bool(execucoes))
+        self.comparar_btn.setEnabled(bool(execucoes))
+        self.info_label.setText(f"{len(execucoes)} execuções em {historico.caminho}")
+    
+    def execucoes_selecionadas(self):
+        """IDs das execuções das linhas selecionadas, na ordem da tabela"""
+        linhas = sorted({index.row() for index in self.historico_table.selectedIndexes()})
+        return [self.historico_table.item(row, 0).data(Qt.UserRole) for row in linhas]
+    
+    def carregar_selecionada(self):
+        selecionadas = self.execucoes_selecionadas()
+        if selecionadas:
+            self.parent.carregar_execucao_historico(selecionadas[0])
+    
+    def comparar_selecionadas(self):
+        """Compara duas simulações selecionadas, ou a selecionada com a anterior do mesmo SKU e CEP"""
+        historico = self.parent.historico
+        execucoes = [self.execucoes[i] for i in self.execucoes_selecionadas()]
+        if not execucoes or len(execucoes) > 2:
+            self.parent.atualizar_status("Selecione uma ou duas simulações para comparar", "red")
+            return
+        if any(execucao['tipo'] != TIPO_SIMULACAO for execucao in execucoes):
+            self.parent.atualizar_status("A comparação é feita entre simulações, não consultas de estoque", "red")
+            return
+        
+        if len(execucoes) == 1:
+            anterior = historico.anterior(execucoes[0])
+            if anterior is None:
+                self.parent.atualizar_status(
+                    f"Não há simulação anterior do SKU {execucoes[0]['sku']} para o CEP {execucoes[0]['cep']}", "red"
+                )
+                return
+            execucoes.append(anterior)
+        
+        antes, depois = sorted(execucoes, key=lambda execucao: (execucao['executado_em'], execucao['id']))
+        if (antes['sku'], antes['cep']) != (depois['sku'], depois['cep']):
+            self.parent.atualizar_status("Compare simulações do mesmo SKU e CEP", "red")
+            return
+        
+        diferencas = comparar_execucoes(historico.lojas(antes['id']), historico.lojas(depois['id']))
+        self.mostrar_comparacao(antes, depois, diferencas)
+    
+    def mostrar_comparacao(self, antes, depois, diferencas):
+        """Exibe a tabela de diferenças por loja entre duas simulações"""
+        def data(execucao):
+            return datetime.fromtimestamp(execucao['executado_em']).strftime("%d/%m/%Y %H:%M")
+        
+        resumo = resumir_diferencas(diferencas)
+        self.comparacao_label.setText(
+            f"SKU {depois['sku']}, CEP {depois['cep']}: {data(antes)} → {data(depois)}  |  "
+            f"{resumo[MUDANCA_GANHOU]} ganharam e {resumo[MUDANCA_PERDEU]} perderam cobertura, "
+            f"preço subiu em {resumo['preco_subiu']} e caiu em {resumo['preco_caiu']}, "
+            f"prazo aumentou em {resumo['prazo_aumentou']} e diminuiu em {resumo['prazo_diminuiu']}, "
+            f"{resumo[MUDANCA_FALHA]} com mudança de falha na consulta"
+        )
+        
+        def preco(linha):
+            return formatar_moeda(linha['preco']) if linha and linha.get('disponivel') else "—"
+        
+        def prazo(linha):
+            return linha['prazo'] if linha and linha.get('disponivel') else "—"
+        
+        self.comparacao_table.setRowCount(len(diferencas))
+        for row, diferenca in enumerate(diferencas):
+            antes_loja, depois_loja = diferenca['antes'], diferenca['depois']
+            delta_preco = "—"
+            if diferenca['delta_preco']:
+                sinal = "+" if diferenca['delta_preco'] > 0 else "-"
+                delta_preco = f"{sinal}{formatar_moeda(abs(diferenca['delta_preco']))}"
+                if diferenca['variacao_preco_pct'] is not None:
+                    delta_preco += f" ({diferenca['variacao_preco_pct']:+.1f}%)"
+            delta_prazo = f"{diferenca['delta_prazo']:+d} dias" if diferenca['delta_prazo'] else "—"
+            transportadoras = [
+                linha.get('transportadora') for linha in (antes_loja, depois_loja)
+                if linha and linha.get('transportadora')
+            ]
+            if len(set(transportadoras)) > 1:
+                transportadora = " → ".join(transportadoras)
+            else:
+                transportadora = transportadoras[0] if transportadoras else "—"
+            
+            valores = [
+                self.parent.formatar_nome_loja(diferenca['loja']), diferenca['descricao'],
+                preco(antes_loja), preco(depois_loja), delta_preco,
+                prazo(antes_loja), prazo(depois_loja), delta_prazo, transportadora
+            ]
+            cor = CORES_MUDANCA.get(diferenca['mudanca'])
+            if cor is None and diferenca['delta_preco']:
+                cor = QColor(255, 235, 235) if diferenca['delta_preco'] > 0 else QColor(235, 255, 235)
+            for col, valor in enumerate(valores):
+                item = QTableWidgetItem(str(valor))
+                if 2 <= col <= 7:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                if cor is not None:
+                    item.setBackground(cor)
+                self.comparacao_table.setItem(row, col, item)
+        
+        self.parent.atualizar_status(
+            f"Comparação concluída: {len(diferencas)} lojas com mudança entre {data(antes)} e {data(depois)}", "green"
+        )
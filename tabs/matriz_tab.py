@@ -0,0 +1,203 @@
+"""
+Aba de Matriz CEP × Loja
+"""
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPlainTextEdit, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QFileDialog
+)
+from PySide6.QtGui import QFont, QColor
+from PySide6.QtCore import Qt
+from config import *
+from utils import *
+
+
+class MatrizTab(QWidget):
+    """Aba de simulação de vários CEPs contra as lojas selecionadas"""
+    
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        
+        # Título da aba
+        matriz_title = QLabel("Matriz de Cobertura CEP × Loja")
+        matriz_title.setFont(QFont("Arial", 14, QFont.Bold))
+        matriz_title.setStyleSheet(f"color: {COR_PRIMARIA}; padding-bottom: 10px;")
+        matriz_title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(matriz_title)
+        
+        # Entrada de CEPs (colar ou carregar de arquivo)
+        ceps_label = QLabel("CEPs (um por linha, usa o SKU e as lojas selecionados no painel):")
+        ceps_label.setFont(QFont("Arial", 10, QFont.Bold))
+        ceps_label.setStyleSheet(f"color: {COR_PRIMARIA};")
+        layout.addWidget(ceps_label)
+        
+        self.ceps_input = QPlainTextEdit()
+        self.ceps_input.setFont(QFont("Arial", 10))
+        self.ceps_input.setPlaceholderText("05372-110\n01310-100\n...")
+        self.ceps_input.setMaximumHeight(120)
+        self.ceps_input.setStyleSheet(f"""
+            background-color: {COR_SECUNDARIA};
+            border: 1px solid {COR_BORDA};
+            border-radius: 4px;
+            padding: 5px;
+        """)
+        layout.addWidget(self.ceps_input)
+        
+        botoes_layout = QHBoxLayout()
+        
+        self.carregar_arquivo_btn = QPushButton("CARREGAR ARQUIVO")
+        self.carregar_arquivo_btn.setFont(QFont("Arial", 10))
+        self.carregar_arquivo_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COR_BORDA};
+                color: {COR_TEXTO};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+        """)
+        self.carregar_arquivo_btn.clicked.connect(self.carregar_arquivo_ceps)
+        
+        self.simular_matriz_btn = QPushButton("SIMULAR MATRIZ")
+        self.simular_matriz_btn.setFont(QFont("Arial", 10, QFont.Bold))
+        self.simular_matriz_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {COR_DESTAQUE2};
+                color: {COR_SECUNDARIA};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+            QPushButton:hover {{
+                background-color: #239623;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.simular_matriz_btn.clicked.connect(self.parent.iniciar_simulacao_matriz)
+        
+        self.cancelar_matriz_btn = QPushButton("CANCELAR")
+        self.cancelar_matriz_btn.setFont(QFont("Arial", 10))
+        self.cancelar_matriz_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: #e74c3c;
+                color: {COR_SECUNDARIA};
+                padding: 8px 15px;
+                border-radius: 5px;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.cancelar_matriz_btn.setEnabled(False)
+        self.cancelar_matriz_btn.clicked.connect(self.parent.cancelar_simulacao_matriz)
+        
+        botoes_layout.addStretch()
+        botoes_layout.addWidget(self.carregar_arquivo_btn)
+        botoes_layout.addWidget(self.simular_matriz_btn)
+        botoes_layout.addWidget(self.cancelar_matriz_btn)
+        layout.addLayout(botoes_layout)
+        
+        # Grade de resultados
+        self.matriz_table = QTableWidget()
+        self.matriz_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.matriz_table.setSelectionBehavior(QAbstractItemView.SelectItems)
+        self.matriz_table.verticalHeader().setDefaultSectionSize(25)
+        self.matriz_table.setStyleSheet(f"""
+            QTableWidget {{
+                background-color: {COR_SECUNDARIA};
+                gridline-color: #ddd;
+                font-size: 9pt;
+                color: {COR_TEXTO};
+                border: 1px solid {COR_BORDA};
+            }}
+            QHeaderView::section {{
+                background-color: {COR_PRIMARIA};
+                color: {COR_SECUNDARIA};
+                font-weight: bold;
+                padding: 4px;
+            }}
+        """)
+        layout.addWidget(self.matriz_table, 1)
+    
+    def get_ceps(self):
+        """Retorna os CEPs informados no formato 00000-000"""
+        return extrair_ceps(self.ceps_input.toPlainText())
+    
+    def carregar_arquivo_ceps(self):
+        """Carrega CEPs de um arquivo de texto ou CSV"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Carregar CEPs", "", "Arquivos de texto (*.txt *.csv);;Todos os arquivos (*)"
+        )
+        if not file_path:
+            return
+        
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                ceps = extrair_ceps(f.read())
+            self.ceps_input.setPlainText("\n".join(ceps))
+            self.parent.atualizar_status(f"{len(ceps)} CEPs carregados de {file_path}", "green")
+        except Exception as e:
+            self.parent.atualizar_status(f"Erro ao carregar arquivo: {str(e)}", "red")
+    
+    def mostrar_matriz(self, matriz):
+        """Exibe a grade CEP × loja com a melhor SLA (preço e prazo da mesma opção) e disponibilidade"""
+        self.simular_matriz_btn.setEnabled(True)
+        self.simular_matriz_btn.setText("SIMULAR MATRIZ")
+        
+        ceps = matriz['ceps']
+        lojas = matriz['lojas']
+        celulas = matriz['celulas']
+        
+        # Primeira coluna com a cobertura do CEP, depois uma coluna por loja
+        self.matriz_table.clear()
+        self.matriz_table.setRowCount(len(ceps))
+        self.matriz_table.setColumnCount(len(lojas) + 1)
+        self.matriz_table.setHorizontalHeaderLabels(
+            ["Cobertura"] + [self.parent.formatar_nome_loja(loja) for loja in lojas]
+        )
+        self.matriz_table.setVerticalHeaderLabels(ceps)
+        
+        for row, cep in enumerate(ceps):
+            disponiveis = 0
+            for col, loja in enumerate(lojas, start=1):
+                celula = celulas.get(cep, {}).get(loja)
+                
+                if celula is None:
+                    # Matriz cancelada antes desta célula
+                    celula = {}
+                    texto = "Não simulado"
+                    cor = QColor(230, 230, 230)  # Cinza claro
+                elif celula.get('disponivel'):
+                    disponiveis += 1
+                    texto = f"{formatar_moeda(celula['preco'])} · {celula['prazo_dias']}d"
+                    cor = QColor(200, 255, 200)  # Verde claro
+                elif celula.get('erro'):
+                    texto = "Erro"
+                    cor = QColor(255, 255, 200)  # Amarelo claro
+                else:
+                    texto = "—"
+                    cor = QColor(255, 200, 200)  # Vermelho claro
+                
+                item = QTableWidgetItem(texto)
+                item.setTextAlignment(Qt.AlignCenter)
+                item.setBackground(cor)
+                dica = f"{loja} / {cep}"
+                if celula.get('transportadora'):
+                    dica += f" · {celula['transportadora']}"
+                item.setToolTip(celula.get('erro') or dica)
+                self.matriz_table.setItem(row, col, item)
+            
+            cobertura_item = QTableWidgetItem(f"{disponiveis}/{len(lojas)}")
+            cobertura_item.setTextAlignment(Qt.AlignCenter)
+            cobertura_item.setFont(QFont("Arial", 9, QFont.Bold))
+            self.matriz_table.setItem(row, 0, cobertura_item)
+        
+        self.matriz_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.parent.atualizar_status(
+            f"Matriz concluída: {len(ceps)} CEPs × {len(lojas)} lojas.", "green"
+        )
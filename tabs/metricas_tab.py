@@ -0,0 +1,132 @@
+"""
+Aba de Métricas da Execução
+"""
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt
+from config import *
+from utils import formatar_tamanho
+from retentativas import descrever_erro
+
+
+class MetricasTab(QWidget):
+    """Aba com as métricas das requisições da última execução"""
+    
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.init_ui()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        
+        # Título da aba
+        metricas_title = QLabel("Métricas da Última Execução")
+        metricas_title.setFont(QFont("Arial", 14, QFont.Bold))
+        metricas_title.setStyleSheet(f"color: {COR_PRIMARIA}; padding-bottom: 10px;")
+        metricas_title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(metricas_title)
+        
+        self.resumo_label = QLabel("Nenhuma execução ainda.")
+        self.resumo_label.setFont(QFont("Arial", 10, QFont.Bold))
+        self.resumo_label.setStyleSheet(f"color: {COR_TEXTO};")
+        self.resumo_label.setWordWrap(True)
+        layout.addWidget(self.resumo_label)
+        
+        layout.addWidget(self._criar_subtitulo("Requisições por endpoint"))
+        self.endpoints_table = self._criar_tabela(
+            ["Endpoint", "Requisições", "Compartilhadas", "p50", "p95", "p99", "Recebido", "Erros"]
+        )
+        layout.addWidget(self.endpoints_table, 1)
+        
+        layout.addWidget(self._criar_subtitulo("Lojas mais lentas (tempo somado das requisições)"))
+        self.lojas_table = self._criar_tabela(["Loja", "Requisições", "Compartilhadas", "Tempo total", "Tempo médio"])
+        layout.addWidget(self.lojas_table, 2)
+        
+        self.prometheus_label = QLabel("")
+        self.prometheus_label.setFont(QFont("Arial", 9))
+        self.prometheus_label.setStyleSheet("color: #666666;")
+        layout.addWidget(self.prometheus_label)
+    
+    def _criar_subtitulo(self, texto):
+        label = QLabel(texto)
+        label.setFont(QFont("Arial", 10, QFont.Bold))
+        label.setStyleSheet(f"color: {COR_PRIMARIA}; padding-top: 8px;")
+        return label
+    
+    def _criar_tabela(self, colunas):
+        tabela = QTableWidget()
+        tabela.setColumnCount(len(colunas))
+        tabela.setHorizontalHeaderLabels(colunas)
+        tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        tabela.setSelectionBehavior(QAbstractItemView.SelectRows)
+        tabela.verticalHeader().setVisible(False)
+        tabela.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        for coluna in range(1, len(colunas)):
+            tabela.horizontalHeader().setSectionResizeMode(coluna, QHeaderView.ResizeToContents)
+        tabela.setStyleSheet(f"""
+            QTableWidget {{
+                background-color: {COR_SECUNDARIA};
+                gridline-color: #ddd;
+                font-size: 9pt;
+                color: {COR_TEXTO};
+                border: 1px solid {COR_BORDA};
+            }}
+            QHeaderView::section {{
+                background-color: {COR_PRIMARIA};
+                color: {COR_SECUNDARIA};
+                font-weight: bold;
+                padding: 4px;
+            }}
+        """)
+        return tabela
+    
+    def _preencher(self, tabela, linhas):
+        tabela.setRowCount(len(linhas))
+        for row, valores in enumerate(linhas):
+            for col, valor in enumerate(valores):
+                item = QTableWidgetItem(str(valor))
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                tabela.setItem(row, col, item)
+    
+    def mostrar_metricas(self, metricas, arquivo_prometheus=None):
+        """Exibe o resumo de uma MetricasExecucao (metricas.py)"""
+        resumo = metricas.resumo()
+        
+        texto = (
+            f"{resumo['requisicoes']} requisições em {resumo['duracao_s']:.1f}s "
+            f"({resumo['requisicoes_por_s']:.1f} requisições/s)"
+        )
+        if resumo['compartilhadas']:
+            texto += f"  |  {resumo['compartilhadas']} chamadas compartilhadas com requisições idênticas em voo"
+        if resumo['erros']:
+            texto += "  |  Erros: " + ", ".join(
+                f"{descrever_erro(tipo)}: {n}" for tipo, n in sorted(resumo['erros'].items())
+            )
+        else:
+            texto += "  |  Sem erros"
+        self.resumo_label.setText(texto)
+        
+        self._preencher(self.endpoints_table, [
+            (
+                endpoint, dados['requisicoes'], dados['compartilhadas'], f"{dados['p50_ms']:.0f} ms", f"{dados['p95_ms']:.0f} ms",
+                f"{dados['p99_ms']:.0f} ms", formatar_tamanho(dados['bytes']), dados['erros']
+            )
+            for endpoint, dados in resumo['endpoints'].items()
+        ])
+        
+        self._preencher(self.lojas_table, [
+            (
+                self.parent.formatar_nome_loja(loja['loja']), loja['requisicoes'], loja['compartilhadas'],
+                f"{loja['tempo_total_ms']:.0f} ms", f"{loja['tempo_medio_ms']:.0f} ms"
+            )
+            for loja in resumo['lojas_mais_lentas']
+        ])
+        
+        self.prometheus_label.setText(
+            f"Métricas exportadas para {arquivo_prometheus} (formato Prometheus)" if arquivo_prometheus else ""
+        )
@@ -1,6 +1,8 @@
 """
 Aba de Ranking das Lojas
 """
+from bisect import bisect_right
+
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
     QHeaderView, QAbstractItemView, QSizePolicy, QSplitter, QScrollArea
@@ -11,12 +13,20 @@ from config import *
 from utils import *
 
 
+def chave_ranking(item):
+    """Ordem do ranking: 1. prazo (menor primeiro), 2. preço (menor), 3. estoque (maior)"""
+    return (item['prazo_dias'], item['preco'], -item['estoque'])
+
+
 class RankingTab(QWidget):
     """Aba de ranking das lojas"""
     
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
+        self.tabela_ranking = None
+        self.dados_ranking = []
+        self._chaves_ranking = []
         self.init_ui()
     
     def init_ui(self):
@@ -36,6 +46,12 @@ class RankingTab(QWidget):
     
     def exibir_ranking(self, resultados):
         """Exibe o ranking das lojas"""
+        self.iniciar_ranking()
+        self.adicionar_ao_ranking(resultados)
+        self.finalizar_ranking()
+    
+    def iniciar_ranking(self):
+        """Monta a aba com o ranking vazio, pronto para receber resultados parciais"""
         # Limpar conteúdo anterior
         for i in reversed(range(self.ranking_layout.count())): 
             widget = self.ranking_layout.itemAt(i).widget()
@@ -59,19 +75,67 @@ class RankingTab(QWidget):
         splitter.setChildrenCollapsible(False)
         
         # Criar tabela de ranking
-        table = self._criar_tabela_ranking(resultados)
+        self.tabela_ranking = self._criar_tabela_ranking()
+        self.dados_ranking = []
+        self._chaves_ranking = []
         
         # Adicionar tabela ao splitter
-        splitter.addWidget(table)
+        splitter.addWidget(self.tabela_ranking)
         
         # Adicionar o splitter ao layout da aba
         self.ranking_layout.addWidget(splitter, 1)
     
-    def _criar_tabela_ranking(self, resultados):
-        """Cria a tabela de ranking"""
+    def adicionar_ao_ranking(self, resultados):
+        """Inclui no ranking as lojas de um lote de resultados, cada uma na sua posição
+        
+        Só as linhas novas são criadas; a numeração das posições é feita
+        uma vez, em finalizar_ranking.
+        """
+        if self.tabela_ranking is None:
+            self.iniciar_ranking()
+        
+        novos = coletar_dados_ranking(resultados, self.parent.determinar_tipo_loja)
+        if not novos:
+            return
+        table = self.tabela_ranking
+        
+        # Primeiro lote (ou ranking completo): preencher a tabela de uma vez
+        if not self.dados_ranking:
+            self.dados_ranking = novos
+            self._chaves_ranking = [chave_ranking(item) for item in novos]
+            self._preencher_tabela_ranking(table, novos, numerar=False)
+            return
+        
+        table.setUpdatesEnabled(False)
+        lojas_novas = {item['loja'] for item in novos}
+        for row in reversed(range(len(self.dados_ranking))):
+            # Loja que já estava no ranking (resultado repetido): sai da posição antiga
+            if self.dados_ranking[row]['loja'] in lojas_novas:
+                del self.dados_ranking[row]
+                del self._chaves_ranking[row]
+                table.removeRow(row)
+        for item in novos:
+            chave = chave_ranking(item)
+            row = bisect_right(self._chaves_ranking, chave)
+            self._chaves_ranking.insert(row, chave)
+            self.dados_ranking.insert(row, item)
+            table.insertRow(row)
+            self._preencher_linha_ranking(table, row, item)
+        table.setUpdatesEnabled(True)
+    
+    def finalizar_ranking(self):
+        """Reordena o ranking completo e numera as posições (fim da execução)"""
+        if self.tabela_ranking is None:
+            return
+        self.dados_ranking.sort(key=chave_ranking)
+        self._chaves_ranking = [chave_ranking(item) for item in self.dados_ranking]
+        self._preencher_tabela_ranking(self.tabela_ranking, self.dados_ranking)
+    
+    def _criar_tabela_ranking(self):
+        """Cria a tabela de ranking (vazia)"""
         table = QTableWidget()
-        table.setColumnCount(7)  # Colunas: Posição, Loja, Tipo, Preço, Prazo, Transportadora, Estoque
-        table.setHorizontalHeaderLabels(["Posição", "Loja", "Tipo", "Preço Frete", "Prazo", "Transportadora", "Estoque"])
+        table.setColumnCount(8)  # Colunas: Posição, Loja, Tipo, Preço, Prazo, Transportadora, Estoque, Origem
+        table.setHorizontalHeaderLabels(["Posição", "Loja", "Tipo", "Preço Frete", "Prazo", "Transportadora", "Estoque", "Origem"])
         
         # Configurar cabeçalhos
         header = table.horizontalHeader()
@@ -86,6 +150,7 @@ class RankingTab(QWidget):
         header.setSectionResizeMode(4, QHeaderView.ResizeToContents)  # Prazo
         header.setSectionResizeMode(5, QHeaderView.ResizeToContents)  # Transportadora
         header.setSectionResizeMode(6, QHeaderView.ResizeToContents)  # Estoque
+        header.setSectionResizeMode(7, QHeaderView.ResizeToContents)  # Origem
         
         # Configurar comportamento da tabela
         table.setEditTriggers(QAbstractItemView.NoEditTriggers)
@@ -122,103 +187,64 @@ class RankingTab(QWidget):
             }}
         """)
         
-        # Coletar dados para ranking
-        ranking_data = self._coletar_dados_ranking(resultados)
+        return table
         
-        # Preencher tabela
+    def _preencher_tabela_ranking(self, table, ranking_data, numerar=True):
+        """Preenche a tabela com o ranking já ordenado"""
+        table.setUpdatesEnabled(False)
         table.setRowCount(len(ranking_data))
         
         for i, item in enumerate(ranking_data):
-            # Posição
-            posicao_item = QTableWidgetItem(f"{i+1}º")
-            posicao_item.setTextAlignment(Qt.AlignCenter)
-            
-            # Destaque para top 3
-            if i < 3:
-                posicao_item.setBackground(QBrush(QColor(50, 205, 50, 50)))
+            self._preencher_linha_ranking(table, i, item)
+            if numerar:
+                # Posição
+                posicao_item = QTableWidgetItem(f"{i+1}º")
+                posicao_item.setTextAlignment(Qt.AlignCenter)
             
-            # Loja formatada
-            nome_loja = self.parent.formatar_nome_loja(item['loja'])
-            loja_item = QTableWidgetItem(f"{nome_loja} ({item['loja']})")
-            
-            # Tipo da loja
-            tipo_item = QTableWidgetItem(item['tipo'])
-            tipo_item.setTextAlignment(Qt.AlignCenter)
-            
-            # Preço formatado
-            preco_item = QTableWidgetItem(self.parent.formatar_moeda(item['preco']))
-            preco_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            
-            # Prazo
-            prazo_item = QTableWidgetItem(item['prazo_str'])
-            prazo_item.setTextAlignment(Qt.AlignCenter)
-            
-            # Transportadora
-            transp_item = QTableWidgetItem(item['transportadora'])
-            
-            # Estoque
-            estoque_item = QTableWidgetItem(str(item['estoque']))
-            estoque_item.setTextAlignment(Qt.AlignCenter)
-            
-            table.setItem(i, 0, posicao_item)
-            table.setItem(i, 1, loja_item)
-            table.setItem(i, 2, tipo_item)
-            table.setItem(i, 3, preco_item)
-            table.setItem(i, 4, prazo_item)
-            table.setItem(i, 5, transp_item)
-            table.setItem(i, 6, estoque_item)
+                # Destaque para top 3
+                if i < 3:
+                    posicao_item.setBackground(QBrush(QColor(50, 205, 50, 50)))
+                table.setItem(i, 0, posicao_item)
         
-        return table
+        table.setUpdatesEnabled(True)
     
-    def _coletar_dados_ranking(self, resultados):
-        """Coleta dados para o ranking"""
-        ranking_data = []
-        
-        for loja, data in resultados.items():
-            simulation = data.get('simulation', {})
-            if loja_tem_entrega_normal(simulation):
-                logistics = simulation['logisticsInfo'][0]
-                
-                # Filtrar apenas SLAS de entrega normal
-                slas_entrega = [
-                    sla for sla in logistics['slas'] 
-                    if sla.get('deliveryChannel', '').lower() != 'pickup-in-point'
-                ]
-                
-                if slas_entrega:
-                    melhor_opcao = min(
-                        slas_entrega,
-                        key=lambda x: x.get('listPrice', float('inf')),
-                        default=None
-                    )
-                    
-                    if melhor_opcao:
-                        preco = melhor_opcao.get('listPrice', 0)
-                        prazo_str = melhor_opcao.get('shippingEstimate', '')
-                        prazo_dias = parse_prazo_para_dias(prazo_str)
-                        transportadora = melhor_opcao.get('name', '')
-                        
-                        if 'deliveryIds' in melhor_opcao and melhor_opcao['deliveryIds']:
-                            transportadora = melhor_opcao['deliveryIds'][0].get('courierName', transportadora)
-                        
-                        # Obter estoque total da loja
-                        estoque = 0
-                        inventory = data.get('inventory', {})
-                        if inventory and inventory.get('balance'):
-                            for warehouse in inventory['balance']:
-                                estoque += warehouse.get('totalQuantity', 0)
-                        
-                        ranking_data.append({
-                            'loja': loja,
-                            'tipo': self.parent.determinar_tipo_loja(loja),
-                            'preco': preco,
-                            'prazo_str': prazo_str,
-                            'prazo_dias': prazo_dias,
-                            'transportadora': transportadora,
-                            'estoque': estoque
-                        })
-        
-        # Ordenar por: 1. prazo (menor primeiro), 2. preço (menor), 3. estoque (maior)
-        ranking_data.sort(key=lambda x: (x['prazo_dias'], x['preco'], -x['estoque']))
-        
-        return ranking_data
+    def _preencher_linha_ranking(self, table, i, item):
+        """Preenche as colunas de uma loja (sem a posição, numerada no fim)"""
+        # Loja formatada
+        nome_loja = self.parent.formatar_nome_loja(item['loja'])
+        loja_item = QTableWidgetItem(f"{nome_loja} ({item['loja']})")
+        
+        # Tipo da loja
+        tipo_item = QTableWidgetItem(item['tipo'])
+        tipo_item.setTextAlignment(Qt.AlignCenter)
+        
+        # Preço formatado
+        preco_item = QTableWidgetItem(self.parent.formatar_moeda(item['preco']))
+        preco_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        
+        # Prazo
+        prazo_item = QTableWidgetItem(item['prazo_str'])
+        prazo_item.setTextAlignment(Qt.AlignCenter)
+        
+        # Transportadora
+        transp_item = QTableWidgetItem(item['transportadora'])
+        
+        # Estoque
+        estoque_item = QTableWidgetItem(str(item['estoque']))
+        estoque_item.setTextAlignment(Qt.AlignCenter)
+        
+        # Origem: consulta desta execução ou cache (com a idade)
+        if item['cache_idade'] is None:
+            origem_item = QTableWidgetItem("Consulta")
+        else:
+            origem_item = QTableWidgetItem(f"Cache ({formatar_idade(item['cache_idade'])})")
+            origem_item.setBackground(QBrush(QColor(200, 225, 255)))  # Azul claro
+        origem_item.setTextAlignment(Qt.AlignCenter)
+        
+        table.setItem(i, 1, loja_item)
+        table.setItem(i, 2, tipo_item)
+        table.setItem(i, 3, preco_item)
+        table.setItem(i, 4, prazo_item)
+        table.setItem(i, 5, transp_item)
+        table.setItem(i, 6, estoque_item)
+        table.setItem(i, 7, origem_item)
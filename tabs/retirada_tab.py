@@ -17,6 +17,8 @@ class RetiradaTab(QWidget):
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
+        self.container_layout = None
+        self.sem_pontos_label = None
         self.init_ui()
     
     def init_ui(self):
@@ -36,6 +38,11 @@ class RetiradaTab(QWidget):
     
     def exibir_pontos_retirada(self, resultados):
         """Exibe pontos de retirada"""
+        self.iniciar_pontos_retirada()
+        self.adicionar_pontos_retirada(resultados)
+    
+    def iniciar_pontos_retirada(self):
+        """Monta a aba sem lojas, pronta para receber resultados parciais"""
         # Limpar conteúdo anterior
         for i in reversed(range(self.retirada_layout.count())): 
             widget = self.retirada_layout.itemAt(i).widget()
@@ -56,8 +63,23 @@ class RetiradaTab(QWidget):
         
         # Container principal com scroll
         container = QWidget()
-        container_layout = QVBoxLayout(container)
-        container_layout.setAlignment(Qt.AlignTop)
+        self.container_layout = QVBoxLayout(container)
+        self.container_layout.setAlignment(Qt.AlignTop)
+        
+        # Mensagem exibida enquanto nenhuma loja tiver ponto de retirada
+        self.sem_pontos_label = QLabel("Nenhum ponto de retirada disponível")
+        self.sem_pontos_label.setFont(QFont("Arial", 12))
+        self.sem_pontos_label.setAlignment(Qt.AlignCenter)
+        self.sem_pontos_label.setStyleSheet("color: #7f8c8d;")
+        self.container_layout.addWidget(self.sem_pontos_label)
+        
+        # Adicionar ao layout da aba
+        self.retirada_layout.addWidget(container)
+    
+    def adicionar_pontos_retirada(self, resultados):
+        """Acrescenta os pontos de retirada das lojas de um lote de resultados"""
+        if self.container_layout is None:
+            self.iniciar_pontos_retirada()
         
         # Processar resultados por loja
         for loja, data in resultados.items():
@@ -97,18 +119,8 @@ class RetiradaTab(QWidget):
                 # Tabela para pontos de retirada
                 table = self._criar_tabela_retirada(pontos_retirada)
                 loja_layout.addWidget(table)
-                container_layout.addWidget(loja_group)
-        
-        # Se não houver pontos de retirada
-        if container_layout.count() == 0:
-            no_data_label = QLabel("Nenhum ponto de retirada disponível")
-            no_data_label.setFont(QFont("Arial", 12))
-            no_data_label.setAlignment(Qt.AlignCenter)
-            no_data_label.setStyleSheet("color: #7f8c8d;")
-            container_layout.addWidget(no_data_label)
-        
-        # Adicionar ao layout da aba
-        self.retirada_layout.addWidget(container)
+                self.container_layout.addWidget(loja_group)
+                self.sem_pontos_label.setVisible(False)
     
     def _criar_tabela_retirada(self, pontos_retirada):
         """Cria tabela de pontos de retirada"""
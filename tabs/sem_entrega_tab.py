@@ -7,6 +7,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt
 from config import *
+from retentativas import descrever_erro, ERRO_CIRCUITO
 
 
 class SemEntregaTab(QWidget):
@@ -15,6 +16,7 @@ class SemEntregaTab(QWidget):
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
+        self.sem_lojas_label = None
         self.init_ui()
     
     def init_ui(self):
@@ -63,28 +65,45 @@ class SemEntregaTab(QWidget):
     
     def popular_aba_sem_entrega(self, lojas_sem_entrega):
         """Popula a aba de lojas sem entrega com as informações das lojas"""
+        self.iniciar_aba_sem_entrega()
+        self.adicionar_lojas_sem_entrega(lojas_sem_entrega)
+    
+    def iniciar_aba_sem_entrega(self):
+        """Limpa a aba, pronta para receber resultados parciais"""
         # Limpar conteúdo anterior
         for i in reversed(range(self.sem_entrega_layout.count())): 
             widget = self.sem_entrega_layout.itemAt(i).widget()
             if widget is not None:
                 widget.deleteLater()
         
-        if not lojas_sem_entrega:
-            no_data_label = QLabel("Nenhuma loja sem entrega disponível")
-            no_data_label.setFont(QFont("Arial", 12))
-            no_data_label.setAlignment(Qt.AlignCenter)
-            no_data_label.setStyleSheet("color: #7f8c8d;")
-            self.sem_entrega_layout.addWidget(no_data_label)
-            return
+        # Mensagem exibida enquanto nenhuma loja sem entrega aparecer
+        self.sem_lojas_label = QLabel("Nenhuma loja sem entrega disponível")
+        self.sem_lojas_label.setFont(QFont("Arial", 12))
+        self.sem_lojas_label.setAlignment(Qt.AlignCenter)
+        self.sem_lojas_label.setStyleSheet("color: #7f8c8d;")
+        self.sem_entrega_layout.addWidget(self.sem_lojas_label)
         
         # Armazenar referência para os labels das lojas para filtragem
         self.labels_lojas_sem_entrega = []
+    
+    def adicionar_lojas_sem_entrega(self, lojas_sem_entrega):
+        """Acrescenta à lista as lojas sem entrega de um lote de resultados"""
+        if self.sem_lojas_label is None:
+            self.iniciar_aba_sem_entrega()
+        if lojas_sem_entrega:
+            self.sem_lojas_label.setVisible(False)
         
-        for loja, estoque in lojas_sem_entrega:
+        for loja, estoque, tipo_erro in lojas_sem_entrega:
             nome_loja = self.parent.formatar_nome_loja(loja)
             
             # Lógica de exibição
-            if estoque == 0:
+            if tipo_erro == ERRO_CIRCUITO:
+                texto = f"{nome_loja} - Ignorada: circuito aberto após falhas consecutivas da loja"
+                cor = "#8e44ad"  # Roxo
+            elif tipo_erro:
+                texto = f"{nome_loja} - Falha na consulta ({descrever_erro(tipo_erro)}), cobertura desconhecida"
+                cor = "#7f8c8d"  # Cinza
+            elif estoque == 0:
                 texto = f"{nome_loja} - Estoque Zerado (Estoque: {estoque} unidades)"
                 cor = "#e74c3c"  # Vermelho
             else:
@@ -101,6 +120,9 @@ class SemEntregaTab(QWidget):
             # Adicionar à lista de referências
             self.labels_lojas_sem_entrega.append(loja_label)
     
+            # Respeitar a pesquisa em andamento
+            self.filtrar_label(loja_label, self.pesquisa_sem_entrega.text().lower())
+    
     def filtrar_lojas_sem_entrega(self, texto):
         """Filtra as lojas sem entrega baseado no texto de pesquisa"""
         if not hasattr(self, 'labels_lojas_sem_entrega'):
@@ -108,25 +130,29 @@ class SemEntregaTab(QWidget):
             
         texto = texto.lower()
         for label in self.labels_lojas_sem_entrega:
-            # Obter o texto do label e o ID da loja
-            label_text = label.text().lower()
-            loja_id = label.property("loja_id")
+            self.filtrar_label(label, texto)
             
-            # Verificar se o texto é "nacional" para mostrar apenas lojas nacionais
-            if texto == "nacional":
-                # Verificar se é uma loja nacional
-                codigo = loja_id[-6:]  # Últimos 6 caracteres
-                codigo2 = loja_id[-10:]  # Últimos 10 caracteres
+    def filtrar_label(self, label, texto):
+        """Mostra ou esconde o label de uma loja conforme o texto de pesquisa"""
+        # Obter o texto do label e o ID da loja
+        label_text = label.text().lower()
+        loja_id = label.property("loja_id")
                 
-                # Verificar se está na lista de lojas nacionais
-                is_nacional = (codigo in self.parent.lojas_nacionais or 
-                              codigo2 in self.parent.lojas_nacionais or 
-                              loja_id in self.parent.lojas_nacionais)
+        # Verificar se o texto é "nacional" para mostrar apenas lojas nacionais
+        if texto == "nacional":
+            # Verificar se é uma loja nacional
+            codigo = loja_id[-6:]  # Últimos 6 caracteres
+            codigo2 = loja_id[-10:]  # Últimos 10 caracteres
                 
-                label.setVisible(is_nacional)
+            # Verificar se está na lista de lojas nacionais
+            is_nacional = (codigo in self.parent.lojas_nacionais or 
+                          codigo2 in self.parent.lojas_nacionais or 
+                          loja_id in self.parent.lojas_nacionais)
+            
+            label.setVisible(is_nacional)
+        else:
+            # Filtro normal por texto
+            if texto in label_text or texto in loja_id.lower():
+                label.setVisible(True)
             else:
-                # Filtro normal por texto
-                if texto in label_text or texto in loja_id.lower():
-                    label.setVisible(True)
-                else:
-                    label.setVisible(False)
+                label.setVisible(False)
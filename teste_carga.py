@@ -0,0 +1,224 @@
+"""
+Teste de carga dos motores de simulação e estoque contra o mock_vtex.py
+
+Sobe o mock em uma porta livre (ou usa um já em execução com --url-mock),
+aponta as lojas para ele e executa N lojas × M SKUs com o mesmo motor da
+interface, sem PySide6:
+
+    python teste_carga.py --lojas 500 --skus 3 --latencia lognormal:80:0.5
+    python teste_carga.py --lojas 500 --engine asyncio --taxa-429 0.05 --repeticoes 3
+    python teste_carga.py --modo estoque --lojas 1000 --json
+
+Relata tempo total, requisições/s, latência das requisições no mock
+(p50/p95/p99), tempo até o resultado de cada loja e erros por classe.
+
+Com o mock atendendo todas as lojas no mesmo host, os controles por host
+(limite de requisições por segundo e circuit breaker) valeriam para todas
+as lojas juntas; por isso ficam desligados, a menos que --taxa-por-host e
+--circuito-falhas sejam informados.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import urllib.request
+
+import simulacao
+from cache import configurar_caches, cache_politicas, cache_simulacoes, cache_estoque
+from transporte import get_transporte, configurar_transporte, workers_para_configuracao
+from motor_threads import MotorSimulacaoThreads, MotorEstoqueThreads
+from limitadores import percentil
+from mock_vtex import iniciar_mock, adicionar_argumentos_cenario, cenario_dos_argumentos
+
+
+CEP_TESTE = "05372-110"
+CONTA_PRINCIPAL = "principal"
+
+
+def _chamar_mock(url_base, caminho, metodo="GET"):
+    """Chama uma rota de controle do mock (/__mock/...)"""
+    raiz = url_base.split("/{conta}")[0]
+    requisicao = urllib.request.Request(raiz + caminho, data=b"" if metodo == "POST" else None, method=metodo)
+    with urllib.request.urlopen(requisicao, timeout=10) as resposta:
+        return json.loads(resposta.read())
+
+
+def _percentis_ms(valores):
+    return {f"p{p}": round(percentil(valores, p) * 1000, 1) for p in (50, 95, 99)}
+
+
+def configuracoes_do_teste(args):
+    """Configurações equivalentes às de empresa_config.json para o teste"""
+    return {
+        "max_workers": args.workers,
+        "timeout_requests": args.timeout,
+        "concorrencia_adaptativa": not args.sem_concorrencia_adaptativa,
+        "concorrencia_maxima": args.concorrencia_maxima,
+        "taxa_maxima_por_host": args.taxa_por_host,
+        "max_tentativas": args.max_tentativas,
+        "circuito_falhas": args.circuito_falhas,
+        "requisicoes_hedge": args.hedge,
+        "limite_conexoes_async": args.concorrencia_maxima,
+    }
+
+
+def executar_rodada(args, config, lojas, skus):
+    """Executa uma simulação (ou consulta de estoque) completa; retorna as medições"""
+    transporte = get_transporte(workers_para_configuracao(config))
+    tempos_lojas = []
+    erros = {}
+    inicio = time.monotonic()
+    
+    def ao_resultado(loja, data):
+        tempos_lojas.append(time.monotonic() - inicio)
+        for resultado in data.values():
+            tipo = resultado.get('error_type') if resultado else None
+            if tipo:
+                erros[tipo] = erros.get(tipo, 0) + 1
+    
+    if args.modo == "estoque":
+        for sku in skus:
+            motor = MotorEstoqueThreads(
+                sku, "mock", "mock", CONTA_PRINCIPAL, max_workers=workers_para_configuracao(config),
+                transporte=transporte, forcar_atualizacao=not args.com_cache
+            )
+            estoques = motor.executar(
+                lojas, ao_progresso=lambda *_: tempos_lojas.append(time.monotonic() - inicio)
+            )
+            for estoque in estoques.values():
+                if estoque.get('erro'):
+                    erros[estoque['erro']] = erros.get(estoque['erro'], 0) + 1
+    elif args.engine == "asyncio":
+        from motor_async import MotorSimulacaoAsync, motor_async_disponivel
+        if not motor_async_disponivel():
+            sys.exit("aiohttp não instalado - use --engine threads")
+        motor = MotorSimulacaoAsync(
+            CEP_TESTE, skus, "mock", "mock", CONTA_PRINCIPAL,
+            limite_conexoes=config["limite_conexoes_async"], timeout=transporte.timeout,
+            transporte=transporte, orcamento=transporte.novo_orcamento(),
+            forcar_atualizacao=not args.com_cache
+        )
+        asyncio.run(motor.executar(lojas, ao_resultado=ao_resultado))
+    else:
+        motor = MotorSimulacaoThreads(
+            CEP_TESTE, skus, "mock", "mock", CONTA_PRINCIPAL,
+            max_workers=workers_para_configuracao(config), transporte=transporte,
+            forcar_atualizacao=not args.com_cache
+        )
+        motor.executar(lojas, ao_resultado=ao_resultado)
+    
+    return time.monotonic() - inicio, tempos_lojas, erros
+
+
+def relatorio_rodada(duracao, tempos_lojas, erros, estatisticas_mock, total_lojas):
+    requisicoes = estatisticas_mock["requisicoes"]
+    return {
+        "tempo_total_s": round(duracao, 3),
+        "lojas_concluidas": len(tempos_lojas),
+        "lojas_total": total_lojas,
+        "requisicoes": requisicoes,
+        "requisicoes_por_s": round(requisicoes / duracao, 1) if duracao else 0.0,
+        "latencia_requisicao_ms": estatisticas_mock["latencia_ms"],
+        "tempo_ate_resultado_loja_ms": _percentis_ms(tempos_lojas),
+        "respostas_mock": estatisticas_mock["contagem"],
+        "erros": erros,
+    }
+
+
+def imprimir_relatorio(numero, relatorio):
+    latencia = relatorio["latencia_requisicao_ms"]
+    lojas = relatorio["tempo_ate_resultado_loja_ms"]
+    print(f"Rodada {numero}:")
+    print(f"  tempo total        {relatorio['tempo_total_s']:.2f} s "
+          f"({relatorio['lojas_concluidas']}/{relatorio['lojas_total']} lojas)")
+    print(f"  requisições        {relatorio['requisicoes']} ({relatorio['requisicoes_por_s']:.1f}/s)")
+    print(f"  latência (mock)    p50 {latencia['p50']} ms | p95 {latencia['p95']} ms | p99 {latencia['p99']} ms")
+    print(f"  resultado por loja p50 {lojas['p50']} ms | p95 {lojas['p95']} ms | p99 {lojas['p99']} ms")
+    if relatorio["erros"]:
+        print("  erros              " + ", ".join(f"{tipo}: {n}" for tipo, n in sorted(relatorio["erros"].items())))
+    status = ", ".join(f"{chave}: {n}" for chave, n in sorted(relatorio["respostas_mock"].items()))
+    print(f"  respostas do mock  {status}")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="teste_carga.py",
+        description="Mede o desempenho dos motores contra o servidor mock da VTEX"
+    )
+    parser.add_argument("--lojas", type=int, default=200, help="Número de lojas (N)")
+    parser.add_argument("--skus", type=int, default=1, help="SKUs por simulação (M)")
+    parser.add_argument("--modo", choices=["simulacao", "estoque"], default="simulacao",
+                        help="Simulação de frete ou consulta de estoque (um SKU por vez)")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads", help="Motor da simulação")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Rodadas seguidas (as conexões continuam abertas)")
+    parser.add_argument("--com-cache", action="store_true",
+                        help="Manter os caches entre as rodadas (padrão: toda rodada consulta o mock)")
+    parser.add_argument("--workers", type=int, default=20, help="max_workers")
+    parser.add_argument("--concorrencia-maxima", type=int, default=100, help="concorrencia_maxima")
+    parser.add_argument("--sem-concorrencia-adaptativa", action="store_true", help="Usar só max_workers")
+    parser.add_argument("--taxa-por-host", type=int, default=0, help="taxa_maxima_por_host (0 = sem limite)")
+    parser.add_argument("--circuito-falhas", type=int, default=0, help="circuito_falhas (0 = desligado)")
+    parser.add_argument("--max-tentativas", type=int, default=3, help="max_tentativas")
+    parser.add_argument("--hedge", action="store_true", help="Ativar requisições hedge")
+    parser.add_argument("--timeout", type=float, default=10, help="timeout_requests em segundos")
+    parser.add_argument("--url-mock", help='Mock já em execução, ex.: "http://127.0.0.1:8800/{conta}"')
+    parser.add_argument("--json", action="store_true", help="Imprimir o relatório em JSON")
+    adicionar_argumentos_cenario(parser)
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.modo == "estoque" and args.engine == "asyncio":
+        parser.error("a consulta de estoque só tem o motor de threads")
+    
+    if args.url_mock:
+        url_base = args.url_mock
+    else:
+        try:
+            cenario = cenario_dos_argumentos(args)
+        except ValueError as e:
+            parser.error(str(e))
+        _, url_base = iniciar_mock(cenario)
+    simulacao.URL_BASE_VTEX = url_base
+    
+    config = configuracoes_do_teste(args)
+    configurar_caches(config)
+    configurar_transporte(config)
+    
+    lojas = [f"loja{i:05d}" for i in range(args.lojas)]
+    skus = [str(100000 + i) for i in range(args.skus)]
+    
+    if not args.json:
+        print(f"{args.modo}: {len(lojas)} lojas × {len(skus)} SKU(s), motor {args.engine}, mock em {url_base}")
+    
+    relatorios = []
+    for numero in range(1, args.repeticoes + 1):
+        if not args.com_cache:
+            for cache in (cache_politicas, cache_simulacoes, cache_estoque):
+                cache.invalidar()
+        _chamar_mock(url_base, "/__mock/zerar", "POST")
+        duracao, tempos_lojas, erros = executar_rodada(args, config, lojas, skus)
+        estatisticas = _chamar_mock(url_base, "/__mock/estatisticas")
+        # Na consulta de estoque, cada SKU é uma passada completa pelas lojas
+        total = len(lojas) * (len(skus) if args.modo == "estoque" else 1)
+        relatorio = relatorio_rodada(duracao, tempos_lojas, erros, estatisticas, total)
+        relatorios.append(relatorio)
+        if not args.json:
+            imprimir_relatorio(numero, relatorio)
+    
+    if args.json:
+        print(json.dumps({
+            "modo": args.modo,
+            "engine": args.engine,
+            "lojas": len(lojas),
+            "skus": len(skus),
+            "rodadas": relatorios,
+        }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,199 +1,293 @@
 """
 Classes de thread para processamento paralelo
 """
-import requests
+import asyncio
 import concurrent.futures
+import threading
 from PySide6.QtCore import QThread, Signal
+from transporte import get_transporte
+from simulacao import (
+    HEADERS_PUBLICOS, url_conta, seller_da_loja, montar_payload_simulacao, filtrar_slas_ativas
+)
+from retentativas import FalhaRequisicao, ERRO_CANCELADO
+from utils import resumir_entrega
+from metricas import MetricasExecucao, ENDPOINT_SIMULACAO
+from rastreamento import rastrear
+from motor_threads import MotorSimulacaoThreads, MotorEstoqueThreads, aguardar_concluidos
+from motor_async import MotorSimulacaoAsync, motor_async_disponivel
+
+
+# Intervalo entre os lotes de resultados parciais enviados à interface
+INTERVALO_RESULTADOS_PARCIAIS = 0.1
+
+
+class LoteResultados:
+    """Agrupa resultados por loja e os entrega em lotes a cada intervalo
+    
+    O primeiro resultado de um lote agenda a entrega; os que chegam até lá
+    vão juntos. Assim a interface recebe poucos sinais mesmo com centenas
+    de lojas, e um resultado isolado nunca espera mais que o intervalo.
+    """
+    
+    def __init__(self, entregar, intervalo=INTERVALO_RESULTADOS_PARCIAIS):
+        self.entregar = entregar
+        self.intervalo = intervalo
+        self._lote = {}
+        self._timer = None
+        self._lock = threading.Lock()
+    
+    def adicionar(self, loja, resultado):
+        with self._lock:
+            self._lote[loja] = resultado
+            if self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self.esvaziar)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def esvaziar(self):
+        """Entrega o lote pendente imediatamente"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            lote, self._lote = self._lote, {}
+            # Entregar ainda com o lock mantém a ordem dos lotes
+            if lote:
+                self.entregar(lote)
 
 
 class SimulacaoThread(QThread):
     result_signal = Signal(dict)
+    # Lotes {loja: resultado} do primeiro SKU, emitidos durante a execução
+    resultado_parcial_signal = Signal(dict)
+    result_multi_signal = Signal(dict)
     error_signal = Signal(str)
     status_signal = Signal(str, str)
     progress_signal = Signal(int, int)
+    # MetricasExecucao das requisições, emitida ao fim de cada execução
+    metricas_signal = Signal(object)
     
-    def __init__(self, cep, lojas, sku, app_key, app_token, conta_principal, max_workers=20):
+    def __init__(self, cep, lojas, sku, app_key, app_token, conta_principal, max_workers=20,
+                 engine="threads", limite_async=200, forcar_atualizacao=False, rastreador=None):
         super().__init__()
         self.cep = cep
         self.lojas = lojas
-        self.sku = sku
+        # sku pode ser um único SKU ou uma lista (modo multi-SKU)
+        self.skus = [sku] if isinstance(sku, str) else list(sku)
+        self.sku = self.skus[0]
         self.app_key = app_key
         self.app_token = app_token
         self.conta_principal = conta_principal
         self.max_workers = max_workers
+        self.engine = engine
+        self.limite_async = limite_async
+        self.forcar_atualizacao = forcar_atualizacao
+        self.transporte = get_transporte(max_workers)
+        self.orcamento = self.transporte.novo_orcamento()
+        self.cancelamento = threading.Event()
+        self.metricas = MetricasExecucao()
+        # Rastreador opcional (rastreamento.py), gravado ao fim de cada execução
+        self.rastreador = rastreador
+        self.motor = MotorSimulacaoThreads(
+            cep, self.skus, app_key, app_token, conta_principal, max_workers,
+            transporte=self.transporte, orcamento=self.orcamento,
+            forcar_atualizacao=forcar_atualizacao, cancelamento=self.cancelamento, metricas=self.metricas,
+            rastreador=rastreador
+        )
         self.resultados = {}
+        self.resultados_por_sku = {sku: {} for sku in self.skus}
+        self.lote_parcial = LoteResultados(self.resultado_parcial_signal.emit)
+    
+    def cancelar(self):
+        """Pede o fim da execução; os resultados já coletados são emitidos como parciais"""
+        self.cancelamento.set()
+    
+    @property
+    def cancelada(self):
+        return self.cancelamento.is_set()
     
     def run(self):
         try:
             total = len(self.lojas)
             self.status_signal.emit(f"Iniciando simulação para {total} lojas...", "black")
             
-            # Usar ThreadPoolExecutor para processamento paralelo
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Criar lista de futures
-                future_to_loja = {
-                    executor.submit(self.simular_frete, loja): loja
+            if self.engine == "asyncio" and not motor_async_disponivel():
+                self.status_signal.emit("aiohttp não instalado - usando motor de threads", "red")
+                self.engine = "threads"
+            
+            with rastrear(self.rastreador, "execucao", cep=self.cep, lojas=total,
+                          skus=",".join(self.skus), engine=self.engine):
+                if self.engine == "asyncio":
+                    self._executar_asyncio()
+                else:
+                    self._executar_threads()
+            
+            self.lote_parcial.esvaziar()
+            self.resultados = self.resultados_por_sku[self.sku]
+            if len(self.skus) > 1:
+                self.result_multi_signal.emit(self.resultados_por_sku)
+            else:
+                self.result_signal.emit(self.resultados)
+        except Exception as e:
+            self.error_signal.emit(f"Ocorreu um erro geral: {str(e)}")
+        finally:
+            self.metricas_signal.emit(self.metricas)
+            self._salvar_rastreamento()
+    
+    def _salvar_rastreamento(self):
+        if self.rastreador is None:
+            return
+        try:
+            caminho = self.rastreador.salvar()
+            self.status_signal.emit(f"Rastreamento da execução salvo em {caminho}", "green")
+        except OSError as e:
+            self.error_signal.emit(f"Erro ao salvar o rastreamento: {str(e)}")
+    
+    def _executar_threads(self):
+        self.motor.executar(
+            self.lojas,
+            ao_progresso=self.progress_signal.emit,
+            ao_erro=lambda loja, e: self.error_signal.emit(f"Erro na loja {loja}: {str(e)}"),
+            ao_resultado=self._registrar_resultado
+        )
+    
+    def _executar_asyncio(self):
+        motor = MotorSimulacaoAsync(
+            self.cep, self.skus, self.app_key, self.app_token, self.conta_principal,
+            limite_conexoes=self.limite_async, timeout=self.transporte.timeout,
+            transporte=self.transporte, orcamento=self.orcamento,
+            forcar_atualizacao=self.forcar_atualizacao, cancelamento=self.cancelamento,
+            metricas=self.metricas, rastreador=self.rastreador
+        )
+        # Um único event loop nesta QThread mantém todas as requisições em voo
+        asyncio.run(motor.executar(
+            self.lojas,
+            ao_progresso=self.progress_signal.emit,
+            ao_erro=lambda loja, e: self.error_signal.emit(f"Erro na loja {loja}: {str(e)}"),
+            ao_resultado=self._registrar_resultado
+        ))
+    
+    def _registrar_resultado(self, loja, data):
+        """Distribui o resultado {sku: resultado} da loja por SKU"""
+        for sku, resultado in (data or {}).items():
+            # Chamadas interrompidas pelo cancelamento não são resultado da loja
+            if resultado and resultado.get('error_type') != ERRO_CANCELADO:
+                self.resultados_por_sku[sku][loja] = resultado
+                if sku == self.sku:
+                    self.lote_parcial.adicionar(loja, resultado)
+    
+    def get_shipping_policies(self, loja):
+        return self.motor.get_shipping_policies(loja)
+    
+    def simular_frete(self, loja):
+        return self.motor.simular_frete(loja)
+
+
+class MatrizThread(SimulacaoThread):
+    """Simula cada loja selecionada contra cada CEP de uma lista (matriz CEP × loja)"""
+    
+    def __init__(self, ceps, lojas, sku, app_key, app_token, conta_principal, max_workers=20):
+        super().__init__(ceps[0], lojas, sku, app_key, app_token, conta_principal, max_workers)
+        self.ceps = ceps
+        self.politicas = {}
+    
+    def run(self):
+        try:
+            total = len(self.ceps) * len(self.lojas)
+            self.status_signal.emit(
+                f"Iniciando matriz de {len(self.ceps)} CEPs × {len(self.lojas)} lojas...", "black"
+            )
+            
+            celulas = {cep: {} for cep in self.ceps}
+            
+            # O mesmo pool limita a concorrência global de todas as simulações
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                # 1. Políticas ativas uma única vez por loja (valem para todos os CEPs)
+                future_to_loja = {executor.submit(self._politicas_ou_falha, loja): loja for loja in self.lojas}
+                for future in aguardar_concluidos(future_to_loja, self.cancelamento):
+                    self.politicas[future_to_loja[future]] = future.result()
+                
+                # 2. Uma simulação por par (CEP, loja)
+                future_to_par = {} if self.cancelada else {
+                    executor.submit(self.simular_celula, loja, cep): (cep, loja)
+                    for cep in self.ceps
                     for loja in self.lojas
                 }
                 
-                # Processar resultados conforme ficam prontos
-                for idx, future in enumerate(concurrent.futures.as_completed(future_to_loja)):
-                    loja = future_to_loja[future]
+                for idx, future in enumerate(aguardar_concluidos(future_to_par, self.cancelamento)):
+                    cep, loja = future_to_par[future]
                     try:
-                        data = future.result()
-                        if data:
-                            self.resultados[loja] = data
+                        celula = future.result()
                     except Exception as e:
-                        self.error_signal.emit(f"Erro na loja {loja}: {str(e)}")
+                        celula = {'disponivel': False, 'preco': None, 'prazo_dias': None, 'erro': str(e)}
+                    # Simulação interrompida pelo cancelamento não é resultado da célula
+                    if celula.get('tipo_erro') != ERRO_CANCELADO:
+                        celulas[cep][loja] = celula
                     
                     # Atualizar progresso
                     self.progress_signal.emit(idx + 1, total)
+            finally:
+                # Cancelada, a matriz não espera as simulações em voo
+                executor.shutdown(wait=not self.cancelada, cancel_futures=True)
             
-            self.result_signal.emit(self.resultados)
+            # Cancelada, só as células já simuladas vão para a grade
+            self.result_signal.emit({
+                'sku': self.sku,
+                'ceps': self.ceps,
+                'lojas': self.lojas,
+                'celulas': celulas
+            })
         except Exception as e:
             self.error_signal.emit(f"Ocorreu um erro geral: {str(e)}")
+        finally:
+            self.metricas.concluir()
+            self.metricas_signal.emit(self.metricas)
     
-    def get_shipping_policies(self, loja):
-        # Usar conta principal configurada
-        conta_principal = self.conta_principal
-        if loja == conta_principal:
-            url = f"https://{conta_principal}.vtexcommercestable.com.br/api/logistics/pvt/shipping-policies"
-        else:
-            url = f"https://{loja}.vtexcommercestable.com.br/api/logistics/pvt/shipping-policies"
-        
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-VTEX-API-AppKey": self.app_key,
-            "X-VTEX-API-AppToken": self.app_token,
-        }
-        
+    def _politicas_ou_falha(self, loja):
         try:
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                policies = response.json()
-                # Filtrar políticas ativas
-                active_policies = {}
-                for policy in policies.get('items', []):
-                    if policy.get('isActive', False):
-                        active_policies[policy['id']] = policy
-                return active_policies
-            else:
-                return {}
-        except:
-            return {}
+            return self.get_shipping_policies(loja)
+        except FalhaRequisicao as e:
+            return e
     
-    def get_inventory(self, loja, seller, sku):
-        # Usar conta principal configurada
-        conta_principal = self.conta_principal
-        if loja == conta_principal:
-            url = f"https://{conta_principal}.vtexcommercestable.com.br/api/logistics/pvt/inventory/skus/{sku}"
-        else:
-            url = f"https://{loja}.vtexcommercestable.com.br/api/logistics/pvt/inventory/skus/{sku}"
+    def simular_celula(self, loja, cep):
+        """Simula um par (loja, CEP) e resume na melhor SLA (preço, prazo e transportadora) e disponibilidade"""
+        politicas = self.politicas.get(loja, {})
+        if isinstance(politicas, FalhaRequisicao):
+            return self._celula_erro(politicas, "Falha ao consultar políticas de envio: ")
         
-        params = {'sellerId': seller}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-VTEX-API-AppKey": self.app_key,
-            "X-VTEX-API-AppToken": self.app_token,
-        }
+        seller = seller_da_loja(loja, self.conta_principal)
+        url = url_conta(loja, self.conta_principal, "/api/checkout/pub/orderForms/simulation")
+        payload = montar_payload_simulacao([self.sku], seller, cep)
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
-        except:
-            return None
-    
-    def simular_frete(self, loja):
-        # Determinar seller baseado na loja
-        conta_principal = self.conta_principal
-        seller = "1" if loja == conta_principal else loja
+            simulation_data = self.transporte.requisitar_json(
+                "POST", url, headers=HEADERS_PUBLICOS, json=payload, orcamento=self.orcamento,
+                cancelamento=self.cancelamento, medicao=self.metricas.medicao(ENDPOINT_SIMULACAO, loja)
+            )
+        except FalhaRequisicao as e:
+            return self._celula_erro(e)
         
-        # 1. Obter políticas de envio ativas
-        active_policies = self.get_shipping_policies(loja)
-        
-        # 2. Simular a ordem
-        if loja == conta_principal:
-            url = f"https://{conta_principal}.vtexcommercestable.com.br/api/checkout/pub/orderForms/simulation"
-        else:
-            url = f"https://{loja}.vtexcommercestable.com.br/api/checkout/pub/orderForms/simulation"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
-        payload = {
-            "items": [
-                {
-                    "id": self.sku,
-                    "quantity": 1,
-                    "seller": seller
-                }
-            ],
-            "postalCode": self.cep.replace('-', ''),
-            "country": "BRA"
+        return resumir_entrega(filtrar_slas_ativas(simulation_data, politicas))
+    
+    @staticmethod
+    def _celula_erro(falha, prefixo=""):
+        return {
+            'disponivel': False, 'preco': None, 'prazo_dias': None,
+            'erro': f"{prefixo}{str(falha)}", 'tipo_erro': falha.tipo
         }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
-            
-            if response.status_code == 200:
-                simulation_data = response.json()
-                
-                # 3. Filtrar SLAs: apenas as que pertencem às políticas ativas
-                if 'logisticsInfo' in simulation_data and simulation_data['logisticsInfo']:
-                    for logistics in simulation_data['logisticsInfo']:
-                        filtered_slas = []
-                        for sla in logistics.get('slas', []):
-                            # Verificar cada deliveryId na SLA
-                            include_sla = False
-                            for delivery in sla.get('deliveryIds', []):
-                                courier_id = delivery.get('courierId')
-                                if courier_id in active_policies:
-                                    include_sla = True
-                                    break
-                            if include_sla:
-                                filtered_slas.append(sla)
-                        logistics['slas'] = filtered_slas
-                
-                # 4. Obter estoque
-                inventory_data = self.get_inventory(loja, seller, self.sku)
-                
-                # Retornar dados completos
-                return {
-                    "simulation": simulation_data,
-                    "active_policies": active_policies,
-                    "inventory": inventory_data
-                }
-            else:
-                # Retornar estrutura de erro
-                return {
-                    "simulation": None,
-                    "active_policies": active_policies,
-                    "inventory": None,
-                    "error": f"Erro na API: Status {response.status_code}"
-                }
-        except Exception as e:
-            return {
-                "simulation": None,
-                "active_policies": active_policies,
-                "inventory": None,
-                "error": f"Erro de conexão: {str(e)}"
-            }
 
 
 class EstoqueThread(QThread):
     result_signal = Signal(dict)
+    cache_signal = Signal(dict)
     error_signal = Signal(str)
     status_signal = Signal(str, str)
     progress_signal = Signal(int, int)
+    metricas_signal = Signal(object)
     
-    def __init__(self, sku, lojas, app_key, app_token, conta_principal, max_workers=20):
+    def __init__(self, sku, lojas, app_key, app_token, conta_principal, max_workers=20,
+                 revalidar_em_segundo_plano=False):
         super().__init__()
         self.sku = sku
         self.lojas = lojas
@@ -201,81 +295,47 @@ class EstoqueThread(QThread):
         self.app_token = app_token
         self.conta_principal = conta_principal
         self.max_workers = max_workers
+        self.transporte = get_transporte(max_workers)
+        self.orcamento = self.transporte.novo_orcamento()
+        self.revalidar_em_segundo_plano = revalidar_em_segundo_plano
+        self.cancelamento = threading.Event()
+        self.metricas = MetricasExecucao()
+        self.motor = MotorEstoqueThreads(
+            sku, app_key, app_token, conta_principal, max_workers=max_workers,
+            transporte=self.transporte, orcamento=self.orcamento, cancelamento=self.cancelamento,
+            metricas=self.metricas
+        )
         self.resultados = {}
     
+    def cancelar(self):
+        """Pede o fim da consulta; o estoque já coletado é emitido como parcial"""
+        self.cancelamento.set()
+    
+    @property
+    def cancelada(self):
+        return self.cancelamento.is_set()
+    
     def run(self):
         try:
             total = len(self.lojas)
+            
+            # Stale-while-revalidate: exibir na hora o que já está em cache
+            # (mesmo expirado) e atualizar em seguida
+            if self.revalidar_em_segundo_plano:
+                em_cache = self.motor.estoque_em_cache(self.lojas)
+                if em_cache:
+                    self.cache_signal.emit(em_cache)
+            
             self.status_signal.emit(f"Iniciando consulta de estoque para {total} lojas...", "black")
             
-            # Usar ThreadPoolExecutor para processamento paralelo
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Criar lista de futures
-                future_to_loja = {
-                    executor.submit(self.get_inventory_for_loja, loja): loja
-                    for loja in self.lojas
-                }
-                
-                # Processar resultados conforme ficam prontos
-                for idx, future in enumerate(concurrent.futures.as_completed(future_to_loja)):
-                    loja = future_to_loja[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            self.resultados[result['loja']] = result['estoque_data']
-                    except Exception as e:
-                        self.error_signal.emit(f"Erro na loja {loja}: {str(e)}")
-                    
-                    # Atualizar progresso
-                    self.progress_signal.emit(idx + 1, total)
+            self.resultados = self.motor.executar(
+                self.lojas,
+                ao_progresso=self.progress_signal.emit,
+                ao_erro=lambda loja, e: self.error_signal.emit(f"Erro na loja {loja}: {str(e)}")
+            )
             
             self.result_signal.emit(self.resultados)
         except Exception as e:
             self.error_signal.emit(f"Erro geral: {str(e)}")
-    
-    def get_inventory_for_loja(self, loja):
-        conta_principal = self.conta_principal
-        seller = "1" if loja == conta_principal else loja
-        inventory_data = self.get_inventory(loja, seller, self.sku)
-        estoque_data = {'total': 0, 'principal': 0}
-        
-        if inventory_data:
-            total_estoque = 0
-            estoque_principal = 0
-            for warehouse in inventory_data.get('balance', []):
-                quantidade = warehouse.get('totalQuantity', 0)
-                total_estoque += quantidade
-                if warehouse.get('warehouseId') == '1_1':
-                    estoque_principal = quantidade
-            
-            estoque_data = {
-                'total': total_estoque,
-                'principal': estoque_principal
-            }
-        
-        return {'loja': loja, 'estoque_data': estoque_data}
-    
-    def get_inventory(self, loja, seller, sku):
-        # Usar conta principal configurada
-        conta_principal = self.conta_principal
-        if loja == conta_principal:
-            url = f"https://{conta_principal}.vtexcommercestable.com.br/api/logistics/pvt/inventory/skus/{sku}"
-        else:
-            url = f"https://{loja}.vtexcommercestable.com.br/api/logistics/pvt/inventory/skus/{sku}"
-        
-        params = {'sellerId': seller}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "X-VTEX-API-AppKey": self.app_key,
-            "X-VTEX-API-AppToken": self.app_token,
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return None
-        except:
-            return None
+        finally:
+            self.metricas_signal.emit(self.metricas)
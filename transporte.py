@@ -0,0 +1,538 @@
+"""
+Camada de transporte HTTP compartilhada pelas threads de consulta à VTEX
+"""
+import asyncio
+import concurrent.futures
+import copy
+import io
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import MAX_WORKERS
+from limitadores import (
+    LimitadorAdaptativo, LimitadorTaxaPorHost, ControleHedge, DisjuntoresPorHost, CircuitoAberto
+)
+from cassete import MODO_REPRODUZIR, ErroCassete, ForaDoCassete, configurar_cassete, headers_da_entrada
+from retentativas import (
+    PoliticaRetentativas, OrcamentoRetentativas, FalhaRequisicao, MAX_TENTATIVAS_PADRAO,
+    ORCAMENTO_RETENTATIVAS_PADRAO, ERRO_TIMEOUT, ERRO_CONEXAO, ERRO_RESPOSTA, ERRO_CANCELADO,
+    INTERVALO_CANCELAMENTO, tipo_erro_status, status_repetivel, verificar_cancelamento
+)
+
+
+TIMEOUT_PADRAO = 10
+TAXA_POR_HOST_PADRAO = 20
+
+
+def chave_requisicao(metodo, url, params=None, corpo=None):
+    """Identifica requisições idênticas (método, URL, parâmetros e corpo JSON)"""
+    return (
+        metodo.upper(),
+        url,
+        tuple(sorted((params or {}).items())),
+        json.dumps(corpo, sort_keys=True) if corpo is not None else None,
+    )
+
+
+# Resultado entregue às chamadas que aguardavam uma execução cancelada:
+# elas não foram canceladas e precisam fazer a própria requisição
+_REPETIR = object()
+
+
+def _cancelamento(excecao):
+    return isinstance(excecao, asyncio.CancelledError) or (
+        isinstance(excecao, FalhaRequisicao) and excecao.tipo == ERRO_CANCELADO
+    )
+
+
+def _medir_compartilhada(medicao, inicio, excecao=None):
+    """Registra a chamada atendida pela requisição idêntica em voo (sem ir à rede)"""
+    if medicao is not None:
+        status = 200 if excecao is None else None
+        medicao(status, 0, time.monotonic() - inicio, getattr(excecao, "tipo", None), compartilhada=True)
+
+
+def _aguardar_em_voo(futuro, cancelamento):
+    """Resultado da chamada em voo, verificando o cancelamento de quem espera"""
+    if cancelamento is None:
+        return futuro.result()
+    while True:
+        verificar_cancelamento(cancelamento)
+        concluidos, _ = concurrent.futures.wait([futuro], timeout=INTERVALO_CANCELAMENTO)
+        if concluidos:
+            return futuro.result()
+
+
+class ChamadasEmVoo:
+    """Single-flight: chamadas idênticas simultâneas compartilham uma única requisição
+    
+    A primeira chamada de uma chave executa a requisição; as que chegam
+    enquanto ela está em voo esperam e recebem uma cópia do mesmo
+    resultado (ou a mesma FalhaRequisicao). Vale para as threads e para o
+    motor asyncio, inclusive entre execuções diferentes.
+    """
+    
+    def __init__(self, ativo=True):
+        self.ativo = ativo
+        self.compartilhadas = 0
+        self._futuros = {}
+        self._lock = threading.Lock()
+    
+    def _entrar(self, chave):
+        """Futuro da chamada em voo da chave e se o chamador é quem vai executá-la"""
+        with self._lock:
+            futuro = self._futuros.get(chave)
+            if futuro is not None:
+                self.compartilhadas += 1
+                return futuro, False
+            futuro = concurrent.futures.Future()
+            self._futuros[chave] = futuro
+            return futuro, True
+    
+    def _concluir(self, chave, futuro, resultado=None, excecao=None):
+        with self._lock:
+            del self._futuros[chave]
+        if _cancelamento(excecao):
+            futuro.set_result(_REPETIR)
+        elif excecao is not None:
+            futuro.set_exception(excecao)
+        else:
+            futuro.set_result(resultado)
+    
+    def executar(self, chave, funcao, medicao=None, cancelamento=None):
+        """Executa funcao() ou aguarda a chamada idêntica que já está em voo
+        
+        Quem aguarda registra a espera em medicao(..., compartilhada=True) e,
+        com o evento cancelamento ativado, desiste sem esperar a requisição
+        (levanta FalhaRequisicao(ERRO_CANCELADO)).
+        """
+        if not self.ativo:
+            return funcao()
+        futuro, lider = self._entrar(chave)
+        while not lider:
+            inicio = time.monotonic()
+            try:
+                resultado = _aguardar_em_voo(futuro, cancelamento)
+            except Exception as e:
+                if not _cancelamento(e):
+                    _medir_compartilhada(medicao, inicio, e)
+                raise
+            if resultado is not _REPETIR:
+                _medir_compartilhada(medicao, inicio)
+                # O resultado é JSON; cada chamador recebe a sua cópia para poder alterá-lo
+                return copy.deepcopy(resultado)
+            futuro, lider = self._entrar(chave)
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            self._concluir(chave, futuro, excecao=e)
+            raise
+        self._concluir(chave, futuro, resultado)
+        return resultado
+    
+    async def executar_async(self, chave, funcao, medicao=None):
+        """Versão para corrotinas: await funcao() ou aguarda a chamada em voo"""
+        if not self.ativo:
+            return await funcao()
+        futuro, lider = self._entrar(chave)
+        while not lider:
+            inicio = time.monotonic()
+            try:
+                resultado = await asyncio.wrap_future(futuro)
+            except Exception as e:
+                _medir_compartilhada(medicao, inicio, e)
+                raise
+            if resultado is not _REPETIR:
+                _medir_compartilhada(medicao, inicio)
+                return copy.deepcopy(resultado)
+            futuro, lider = self._entrar(chave)
+        try:
+            resultado = await funcao()
+        except BaseException as e:
+            self._concluir(chave, futuro, excecao=e)
+            raise
+        self._concluir(chave, futuro, resultado)
+        return resultado
+
+
+class TransporteVTEX:
+    """Mantém um pool de conexões keep-alive por host de conta VTEX"""
+    
+    def __init__(self, pool_size=MAX_WORKERS, timeout=TIMEOUT_PADRAO):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.limitador = LimitadorAdaptativo(limite_inicial=pool_size)
+        self.limitador_taxa = LimitadorTaxaPorHost(TAXA_POR_HOST_PADRAO)
+        self.retentativas = PoliticaRetentativas()
+        self.orcamento_retentativas = ORCAMENTO_RETENTATIVAS_PADRAO
+        self.hedge = ControleHedge()
+        self.disjuntores = DisjuntoresPorHost()
+        self.chamadas_em_voo = ChamadasEmVoo()
+        # Gravador ou reprodutor de cassete (cassete.py), quando ativado na configuração
+        self.cassete = None
+        self._executor_hedge = None
+        self._sessoes = {}
+        # Sessões e pool de hedge substituídos por ajustar_pool: só são
+        # fechados quando nenhuma requisição estiver em voo
+        self._aposentados = []
+        self._em_voo = 0
+        self._lock = threading.Lock()
+    
+    def _criar_sessao(self):
+        """Cria uma sessão com adapter dimensionado para o número de workers"""
+        sessao = requests.Session()
+        # Um único pool por sessão (cada sessão atende um host) com
+        # conexões suficientes para todos os workers simultâneos
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        sessao.mount("https://", adapter)
+        sessao.mount("http://", adapter)
+        return sessao
+    
+    def _sessao(self, url):
+        """Retorna a sessão do host da URL, criando-a na primeira chamada"""
+        host = urlsplit(url).hostname
+        with self._lock:
+            sessao = self._sessoes.get(host)
+            if sessao is None:
+                sessao = self._criar_sessao()
+                self._sessoes[host] = sessao
+            return sessao
+    
+    def ajustar_pool(self, pool_size):
+        """Redimensiona os pools quando o número de workers aumenta"""
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            self.pool_size = pool_size
+            # As novas sessões já nascem com o pool maior; as antigas ainda
+            # podem estar em uso por uma execução iniciada antes do ajuste
+            self._aposentados.extend(self._sessoes.values())
+            if self._executor_hedge is not None:
+                self._aposentados.append(self._executor_hedge)
+            self._sessoes = {}
+            self._executor_hedge = None
+            aposentados = self._retirar_aposentados()
+        _fechar_recursos(aposentados)
+    
+    def _retirar_aposentados(self):
+        """Recursos aposentados que já podem ser fechados (chamado com o lock)"""
+        if self._em_voo:
+            return []
+        aposentados, self._aposentados = self._aposentados, []
+        return aposentados
+    
+    def _entrar_em_voo(self):
+        with self._lock:
+            self._em_voo += 1
+    
+    def _sair_de_voo(self):
+        with self._lock:
+            self._em_voo -= 1
+            aposentados = self._retirar_aposentados()
+        _fechar_recursos(aposentados)
+    
+    def novo_orcamento(self):
+        """Orçamento de retentativas para uma execução (simulação, matriz ou estoque)"""
+        return OrcamentoRetentativas(self.orcamento_retentativas)
+    
+    def requisitar(self, metodo, url, orcamento=None, cancelamento=None, **kwargs):
+        """Executa a requisição reutilizando a conexão do host
+        
+        Timeouts, falhas de conexão, 5xx e 429 são repetidos com backoff
+        enquanto houver tentativas e orçamento; os 429 também respeitam o
+        Retry-After do host. Com o circuito do host aberto, levanta
+        CircuitoAberto sem enviar nada. Com o evento cancelamento ativo,
+        levanta FalhaRequisicao(ERRO_CANCELADO) antes de cada tentativa.
+        """
+        self._entrar_em_voo()
+        try:
+            kwargs.setdefault("timeout", self.timeout)
+            host = urlsplit(url).hostname
+            balde = self.limitador_taxa.balde(host)
+            
+            tentativa = 0
+            while True:
+                verificar_cancelamento(cancelamento)
+                try:
+                    response = self._enviar_com_hedge(balde, host, metodo, url, **kwargs)
+                except (requests.Timeout, requests.ConnectionError):
+                    if not self.retentativas.pode_repetir(tentativa, orcamento):
+                        raise
+                except CircuitoAberto as e:
+                    if not e.em_sondagem or not self.retentativas.pode_repetir(tentativa, orcamento):
+                        raise
+                else:
+                    if not status_repetivel(response.status_code):
+                        return response
+                    if not self.retentativas.pode_repetir(tentativa, orcamento):
+                        return response
+                    if response.status_code == 429:
+                        self.limitador_taxa.registrar_429(host, response.headers)
+                    response.close()
+                
+                espera = 0 if self.cassete is not None and self.cassete.sem_espera else self.retentativas.espera(tentativa)
+                if cancelamento is not None:
+                    cancelamento.wait(espera)
+                else:
+                    time.sleep(espera)
+                tentativa += 1
+        finally:
+            self._sair_de_voo()
+    
+    def requisitar_json(self, metodo, url, **kwargs):
+        """Retorna o JSON de uma resposta 200 ou levanta FalhaRequisicao classificada
+        
+        Chamadas idênticas simultâneas (de qualquer thread) compartilham a
+        mesma requisição HTTP.
+        """
+        chave = chave_requisicao(metodo, url, kwargs.get("params"), kwargs.get("json"))
+        return self.chamadas_em_voo.executar(
+            chave, lambda: self._requisitar_json(metodo, url, **kwargs), kwargs.get("medicao"),
+            kwargs.get("cancelamento")
+        )
+    
+    def _requisitar_json(self, metodo, url, **kwargs):
+        try:
+            response = self.requisitar(metodo, url, **kwargs)
+        except requests.Timeout as e:
+            raise FalhaRequisicao(ERRO_TIMEOUT, f"Erro de conexão: {str(e)}") from e
+        except requests.RequestException as e:
+            raise FalhaRequisicao(ERRO_CONEXAO, f"Erro de conexão: {str(e)}") from e
+        
+        if response.status_code != 200:
+            raise FalhaRequisicao(
+                tipo_erro_status(response.status_code), f"Erro na API: Status {response.status_code}"
+            )
+        try:
+            return response.json()
+        except ValueError as e:
+            raise FalhaRequisicao(ERRO_RESPOSTA, f"Resposta inválida: {str(e)}") from e
+    
+    def _enviar_com_hedge(self, balde, host, metodo, url, **kwargs):
+        """Envia a requisição e, se passar do p90 do host, uma duplicata
+        
+        Vale a primeira resposta que chegar; a requisição perdedora não
+        pode ser interrompida (requests é bloqueante) e é descartada ao terminar.
+        """
+        atraso = self.hedge.atraso(host)
+        if atraso is None:
+            return self._enviar(balde, host, metodo, url, **kwargs)
+        
+        executor = self._executor_duplicatas()
+        original = self._submeter(executor, balde, host, metodo, url, **kwargs)
+        concluidos, _ = concurrent.futures.wait([original], timeout=atraso)
+        if concluidos or not self.hedge.permitir():
+            return original.result()
+        
+        duplicata = self._submeter(executor, balde, host, metodo, url, **kwargs)
+        pendentes = [original, duplicata]
+        while True:
+            concluidos, _ = concurrent.futures.wait(pendentes, return_when=concurrent.futures.FIRST_COMPLETED)
+            vencedor = concluidos.pop()
+            pendentes.remove(vencedor)
+            
+            # Uma exceção só vale se a outra requisição também falhar
+            if vencedor.exception() is None or not pendentes:
+                for perdedor in pendentes:
+                    perdedor.add_done_callback(_descartar_resposta)
+                if vencedor is duplicata and vencedor.exception() is None:
+                    self.hedge.registrar_vitoria()
+                return vencedor.result()
+    
+    def _submeter(self, executor, *args, **kwargs):
+        """Envia uma tentativa no pool de hedge; ela conta como em voo até terminar, mesmo se perder"""
+        self._entrar_em_voo()
+        futuro = executor.submit(self._enviar, *args, **kwargs)
+        futuro.add_done_callback(lambda _: self._sair_de_voo())
+        return futuro
+    
+    def _executor_duplicatas(self):
+        """Pool das requisições com hedge (a original e a duplicata rodam fora do chamador)"""
+        with self._lock:
+            if self._executor_hedge is None:
+                self._executor_hedge = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.pool_size * 4, thread_name_prefix="hedge"
+                )
+            return self._executor_hedge
+    
+    def _enviar(self, balde, host, metodo, url, medicao=None, **kwargs):
+        """Envia uma tentativa; medicao(status, tamanho, duracao, erro) registra a requisição (metricas.py)"""
+        # Host com circuito aberto: recusar sem esperar token nem vaga
+        self.disjuntores.verificar(host)
+        
+        try:
+            # Aguardar a vez no ritmo do host antes de ocupar uma vaga de concorrência
+            # (a reprodução de cassete na velocidade máxima não tem ritmo)
+            espera = 0 if self.cassete is not None and self.cassete.sem_espera else balde.reservar()
+            if espera > 0:
+                time.sleep(espera)
+            
+            # Respeitar o limite de concorrência adaptativo
+            self.limitador.adquirir()
+        except BaseException:
+            # Interrompida antes de enviar: devolver a sondagem que verificar() possa ter liberado
+            self.disjuntores.desistir(host)
+            raise
+        inicio = time.monotonic()
+        status = None
+        erro = None
+        tamanho = 0
+        fora_do_cassete = False
+        try:
+            response = self._executar(metodo, url, **kwargs)
+            status = response.status_code
+            tamanho = len(response.content)
+            balde.atualizar_por_headers(response.headers)
+            self.hedge.registrar(host, time.monotonic() - inicio)
+            return response
+        except requests.Timeout:
+            erro = ERRO_TIMEOUT
+            raise
+        except ForaDoCassete:
+            fora_do_cassete = True
+            raise
+        finally:
+            duracao = time.monotonic() - inicio
+            if fora_do_cassete:
+                # Não chegou ao host: nada a dizer sobre a saúde dele
+                self.limitador.devolver()
+                self.disjuntores.desistir(host)
+            else:
+                self.limitador.liberar(duracao, status, falha=status is None)
+                self.disjuntores.registrar(host, falha=status is None or status >= 500)
+            if medicao is not None:
+                medicao(status, tamanho, duracao, erro)
+    
+    def _executar(self, metodo, url, **kwargs):
+        """Envia a requisição pela sessão do host, gravando-a ou reproduzindo-a do cassete ativo"""
+        cassete = self.cassete
+        if cassete is None:
+            return self._sessao(url).request(metodo, url, **kwargs)
+        if cassete.modo == MODO_REPRODUZIR:
+            return _resposta_do_cassete(cassete, metodo, url, kwargs.get("params"), kwargs.get("json"))
+        
+        inicio = time.monotonic()
+        try:
+            response = self._sessao(url).request(metodo, url, **kwargs)
+        except requests.Timeout:
+            cassete.registrar(metodo, url, kwargs, inicio, erro=ERRO_TIMEOUT)
+            raise
+        except requests.RequestException:
+            cassete.registrar(metodo, url, kwargs, inicio, erro=ERRO_CONEXAO)
+            raise
+        cassete.registrar(
+            metodo, url, kwargs, inicio, status=response.status_code, headers=response.headers, texto=response.text
+        )
+        return response
+    
+    def get(self, url, **kwargs):
+        return self.requisitar("GET", url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self.requisitar("POST", url, **kwargs)
+    
+    def fechar(self):
+        """Fecha todas as conexões abertas, o pool de hedge e os recursos aposentados por ajustar_pool"""
+        with self._lock:
+            recursos = list(self._sessoes.values()) + self._aposentados
+            if self._executor_hedge is not None:
+                recursos.append(self._executor_hedge)
+            self._sessoes = {}
+            self._aposentados = []
+            self._executor_hedge = None
+        _fechar_recursos(recursos)
+
+
+def _resposta_do_cassete(cassete, metodo, url, params, corpo):
+    """Resposta do requests montada a partir da entrada gravada no cassete"""
+    entrada = cassete.responder(metodo, url, params, corpo)
+    if entrada is None:
+        # Repetir não adianta: a requisição continuaria fora do cassete
+        raise ForaDoCassete(metodo, url)
+    if entrada.get("erro") == ERRO_TIMEOUT:
+        raise requests.Timeout(f"Tempo esgotado (cassete): {url}")
+    if entrada.get("erro"):
+        raise requests.ConnectionError(f"Falha de conexão (cassete): {url}")
+    
+    response = requests.Response()
+    response.status_code = entrada["status"]
+    response.headers = headers_da_entrada(entrada)
+    response._content = (entrada.get("resposta") or "").encode("utf-8")
+    response._content_consumed = True
+    response.raw = io.BytesIO(response._content)
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+
+def _fechar_recursos(recursos):
+    """Fecha sessões e encerra pools de hedge aposentados"""
+    for recurso in recursos:
+        if isinstance(recurso, concurrent.futures.Executor):
+            recurso.shutdown(wait=False)
+        else:
+            recurso.close()
+
+
+def _descartar_resposta(futuro):
+    """Fecha a resposta da requisição que perdeu a corrida do hedge"""
+    if futuro.exception() is None:
+        futuro.result().close()
+
+
+# Instância única compartilhada entre threads e execuções
+_transporte = None
+_transporte_lock = threading.Lock()
+
+
+def get_transporte(max_workers=MAX_WORKERS):
+    """Retorna o transporte compartilhado com pool compatível com max_workers"""
+    global _transporte
+    with _transporte_lock:
+        if _transporte is None:
+            _transporte = TransporteVTEX(pool_size=max_workers)
+        else:
+            _transporte.ajustar_pool(max_workers)
+        return _transporte
+
+
+def configurar_transporte(configuracoes):
+    """Aplica as configurações gerais (empresa_config.json) ao transporte compartilhado"""
+    transporte = get_transporte(workers_para_configuracao(configuracoes))
+    transporte.timeout = configuracoes.get("timeout_requests", TIMEOUT_PADRAO)
+    
+    limitador = transporte.limitador
+    limitador.ativo = configuracoes.get("concorrencia_adaptativa", True)
+    limitador.limite_minimo = configuracoes.get("concorrencia_minima", 2)
+    limitador.limite_maximo = configuracoes.get("concorrencia_maxima", 100)
+    limitador.limite = float(min(max(limitador.limite, limitador.limite_minimo), limitador.limite_maximo))
+    
+    transporte.limitador_taxa.configurar(configuracoes.get("taxa_maxima_por_host", TAXA_POR_HOST_PADRAO))
+    transporte.retentativas.max_tentativas = configuracoes.get("max_tentativas", MAX_TENTATIVAS_PADRAO)
+    transporte.orcamento_retentativas = configuracoes.get("orcamento_retentativas", ORCAMENTO_RETENTATIVAS_PADRAO)
+    transporte.hedge.ativo = configuracoes.get("requisicoes_hedge", False)
+    transporte.hedge.carga_maxima = configuracoes.get("hedge_carga_maxima", 10)
+    transporte.disjuntores.limite_falhas = configuracoes.get("circuito_falhas", 5)
+    transporte.disjuntores.espera = configuracoes.get("circuito_espera", 30)
+    transporte.chamadas_em_voo.ativo = configuracoes.get("deduplicar_requisicoes", True)
+    try:
+        transporte.cassete = configurar_cassete(configuracoes, transporte.cassete)
+    except ErroCassete:
+        # O cassete anterior já foi fechado; quem chamou não deve iniciar execuções
+        transporte.cassete = None
+        raise
+    return transporte
+
+
+def workers_para_configuracao(configuracoes):
+    """Número de workers das threads de consulta: o max_workers da configuração
+    
+    A concorrência adaptativa não aumenta o pool; o limitador só reduz as
+    requisições em voo abaixo do que os workers conseguem enviar.
+    """
+    return configuracoes.get("max_workers", MAX_WORKERS)
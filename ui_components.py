@@ -4,7 +4,7 @@ Componentes de interface do VTEX Freight Calculator
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, 
     QPushButton, QFrame, QGroupBox, QListWidget, QListWidgetItem,
-    QSplitter, QStatusBar
+    QSplitter, QStatusBar, QCheckBox, QPlainTextEdit
 )
 from PySide6.QtGui import QFont
 from PySide6.QtCore import Qt
@@ -74,6 +74,25 @@ class InputPanel(QWidget):
         sku_layout.addWidget(sku_label)
         sku_layout.addWidget(self.sku_combo, 1)
         input_layout.addLayout(sku_layout)
+        
+        # Modo multi-SKU: vários SKUs simulados em uma única chamada por loja
+        self.multi_sku_check = QCheckBox("Vários SKUs (um por linha)")
+        self.multi_sku_check.setFont(QFont("Arial", 9))
+        self.multi_sku_check.toggled.connect(self.alternar_multi_sku)
+        input_layout.addWidget(self.multi_sku_check)
+        
+        self.skus_input = QPlainTextEdit()
+        self.skus_input.setFont(QFont("Arial", 10))
+        self.skus_input.setPlaceholderText("149718\n149719\n...")
+        self.skus_input.setStyleSheet(f"background-color: {self.cores['secundaria']};")
+        self.skus_input.setMaximumHeight(100)
+        self.skus_input.setVisible(False)
+        input_layout.addWidget(self.skus_input)
+        
+        # Ignorar o cache de simulações e consultar todas as lojas de novo
+        self.forcar_atualizacao_check = QCheckBox("Forçar atualização (ignorar cache)")
+        self.forcar_atualizacao_check.setFont(QFont("Arial", 9))
+        input_layout.addWidget(self.forcar_atualizacao_check)
 
         # Grupo de seleção de lojas
         loja_group = QGroupBox("Lojas para Comparação")
@@ -194,12 +213,48 @@ class InputPanel(QWidget):
         """)
         self.limpar_btn.clicked.connect(self.parent.limpar_resultados)
         
+        # Interrompe a simulação em andamento mantendo os resultados parciais
+        self.cancelar_btn = QPushButton("⏹ CANCELAR")
+        self.cancelar_btn.setFont(QFont("Arial", 10))
+        self.cancelar_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: #e74c3c;
+                color: {self.cores['secundaria']};
+                padding: 10px 20px;
+                border-radius: 5px;
+            }}
+            QPushButton:disabled {{
+                background-color: #a0a0a0;
+            }}
+        """)
+        self.cancelar_btn.setEnabled(False)
+        self.cancelar_btn.clicked.connect(self.parent.cancelar_simulacao)
+        
         buttons_layout.addStretch()
         buttons_layout.addWidget(self.simular_btn)
+        buttons_layout.addWidget(self.cancelar_btn)
         buttons_layout.addWidget(self.limpar_btn)
         
         input_layout.addLayout(buttons_layout)
     
+    def alternar_multi_sku(self, ativo):
+        """Alterna entre o campo de SKU único e a lista de SKUs"""
+        self.skus_input.setVisible(ativo)
+        self.sku_combo.setEnabled(not ativo)
+    
+    def get_skus(self):
+        """Retorna os SKUs informados, sem repetição e na ordem digitada"""
+        if not self.multi_sku_check.isChecked():
+            sku = self.sku_combo.currentText().strip()
+            return [sku] if sku else []
+        
+        skus = []
+        for linha in self.skus_input.toPlainText().replace(',', '\n').splitlines():
+            sku = linha.strip()
+            if sku and sku not in skus:
+                skus.append(sku)
+        return skus
+    
     def aplicar_cores_dinamicamente(self, cores):
         """Aplica cores dinamicamente aos componentes"""
         self.cores = cores
@@ -286,3 +341,12 @@ class StatusBarWidget(QStatusBar):
         self.setFont(QFont("Arial", 9))
         self.setStyleSheet(f"background-color: {self.cores['secundaria']}; color: {self.cores['texto']};")
         self.showMessage("Pronto para simular")
+        
+        # Indicadores permanentes (cache, concorrência...) à direita da barra
+        self.indicadores_label = QLabel("")
+        self.indicadores_label.setFont(QFont("Arial", 9))
+        self.addPermanentWidget(self.indicadores_label)
+    
+    def atualizar_indicadores(self, texto):
+        """Atualiza o texto dos indicadores permanentes"""
+        self.indicadores_label.setText(texto)
@@ -10,6 +10,16 @@ def validar_cep(cep):
     return re.match(r"^\d{5}-\d{3}$", cep) is not None
 
 
+def extrair_ceps(texto):
+    """Extrai CEPs (com ou sem hífen) de um texto livre, sem repetição"""
+    ceps = []
+    for numeros, sufixo in re.findall(r"(?<!\d)(\d{5})-?(\d{3})(?!\d)", texto):
+        cep = f"{numeros}-{sufixo}"
+        if cep not in ceps:
+            ceps.append(cep)
+    return ceps
+
+
 def formatar_moeda(valor):
     """Formata valor em moeda brasileira"""
     try:
@@ -55,6 +65,86 @@ def calcular_estoque_total(inventory_data):
     return total
 
 
+def formatar_idade(segundos):
+    """Formata uma idade em segundos (45s, 3 min, 2 h)"""
+    segundos = int(segundos)
+    if segundos < 60:
+        return f"{segundos}s"
+    if segundos < 3600:
+        return f"{segundos // 60} min"
+    return f"{segundos // 3600} h"
+
+
+def formatar_tamanho(num_bytes):
+    """Formata um tamanho em bytes (830 B, 12.4 KB, 3.1 MB)"""
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+
+def melhor_sla(simulation_data):
+    """Melhor opção de entrega (menor preço): preço, prazo e transportadora da mesma SLA
+    
+    Retorna None se a loja não tem entrega normal.
+    """
+    if not loja_tem_entrega_normal(simulation_data):
+        return None
+    
+    # Filtrar apenas SLAS de entrega normal
+    slas_entrega = [
+        sla for sla in simulation_data['logisticsInfo'][0]['slas']
+        if sla.get('deliveryChannel', '').lower() != 'pickup-in-point'
+    ]
+    melhor_opcao = min(slas_entrega, key=lambda x: x.get('listPrice', float('inf')), default=None)
+    if not melhor_opcao:
+        return None
+    
+    prazo_str = melhor_opcao.get('shippingEstimate', '')
+    transportadora = melhor_opcao.get('name', '')
+    if melhor_opcao.get('deliveryIds'):
+        transportadora = melhor_opcao['deliveryIds'][0].get('courierName', transportadora)
+    
+    return {
+        'preco': melhor_opcao.get('listPrice', 0),
+        'prazo_str': prazo_str,
+        'prazo_dias': parse_prazo_para_dias(prazo_str),
+        'transportadora': transportadora,
+    }
+
+
+def coletar_dados_ranking(resultados, determinar_tipo_loja):
+    """Coleta dados para o ranking de entregas, ordenado do melhor para o pior
+    
+    determinar_tipo_loja(loja) devolve o tipo exibido (Nacional/Local).
+    """
+    ranking_data = []
+    
+    for loja, data in resultados.items():
+        melhor_opcao = melhor_sla(data.get('simulation', {}))
+        if melhor_opcao:
+            # Obter estoque total da loja
+            estoque = 0
+            inventory = data.get('inventory', {})
+            if inventory and inventory.get('balance'):
+                for warehouse in inventory['balance']:
+                    estoque += warehouse.get('totalQuantity', 0)
+            
+            ranking_data.append({
+                'loja': loja,
+                'tipo': determinar_tipo_loja(loja),
+                **melhor_opcao,
+                'estoque': estoque,
+                'cache_idade': data.get('cache_age')
+            })
+    
+    # Ordenar por: 1. prazo (menor primeiro), 2. preço (menor), 3. estoque (maior)
+    ranking_data.sort(key=lambda x: (x['prazo_dias'], x['preco'], -x['estoque']))
+    
+    return ranking_data
+
+
 def formatar_endereco(address):
     """Formata o endereço de forma legível"""
     if not address:
@@ -133,3 +223,25 @@ def loja_tem_entrega_normal(simulation_data):
         if sla.get('deliveryChannel', '').lower() != 'pickup-in-point':
             return True
     return False
+
+
+def resumir_entrega(simulation_data):
+    """Resume a simulação na disponibilidade de entrega e na melhor SLA do ranking
+    
+    Preço, prazo e transportadora são sempre da mesma SLA (a de menor preço).
+    """
+    melhor_opcao = melhor_sla(simulation_data)
+    if melhor_opcao is None:
+        return {'disponivel': False, 'preco': None, 'prazo_str': None, 'prazo_dias': None, 'transportadora': None}
+    return {'disponivel': True, **melhor_opcao}
+
+
+def resumir_resultado(resultado):
+    """Resume o resultado de uma loja: entrega, estoque, erro e idade do cache"""
+    return {
+        **resumir_entrega(resultado.get('simulation')),
+        'estoque': calcular_estoque_total(resultado.get('inventory')),
+        'erro': resultado.get('error'),
+        'tipo_erro': resultado.get('error_type'),
+        'cache_idade': resultado.get('cache_age'),
+    }